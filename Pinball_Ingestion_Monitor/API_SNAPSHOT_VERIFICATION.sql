@@ -20,7 +20,7 @@ SELECT
         THEN 'Slightly delayed but OK'
         ELSE 'ALERT: Overdue for snapshot!'
     END as schedule_status
-FROM api_snapshots
+FROM api_snapshots_decoded
 WHERE fetched_at > NOW() - INTERVAL '90 minutes';
 
 -- ===================================
@@ -45,7 +45,7 @@ SELECT
              AND jsonb_array_length(raw_response) > 0 THEN '✅ HAS DATA'
         ELSE '⚠️ UNEXPECTED FORMAT'
     END as data_quality
-FROM api_snapshots
+FROM api_snapshots_decoded
 ORDER BY fetched_at DESC
 LIMIT 5;
 
@@ -63,7 +63,7 @@ SELECT
         WHEN COUNT(*) > 1 THEN '⚠️ MULTIPLE (' || COUNT(*) || ')'
         ELSE '?'
     END as hourly_status
-FROM api_snapshots
+FROM api_snapshots_decoded
 WHERE fetched_at > NOW() - INTERVAL '24 hours'
 GROUP BY DATE_TRUNC('hour', fetched_at)
 ORDER BY hour DESC;
@@ -75,7 +75,7 @@ WITH hourly_snapshots AS (
     SELECT 
         DATE_TRUNC('hour', fetched_at) as hour,
         COUNT(*) as snapshot_count
-    FROM api_snapshots
+    FROM api_snapshots_decoded
     WHERE fetched_at > NOW() - INTERVAL '48 hours'
     GROUP BY DATE_TRUNC('hour', fetched_at)
 ),
@@ -112,7 +112,7 @@ SELECT
                      AND jsonb_array_length(raw_response) > 0) as valid_responses,
     ROUND(100.0 * COUNT(*) FILTER (WHERE jsonb_typeof(raw_response) = 'array' 
           AND jsonb_array_length(raw_response) > 0) / COUNT(*), 2) as pct_valid
-FROM api_snapshots
+FROM api_snapshots_decoded
 WHERE fetched_at > NOW() - INTERVAL '24 hours';
 
 -- ===================================
@@ -126,17 +126,17 @@ SELECT
     e.start_date,
     e.stop_date,
     (SELECT COUNT(*) 
-     FROM api_snapshots a 
+     FROM api_snapshots_decoded a 
      WHERE a.event_code = e.event_code 
        AND a.fetched_at > NOW() - INTERVAL '24 hours') as snapshots_last_24h,
     (SELECT MAX(fetched_at) 
-     FROM api_snapshots a 
+     FROM api_snapshots_decoded a 
      WHERE a.event_code = e.event_code) as last_snapshot,
     CASE 
-        WHEN (SELECT MAX(fetched_at) FROM api_snapshots a 
+        WHEN (SELECT MAX(fetched_at) FROM api_snapshots_decoded a 
               WHERE a.event_code = e.event_code) > NOW() - INTERVAL '90 minutes' 
         THEN '✅ Recent'
-        WHEN (SELECT MAX(fetched_at) FROM api_snapshots a 
+        WHEN (SELECT MAX(fetched_at) FROM api_snapshots_decoded a 
               WHERE a.event_code = e.event_code) IS NULL 
         THEN '❌ Never captured'
         ELSE '⚠️ Stale'
@@ -150,10 +150,10 @@ ORDER BY last_snapshot DESC NULLS LAST;
 -- ===================================
 SELECT 
     'api_snapshots' as table_name,
-    (SELECT COUNT(*) FROM api_snapshots) as total_records,
-    (SELECT MAX(fetched_at) FROM api_snapshots) as latest_record,
-    (SELECT MIN(fetched_at) FROM api_snapshots) as oldest_record,
-    EXTRACT(EPOCH FROM (NOW() - (SELECT MAX(fetched_at) FROM api_snapshots)))/60 as minutes_since_latest
+    (SELECT COUNT(*) FROM api_snapshots_decoded) as total_records,
+    (SELECT MAX(fetched_at) FROM api_snapshots_decoded) as latest_record,
+    (SELECT MIN(fetched_at) FROM api_snapshots_decoded) as oldest_record,
+    EXTRACT(EPOCH FROM (NOW() - (SELECT MAX(fetched_at) FROM api_snapshots_decoded)))/60 as minutes_since_latest
 UNION ALL
 SELECT 
     'events',
@@ -194,7 +194,7 @@ SELECT
              THEN '⚠️ WRONG TYPE - Expected array, got ' || jsonb_typeof(raw_response)
         ELSE 'Unknown issue'
     END as issue_description
-FROM api_snapshots
+FROM api_snapshots_decoded
 WHERE fetched_at > NOW() - INTERVAL '24 hours'
   AND (
       raw_response IS NULL 
@@ -216,7 +216,7 @@ WITH snapshot_times AS (
         LAG(fetched_at) OVER (ORDER BY fetched_at) as previous_fetched_at,
         EXTRACT(EPOCH FROM (fetched_at - LAG(fetched_at) 
                 OVER (ORDER BY fetched_at)))/60 as minutes_since_previous
-    FROM api_snapshots
+    FROM api_snapshots_decoded
     WHERE fetched_at > NOW() - INTERVAL '48 hours'
 )
 SELECT 
@@ -246,13 +246,13 @@ UNION ALL
 SELECT 
     'Last Snapshot: ' || MAX(fetched_at)::text,
     NULL
-FROM api_snapshots
+FROM api_snapshots_decoded
 UNION ALL
 SELECT 
     'Minutes Since Last: ' || 
     ROUND(EXTRACT(EPOCH FROM (NOW() - MAX(fetched_at)))/60, 2)::text,
     NULL
-FROM api_snapshots
+FROM api_snapshots_decoded
 UNION ALL
 SELECT 
     'Status: ' || CASE 
@@ -261,12 +261,12 @@ SELECT
         ELSE '⚠️ FAILING'
     END,
     NULL
-FROM api_snapshots
+FROM api_snapshots_decoded
 UNION ALL
 SELECT 
     'Snapshots (24h): ' || COUNT(*)::text,
     NULL
-FROM api_snapshots
+FROM api_snapshots_decoded
 WHERE fetched_at > NOW() - INTERVAL '24 hours'
 UNION ALL
 SELECT 
@@ -274,7 +274,7 @@ SELECT
     COUNT(*) FILTER (WHERE jsonb_typeof(raw_response) = 'array' 
                      AND jsonb_array_length(raw_response) > 0)::text,
     NULL
-FROM api_snapshots
+FROM api_snapshots_decoded
 WHERE fetched_at > NOW() - INTERVAL '24 hours'
 UNION ALL
 SELECT 
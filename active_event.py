@@ -0,0 +1,119 @@
+"""
+Active Event Resolver
+In-process cache of the active Events row, shared by every API endpoint
+
+The cache is invalidated by the ``events_changed`` NOTIFY sent from the
+trigger in database/init/06_event_notifications.sql. While the LISTEN
+connection is down, entries expire after a short TTL instead.
+
+Settings (environment variables):
+    ACTIVE_EVENT_TTL      seconds to trust the cache without LISTEN (default 30)
+    ACTIVE_EVENT_MAX_AGE  seconds to trust it even with LISTEN up (default 3600)
+"""
+
+import os
+import threading
+import time
+
+EVENTS_CHANNEL = 'events_changed'
+
+# Same selection rule as the n8n "Recalculate Leaderboard" step
+ACTIVE_EVENT_ROW_QUERY = """
+    SELECT event_code, event_name, start_date, stop_date, location_id, event_type
+    FROM events
+    WHERE is_active = true
+    LIMIT 1
+"""
+
+
+class ActiveEventUnavailable(RuntimeError):
+    """The active event could not be loaded and none was cached before"""
+
+
+class ActiveEventResolver:
+    """Resolve (and cache) the active event row"""
+
+    def __init__(self, pool, listener=None, ttl=None, max_age=None):
+        self.pool = pool
+        self.listener = listener
+        self.ttl = float(os.getenv('ACTIVE_EVENT_TTL', '30')) if ttl is None else ttl
+        self.max_age = float(os.getenv('ACTIVE_EVENT_MAX_AGE', '3600')) if max_age is None else max_age
+        self._lock = threading.Lock()
+        self._event = None
+        self._loaded_at = None
+        # False until a lookup succeeds; a failure before that has nothing to fall back on
+        self._ever_loaded = False
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        if listener is not None:
+            listener.subscribe(EVENTS_CHANNEL, self.invalidate)
+            listener.on_reconnect(self.invalidate)
+
+    def invalidate(self, payload=None):
+        """Drop the cached row; the next get() reloads it"""
+        with self._lock:
+            self._version += 1
+            self._loaded_at = None
+
+    def _fresh(self, now):
+        if self._loaded_at is None:
+            return False
+        age = now - self._loaded_at
+        if self.listener is not None and self.listener.connected:
+            return age < self.max_age
+        return age < self.ttl
+
+    def get(self):
+        """
+        Return the active event as a dict (or None if there is none).
+        Raises ActiveEventUnavailable if the lookup fails with nothing cached.
+        """
+        if self.listener is not None:
+            self.listener.ensure_started()
+        now = time.monotonic()
+        if self._fresh(now):
+            self.hits += 1
+            return self._event
+
+        with self._lock:
+            if self._fresh(time.monotonic()):
+                self.hits += 1
+                return self._event
+            version = self._version
+
+        self.misses += 1
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(ACTIVE_EVENT_ROW_QUERY)
+                    row = cur.fetchone()
+        except Exception as e:
+            print(f"⚠️ Could not load active event: {type(e).__name__}: {e}")
+            if not self._ever_loaded:
+                raise ActiveEventUnavailable(f"{type(e).__name__}: {e}") from e
+            # Serve the last known event rather than nothing
+            return self._event
+
+        event = dict(row) if row else None
+        with self._lock:
+            # An invalidation that raced with the load wins; don't cache
+            if version == self._version:
+                self._event = event
+                self._loaded_at = time.monotonic()
+                self._ever_loaded = True
+        return event
+
+    def event_code(self):
+        """Shortcut for the active event's code (or None)"""
+        event = self.get()
+        return event['event_code'] if event else None
+
+    def stats(self):
+        return {
+            "cached_event": self._event['event_code'] if self._event else None,
+            "cache_age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "listener": self.listener.stats() if self.listener is not None else None,
+        }
@@ -3,15 +3,29 @@ Pinball Leaderboard API Server
 Serves data from PostgreSQL database to the frontend kiosk display
 """
 
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify, send_from_directory, request, g, make_response, Response
 from flask_cors import CORS
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
+import hmac
 import json
-from datetime import datetime, timedelta
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from urllib.parse import urlencode
 from dotenv import load_dotenv
 
+from db_pool import pool_from_env
+from league_stats import compute_statistics, EMPTY_STATISTICS
+from pg_listener import NotificationListener
+from active_event import ActiveEventResolver, ActiveEventUnavailable
+from response_cache import GenerationTracker, ResponseCache
+from leaderboard_engine import SyncedLeaderboard
+from event_stream import EventBroadcaster, TooManyClients
+from metrics import Registry, ROW_BUCKETS
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -32,7 +46,7 @@ def load_config():
             "bar_name": "Pinball Leaderboard",
             "logo_url": "/static/logo.png",
             "display": {"scene_duration": 60, "transition_speed": 800},
-            "api": {"refresh_interval": 300000},
+            "api": {"refresh_interval": 300000, "ingestion_interval_minutes": 60},
             "theme": {
                 "primary_color": "#ff6b35",
                 "secondary_color": "#f7931e",
@@ -54,50 +68,202 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'your_password_here')
 }
 
+db_pool = pool_from_env({**DB_CONFIG, 'cursor_factory': RealDictCursor})
+
+# One LISTEN connection per worker; caches subscribe to its channels
+db_listener = NotificationListener(DB_CONFIG)
+active_event = ActiveEventResolver(db_pool, db_listener)
+leaderboard_generation = GenerationTracker(db_pool, db_listener)
+response_cache = ResponseCache(leaderboard_generation)
+# Combined rankings in memory, caught up from the archive once per generation
+ranked_leaderboard = SyncedLeaderboard(db_pool, leaderboard_generation, active_event)
+
+# Endpoints that read High_Scores_Archive directly rather than the recomputed
+# leaderboard; a new_high_score NOTIFY makes their cached responses stale
+SCORE_DERIVED_PATHS = ('/api/game-champions', '/api/recent-activity', '/api/statistics')
+db_listener.subscribe('new_high_score', lambda payload: response_cache.invalidate(SCORE_DERIVED_PATHS))
+# Subscribed after the caches so a kiosk reacting to an event never refetches stale data
+kiosk_events = EventBroadcaster(db_listener)
+
+# Shared secret for /api/leaderboard-updated; without it the webhook is disabled
+# (anyone who can reach the server could otherwise force cache invalidations)
+LEADERBOARD_WEBHOOK_TOKEN = os.getenv('LEADERBOARD_WEBHOOK_TOKEN') or None
+if LEADERBOARD_WEBHOOK_TOKEN is None:
+    print("⚠️ LEADERBOARD_WEBHOOK_TOKEN is not set - /api/leaderboard-updated will reject every request")
+
+# ==================== METRICS ====================
+
+metrics = Registry()
+HTTP_REQUESTS = metrics.counter(
+    'pinball_http_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'method', 'status'))
+HTTP_DURATION = metrics.histogram(
+    'pinball_http_request_duration_seconds', 'Time to produce the response', ('endpoint',))
+HTTP_DB_TIME = metrics.histogram(
+    'pinball_http_request_db_seconds', 'Time spent in database queries per request', ('endpoint',))
+SERIALIZATION_TIME = metrics.histogram(
+    'pinball_response_serialization_seconds',
+    'Time building a response body outside the database (response cache misses)', ('endpoint',))
+QUERY_DURATION = metrics.histogram(
+    'pinball_db_query_duration_seconds', 'Query latency, connection checkout included', ('query',))
+QUERY_ROWS = metrics.histogram(
+    'pinball_db_query_rows', 'Rows returned per query', ('query',), buckets=ROW_BUCKETS)
+QUERY_ERRORS = metrics.counter(
+    'pinball_db_query_errors_total', 'Failed queries by exception type', ('query', 'error'))
+metrics.gauge('pinball_db_pool_connections', 'Pooled connections by state', lambda: [
+    ({'state': state}, db_pool.stats()[state]) for state in ('in_use', 'idle', 'opening')])
+metrics.gauge('pinball_db_pool_waiting', 'Requests waiting for a pooled connection',
+              lambda: [({}, db_pool.stats()['waiting'])])
+metrics.gauge('pinball_response_cache_requests_total', 'Response cache lookups by result', lambda: [
+    ({'result': result}, response_cache.stats()[result]) for result in ('hits', 'misses', 'bypassed')],
+    kind='counter')
+metrics.gauge('pinball_response_cache_bytes', 'Serialized responses held in the cache',
+              lambda: [({}, response_cache.stats()['bytes'])])
+
+@app.before_request
+def start_request_timer():
+    metrics.ensure_started()
+    g.request_started = time.perf_counter()
+    g.db_seconds = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses (/api/stream) are timed until their first byte
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+        HTTP_DB_TIME.observe(g.db_seconds, endpoint=endpoint)
+    return response
+
+@contextmanager
+def timed_query(name):
+    """Time one query as ``name``; counts towards the request's DB time"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        QUERY_ERRORS.inc(query=name, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        QUERY_DURATION.observe(elapsed, query=name)
+        if 'db_seconds' in g:
+            g.db_seconds += elapsed
+
 def get_db_connection():
-    """Create a database connection with RealDictCursor"""
-    return psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+    """Borrow a pooled connection (RealDictCursor rows); use as a context manager"""
+    return db_pool.connection()
 
-def query_db(query, params=None, one=False):
-    """Execute a query and return results"""
-    conn = get_db_connection()
+def query_db(query, params=None, one=False, name=None):
+    """Execute a query and return results; ``name`` labels its metrics (default: the endpoint)"""
+    # Check if this is a SELECT query (including CTEs that start with WITH)
+    query_upper = query.strip().upper()
+    is_select = query_upper.startswith('SELECT') or query_upper.startswith('WITH')
+    name = name or request.endpoint or 'query'
+    
     try:
-        cur = conn.cursor()
-        cur.execute(query, params or ())
-        
-        # Check if this is a SELECT query (including CTEs that start with WITH)
-        query_upper = query.strip().upper()
-        is_select = query_upper.startswith('SELECT') or query_upper.startswith('WITH')
-        
-        if is_select:
-            rv = cur.fetchall()
-            print(f"🔍 Query returned {len(rv) if rv else 0} rows")
-            if rv and len(rv) > 0:
-                print(f"🔍 First row: {dict(rv[0])}")
-            result = (rv[0] if rv else None) if one else rv
-            cur.close()
-            conn.close()
-            return result
-        else:
-            conn.commit()
-            cur.close()
-            conn.close()
-            return None
+        with timed_query(name), get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params or ())
+                
+                if not is_select:
+                    conn.commit()
+                    return None
+                
+                rv = cur.fetchall()
+                QUERY_ROWS.observe(len(rv), query=name)
+                return (rv[0] if rv else None) if one else rv
     except Exception as e:
+        # Tell the response cache not to keep an empty fallback result
+        g.db_error = True
         print(f"❌ Database query error: {type(e).__name__}: {e}")
         print(f"Query (first 500 chars): {query[:500]}...")
         if params:
             print(f"Parameters: {params}")
         import traceback
         traceback.print_exc()
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
         if is_select:
             return [] if not one else None
         return None
 
+def active_event_code():
+    """The active event's code, or None; a failed lookup also keeps the response out of the cache"""
+    try:
+        return active_event.event_code()
+    except ActiveEventUnavailable:
+        g.db_error = True
+        return None
+
+# ==================== RESPONSE CACHE ====================
+
+# How often n8n recomputes the leaderboard; drives Cache-Control / Expires
+INGESTION_INTERVAL = timedelta(minutes=config.get('api', {}).get('ingestion_interval_minutes', 60))
+# max-age used when the scheduled ingestion is overdue (or the schedule is unknown)
+OVERDUE_MAX_AGE = 60
+
+def next_update_hint(ttl=None):
+    """Return (max_age_seconds, next_update_datetime) from the ingestion schedule"""
+    now = datetime.now(timezone.utc)
+    updated_at = leaderboard_generation.updated_at
+    if updated_at is None or updated_at + INGESTION_INTERVAL <= now:
+        max_age = OVERDUE_MAX_AGE
+    else:
+        max_age = int((updated_at + INGESTION_INTERVAL - now).total_seconds())
+    if ttl is not None:
+        max_age = min(max_age, int(ttl))
+    return max_age, now + timedelta(seconds=max_age)
+
+def cache_key(args=()):
+    """The request path plus only the query args the view reads"""
+    params = [(name, request.args[name]) for name in args if name in request.args]
+    return f"{request.path}?{urlencode(params)}" if params else request.path
+
+def cached_response(ttl=None, args=()):
+    """
+    Serve the view's serialized response from memory until the leaderboard
+    generation changes. ``ttl`` (seconds) also bounds entries whose content
+    depends on the clock. ``args`` names the query args the view reads; any
+    others are left out of the cache key, so junk query strings cannot grow
+    the cache. Responses carry a strong content ETag, answer If-None-Match
+    with 304, and advertise when the next ingestion is due.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            def build():
+                g.db_error = False
+                db_before = g.db_seconds
+                started = time.perf_counter()
+                resp = make_response(view(*args, **kwargs))
+                body = resp.get_data()
+                SERIALIZATION_TIME.observe(
+                    time.perf_counter() - started - (g.db_seconds - db_before), endpoint=request.endpoint)
+                return body, resp.mimetype, resp.status_code, not g.db_error
+            
+            cached = response_cache.get_or_build(cache_key(args), build, ttl)
+            resp = Response(cached.body, status=cached.status, mimetype=cached.mimetype)
+            if cached.generation is not None:
+                resp.headers['X-Leaderboard-Generation'] = str(cached.generation)
+            if cached.status != 200:
+                return resp
+            
+            resp.set_etag(cached.etag)
+            add_update_hint(resp, ttl)
+            # Turns into a bodiless 304 when If-None-Match matches
+            return resp.make_conditional(request)
+        return wrapper
+    return decorator
+
+def add_update_hint(resp, ttl=None):
+    """Cache-Control / Expires / X-Next-Update from the ingestion schedule"""
+    max_age, next_update = next_update_hint(ttl)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    resp.expires = next_update
+    resp.headers['X-Next-Update'] = next_update.isoformat()
+    return resp
+
 # ==================== API ENDPOINTS ====================
 
 @app.route('/')
@@ -111,21 +277,28 @@ def serve_static(path):
     return send_from_directory('static', path)
 
 @app.route('/api/config')
+@cached_response()
 def get_config():
     """Get configuration settings from config.json"""
     return jsonify(config)
 
 @app.route('/api/leaderboard/top10')
+@cached_response()
 def get_top10():
     """Get top 10 players from the leaderboard"""
+    snapshot = ranked_leaderboard.snapshot()
+    if snapshot is not None:
+        return jsonify(top10_from_engine(snapshot))
+    
+    # games_played and trends are stored by the recompute (refresh_leaderboard_trends)
     query = """
         SELECT 
             ROW_NUMBER() OVER (ORDER BY lc.combined_score DESC) as rank,
             p.display_name as name,
             lc.combined_score as score,
-            0 as games_played,
-            'neutral' as trend,
-            0 as trend_positions
+            lc.games_played,
+            lc.trend,
+            lc.trend_positions
         FROM leaderboard_cache lc
         JOIN players p ON lc.player_id = p.player_id
         ORDER BY lc.combined_score DESC
@@ -137,12 +310,70 @@ def get_top10():
         print("⚠️ Top 10 query returned None or empty - returning empty list")
         return jsonify([])
     
-    print(f"✅ Top 10 query returned {len(results)} players")
     return jsonify([dict(row) for row in results])
 
+def top10_from_engine(snapshot):
+    """Top 10 ranked in memory; only their kiosk columns are read (by primary key)"""
+    top = snapshot.rows[:10]
+    if not top:
+        print("⚠️ Leaderboard engine has no ranked players - returning empty list")
+        return []
+    kiosk = query_db("""
+        SELECT player_id, games_played, trend, trend_positions
+        FROM leaderboard_cache
+        WHERE player_id = ANY(%s)
+    """, ([player_id for player_id, _, _ in top],))
+    kiosk = {row['player_id']: row for row in kiosk or []}
+    results = []
+    for position, (player_id, score, _) in enumerate(top, start=1):
+        # A player the recompute has not cached yet gets the column defaults
+        row = kiosk.get(player_id, {})
+        results.append({
+            "rank": position,
+            "name": snapshot.names.get(player_id),
+            "score": score,
+            "games_played": row.get('games_played', 0),
+            "trend": row.get('trend', 'stable'),
+            "trend_positions": row.get('trend_positions', 0),
+        })
+    return results
+
+# Rows fetched per round trip by the streaming full leaderboard; a board that
+# fits in the first batch is sent in one piece and the connection returned at once
+FULL_LEADERBOARD_BATCH = 2000
+# Longest a streamed full leaderboard may hold its pooled connection (seconds)
+FULL_LEADERBOARD_STREAM_SECONDS = 60
+
+def encode_full_rows(rows):
+    return ','.join(f'{{"name":{json.dumps(name)},"rank":{rank},"score":{score}}}'
+                    for rank, name, score in rows)
+
 @app.route('/api/leaderboard/full')
 def get_full_leaderboard():
-    """Get complete leaderboard rankings"""
+    """
+    Get complete leaderboard rankings, streamed when large.
+
+    Rankings come from the in-memory leaderboard engine when it is available
+    (no connection is held at all). Otherwise rows come from a named
+    (server-side) cursor as plain tuples. If they fit
+    in one batch the connection goes straight back to the pool and the body
+    is sent whole; otherwise it is encoded batch by batch, so memory stays
+    flat however many players there are. A stream holds its connection and a
+    read-only snapshot while the client downloads, so it is bounded: after
+    FULL_LEADERBOARD_STREAM_SECONDS the stream is aborted, and the
+    transaction carries the same statement and idle-in-transaction timeouts
+    so Postgres drops it even if the client stalls mid-body. The body is not
+    held in the response cache; instead the ETag is the leaderboard
+    generation, so a kiosk that is up to date gets a 304 without a query.
+    """
+    generation = leaderboard_generation.current()
+    if generation is not None and request.if_none_match.contains(f"full-{generation}"):
+        return not_modified(generation)
+    
+    snapshot = ranked_leaderboard.snapshot()
+    if snapshot is not None:
+        return full_from_engine(snapshot)
+    
     query = """
         SELECT 
             ROW_NUMBER() OVER (ORDER BY combined_score DESC) as rank,
@@ -153,46 +384,173 @@ def get_full_leaderboard():
         ORDER BY lc.combined_score DESC;
     """
     
-    results = query_db(query)
-    if results is None:
-        print("⚠️ Full leaderboard query returned None - returning empty list")
+    started = time.perf_counter()
+    deadline = time.monotonic() + FULL_LEADERBOARD_STREAM_SECONDS
+    timeout = f"{FULL_LEADERBOARD_STREAM_SECONDS}s"
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        # Named cursors need a transaction; putconn() restores autocommit.
+        # The generation and the rows come from the same snapshot
+        conn.autocommit = False
+        with conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cur.execute("SELECT set_config('statement_timeout', %s, true),"
+                        " set_config('idle_in_transaction_session_timeout', %s, true)",
+                        (timeout, timeout))
+            cur.execute("SELECT generation FROM leaderboard_generation WHERE singleton")
+            row = cur.fetchone()
+        generation = row['generation'] if row else 0
+        if request.if_none_match.contains(f"full-{generation}"):
+            db_pool.putconn(conn)
+            return not_modified(generation)
+        
+        cursor = conn.cursor(name='leaderboard_full', cursor_factory=psycopg2.extensions.cursor)
+        cursor.itersize = FULL_LEADERBOARD_BATCH
+        cursor.execute(query)
+        first = cursor.fetchmany(FULL_LEADERBOARD_BATCH)
+        if len(first) < FULL_LEADERBOARD_BATCH:
+            cursor.close()
+            db_pool.putconn(conn)
+            conn = None
+    except Exception as e:
+        QUERY_ERRORS.inc(query='get_full_leaderboard', error=type(e).__name__)
+        print(f"❌ Full leaderboard query error: {type(e).__name__}: {e} - returning empty list")
+        if conn is not None:
+            db_pool.putconn(conn, discard=isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)))
         return jsonify([])
     
-    return jsonify([dict(row) for row in results])
+    if conn is None:
+        db_seconds = time.perf_counter() - started
+        QUERY_DURATION.observe(db_seconds, query='get_full_leaderboard')
+        QUERY_ROWS.observe(len(first), query='get_full_leaderboard')
+        encode_started = time.perf_counter()
+        resp = Response(f"[{encode_full_rows(first)}]", mimetype='application/json')
+        SERIALIZATION_TIME.observe(time.perf_counter() - encode_started, endpoint='get_full_leaderboard')
+        resp.set_etag(f"full-{generation}")
+        resp.headers['X-Leaderboard-Generation'] = str(generation)
+        return add_update_hint(resp)
+    
+    def body():
+        db_seconds = time.perf_counter() - started
+        encode_seconds = 0.0
+        rows = 0
+        batch = first
+        try:
+            yield '['
+            while batch:
+                encode_started = time.perf_counter()
+                yield (',' if rows else '') + encode_full_rows(batch)
+                rows += len(batch)
+                encode_seconds += time.perf_counter() - encode_started
+                if time.monotonic() > deadline:
+                    # Truncated body: the client sees a failed download and retries
+                    raise TimeoutError(f"full leaderboard stream exceeded {FULL_LEADERBOARD_STREAM_SECONDS}s")
+                fetch_started = time.perf_counter()
+                batch = cursor.fetchmany(FULL_LEADERBOARD_BATCH)
+                db_seconds += time.perf_counter() - fetch_started
+            yield ']'
+        except Exception as e:
+            QUERY_ERRORS.inc(query='get_full_leaderboard', error=type(e).__name__)
+            raise
+        finally:
+            QUERY_DURATION.observe(db_seconds, query='get_full_leaderboard')
+            QUERY_ROWS.observe(rows, query='get_full_leaderboard')
+            SERIALIZATION_TIME.observe(encode_seconds, endpoint='get_full_leaderboard')
+    
+    def release():
+        # Also runs when the client goes away mid-stream (or before it starts).
+        # A session Postgres ended on a timeout is closed; putconn() discards it
+        try:
+            cursor.close()
+        except psycopg2.Error:
+            pass
+        db_pool.putconn(conn)
+    
+    resp = Response(body(), mimetype='application/json')
+    resp.call_on_close(release)
+    resp.set_etag(f"full-{generation}")
+    resp.headers['X-Leaderboard-Generation'] = str(generation)
+    return add_update_hint(resp)
+
+def full_from_engine(snapshot):
+    """The full leaderboard encoded batch by batch from an engine snapshot"""
+    if request.if_none_match.contains(f"full-{snapshot.generation}"):
+        return not_modified(snapshot.generation)
+    rows, names = snapshot.rows, snapshot.names
+    
+    def body():
+        encode_seconds = 0.0
+        yield '['
+        for start in range(0, len(rows), FULL_LEADERBOARD_BATCH):
+            encode_started = time.perf_counter()
+            chunk = encode_full_rows((position, names.get(player_id), score) for position, (player_id, score, _)
+                                     in enumerate(rows[start:start + FULL_LEADERBOARD_BATCH], start=start + 1))
+            encode_seconds += time.perf_counter() - encode_started
+            yield (',' if start else '') + chunk
+        yield ']'
+        SERIALIZATION_TIME.observe(encode_seconds, endpoint='get_full_leaderboard')
+    
+    resp = Response(body(), mimetype='application/json')
+    resp.set_etag(f"full-{snapshot.generation}")
+    resp.headers['X-Leaderboard-Generation'] = str(snapshot.generation)
+    return add_update_hint(resp)
+
+def not_modified(generation):
+    resp = Response(status=304)
+    resp.set_etag(f"full-{generation}")
+    resp.headers['X-Leaderboard-Generation'] = str(generation)
+    return add_update_hint(resp)
+
+@app.route('/api/leaderboard/as-of')
+@cached_response(args=('at',))
+def get_leaderboard_as_of():
+    """Get the leaderboard as it stood at ?at=<ISO timestamp>, rebuilt from history"""
+    at = request.args.get('at')
+    try:
+        at = datetime.fromisoformat(at) if at else None
+    except ValueError:
+        return jsonify({"error": "'at' must be an ISO 8601 timestamp"}), 400
+    if at is None:
+        return jsonify({"error": "'at' is required"}), 400
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+
+    query = """
+        SELECT
+            h.current_rank as rank,
+            p.display_name as name,
+            h.combined_score as score
+        FROM leaderboard_as_of(%s) h
+        JOIN players p ON h.player_id = p.player_id
+        ORDER BY h.current_rank, p.display_name;
+    """
+
+    results = query_db(query, (at,))
+    return jsonify([dict(row) for row in results or []])
 
 @app.route('/api/game-champions')
+@cached_response()
 def get_game_champions():
     """Get the champion (highest score) for each machine"""
-    # Get active event first
-    event = query_db("SELECT event_code FROM events WHERE is_active = true LIMIT 1", one=True)
+    event_code = active_event_code()
     
-    if not event or 'event_code' not in event:
+    if not event_code:
         print("⚠️ No active event found for game champions")
         return jsonify([])
     
-    event_code = event['event_code']
-    print(f"🎮 Getting champions for event: {event_code}")
-    
-    # Query for game champions
+    # Machine_Champions is kept current by triggers on the archive
+    # (database/init/11_machine_champions.sql): one row per machine
     query = """
-        WITH ranked_scores AS (
-            SELECT 
-                machine_id,
-                player_id,
-                high_score,
-                ROW_NUMBER() OVER (PARTITION BY machine_id ORDER BY high_score DESC) as rn
-            FROM high_scores_archive
-            WHERE event_code = %s
-        )
         SELECT 
             m.machine_name as name,
             p.display_name as champion,
-            rs.high_score as score
-        FROM ranked_scores rs
-        JOIN machines m ON rs.machine_id = m.machine_id
-        JOIN players p ON rs.player_id = p.player_id
-        WHERE rs.rn = 1 AND m.is_active = true
-        ORDER BY rs.high_score DESC;
+            mc.high_score as score
+        FROM machine_champions mc
+        JOIN machines m ON mc.machine_id = m.machine_id
+        JOIN players p ON mc.player_id = p.player_id
+        WHERE mc.event_code = %s AND m.is_active = true
+        ORDER BY mc.high_score DESC;
     """
     
     results = query_db(query, (event_code,))
@@ -200,42 +558,45 @@ def get_game_champions():
         print("⚠️ Game champions query returned None or empty")
         return jsonify([])
     
-    print(f"✅ Game champions query returned {len(results)} machines")
     return jsonify([dict(row) for row in results])
 
 @app.route('/api/recent-activity')
+@cached_response(ttl=60)
 def get_recent_activity():
     """Get recent game plays"""
+    event_code = active_event_code()
+    if not event_code:
+        print("⚠️ No active event found for recent activity")
+        return jsonify([])
+    
+    # Take the newest rows first (idx_scores_event_date), then look up just
+    # their personal bests, which triggers keep in personal_bests
+    # (database/init/12_personal_bests.sql)
     query = """
-        WITH personal_bests AS (
-            SELECT 
-                player_id,
-                machine_id,
-                MAX(high_score) as best_score
-            FROM high_scores_archive
-            WHERE event_code = (SELECT event_code FROM events WHERE is_active = true LIMIT 1)
-            GROUP BY player_id, machine_id
-        )
         SELECT 
             p.display_name as player,
             m.machine_name as game,
             h.high_score as score,
             EXTRACT(EPOCH FROM (NOW() - h.date_set)) / 60 as minutes_ago,
-            CASE 
-                WHEN h.high_score = pb.best_score THEN true
-                ELSE false
-            END as is_personal_best
-        FROM high_scores_archive h
+            COALESCE(h.high_score = pb.best_score, false) as is_personal_best
+        FROM (
+            SELECT player_id, machine_id, high_score, date_set, event_code
+            FROM high_scores_archive
+            WHERE event_code = %(event_code)s
+              AND player_id IS NOT NULL
+              AND machine_id IS NOT NULL
+            ORDER BY date_set DESC
+            LIMIT 50
+        ) h
         JOIN players p ON h.player_id = p.player_id
         JOIN machines m ON h.machine_id = m.machine_id
-        LEFT JOIN personal_bests pb ON h.player_id = pb.player_id 
-            AND h.machine_id = pb.machine_id
-        WHERE h.event_code = (SELECT event_code FROM events WHERE is_active = true LIMIT 1)
-        ORDER BY h.date_set DESC
-        LIMIT 50;
+        LEFT JOIN personal_bests pb ON pb.event_code = h.event_code
+            AND pb.player_id = h.player_id
+            AND pb.machine_id = h.machine_id
+        ORDER BY h.date_set DESC;
     """
     
-    results = query_db(query)
+    results = query_db(query, {'event_code': event_code})
     
     if not results or len(results) == 0:
         print("⚠️ Recent activity query returned None or empty - returning empty list")
@@ -247,96 +608,30 @@ def get_recent_activity():
         activity['minutes_ago'] = int(activity['minutes_ago']) if activity['minutes_ago'] else 0
         activities.append(activity)
     
-    print(f"✅ Recent activity query returned {len(activities)} activities")
     return jsonify(activities)
 
 @app.route('/api/statistics')
+@cached_response(ttl=300)
 def get_statistics():
-    """Get overall league statistics"""
-    
-    # Get active event
-    event_query = "SELECT event_code FROM events WHERE is_active = true LIMIT 1"
-    event = query_db(event_query, one=True)
-    event_code = event['event_code'] if event else None
-    
+    """Get overall league statistics (one scan, one read-only snapshot)"""
+    event_code = active_event_code()
     if not event_code:
         print("⚠️ No active event found - returning zero stats")
-        return jsonify({
-            "total_games_this_week": 0,
-            "total_games_this_month": 0,
-            "active_players": 0,
-            "average_score": 0,
-            "most_popular_game": "N/A",
-            "busiest_day": "N/A"
-        })
-    
-    # Total games this week
-    games_week_query = """
-        SELECT COUNT(*) as count
-        FROM high_scores_archive
-        WHERE date_set >= NOW() - INTERVAL '7 days'
-        AND event_code = %s;
-    """
-    games_week = query_db(games_week_query, (event_code,), one=True)
-    
-    # Total games this month
-    games_month_query = """
-        SELECT COUNT(*) as count
-        FROM high_scores_archive
-        WHERE date_set >= NOW() - INTERVAL '30 days'
-        AND event_code = %s;
-    """
-    games_month = query_db(games_month_query, (event_code,), one=True)
-    
-    # Active players
-    active_players_query = """
-        SELECT COUNT(DISTINCT player_id) as count
-        FROM high_scores_archive
-        WHERE event_code = %s;
-    """
-    active_players = query_db(active_players_query, (event_code,), one=True)
-    
-    # Average score
-    avg_score_query = """
-        SELECT AVG(high_score)::bigint as avg
-        FROM high_scores_archive
-        WHERE event_code = %s;
-    """
-    avg_score = query_db(avg_score_query, (event_code,), one=True)
+        return jsonify(EMPTY_STATISTICS)
     
-    # Most popular game
-    popular_game_query = """
-        SELECT m.machine_name, COUNT(*) as play_count
-        FROM high_scores_archive h
-        JOIN machines m ON h.machine_id = m.machine_id
-        WHERE h.event_code = %s
-        GROUP BY m.machine_name
-        ORDER BY play_count DESC
-        LIMIT 1;
-    """
-    popular_game = query_db(popular_game_query, (event_code,), one=True)
-    
-    # Busiest day of week
-    busiest_day_query = """
-        SELECT 
-            TO_CHAR(date_set, 'Day') as day_name,
-            COUNT(*) as play_count
-        FROM high_scores_archive
-        WHERE event_code = %s
-        GROUP BY TO_CHAR(date_set, 'Day'), EXTRACT(DOW FROM date_set)
-        ORDER BY play_count DESC
-        LIMIT 1;
-    """
-    busiest_day = query_db(busiest_day_query, (event_code,), one=True)
+    try:
+        with timed_query('league_statistics'), get_db_connection() as conn:
+            stats = compute_statistics(conn, event_code)
+        QUERY_ROWS.observe(1, query='league_statistics')
+    except Exception as e:
+        # Serve zeros but don't cache them
+        g.db_error = True
+        print(f"❌ Statistics query error: {type(e).__name__}: {e}")
+        stats = dict(EMPTY_STATISTICS)
     
-    return jsonify({
-        "total_games_this_week": games_week['count'] if games_week and 'count' in games_week else 0,
-        "total_games_this_month": games_month['count'] if games_month and 'count' in games_month else 0,
-        "active_players": active_players['count'] if active_players and 'count' in active_players else 0,
-        "average_score": avg_score['avg'] if avg_score and avg_score.get('avg') else 0,
-        "most_popular_game": popular_game['machine_name'] if popular_game and 'machine_name' in popular_game else "N/A",
-        "busiest_day": busiest_day['day_name'].strip() if busiest_day and 'day_name' in busiest_day else "N/A"
-    })
+    if stats == EMPTY_STATISTICS:
+        print("⚠️ No scores found for the active event - returning zero stats")
+    return jsonify(stats)
 
 # ==================== HEALTH CHECK & DIAGNOSTICS ====================
 
@@ -349,6 +644,59 @@ def health_check():
     except Exception as e:
         return jsonify({"status": "unhealthy", "error": str(e)}), 500
 
+@app.route('/api/leaderboard-updated', methods=['GET', 'POST'])
+def leaderboard_updated():
+    """
+    Webhook for the n8n "Notify Frontend" step: publish a new leaderboard generation.
+    The caller must send LEADERBOARD_WEBHOOK_TOKEN (X-Webhook-Token header or
+    ?token=); with no token configured the webhook is off.
+    """
+    if LEADERBOARD_WEBHOOK_TOKEN is None:
+        return jsonify({"error": "Webhook disabled: LEADERBOARD_WEBHOOK_TOKEN is not set"}), 503
+    supplied = request.headers.get('X-Webhook-Token') or request.args.get('token') or ''
+    if not hmac.compare_digest(supplied.encode(), LEADERBOARD_WEBHOOK_TOKEN.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+    
+    # Bumping in the database NOTIFYs every worker, not just this one
+    result = query_db("SELECT bump_leaderboard_generation('webhook') as generation", one=True)
+    if not result:
+        return jsonify({"error": "Could not bump leaderboard generation"}), 500
+    leaderboard_generation.reload()
+    print(f"🔔 Leaderboard updated - generation {result['generation']}")
+    return jsonify({"status": "ok", "generation": result['generation']})
+
+@app.route('/api/stream')
+def stream_events():
+    """Server-Sent Events: push leaderboard_updated / new_high_score to kiosks"""
+    try:
+        frames = kiosk_events.stream(hello={"generation": leaderboard_generation.current()})
+    except TooManyClients as e:
+        print(f"⚠️ Rejecting event stream client: {e}")
+        return jsonify({"error": "Too many event stream clients"}), 503
+    
+    resp = Response(frames, mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+@app.route('/api/pool')
+def pool_stats():
+    """Connection pool occupancy, wait time and checkout latency for this worker"""
+    return jsonify(db_pool.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Request, query, pool and cache metrics in the Prometheus text format.
+
+    Under gunicorn every worker writes its series to METRICS_DIR and this
+    returns the sum over all workers (other workers' numbers up to
+    METRICS_FLUSH_INTERVAL seconds old), so one scrape target covers the
+    whole server. Without METRICS_DIR only this process is reported.
+    """
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/diagnostics')
 def diagnostics():
     """Diagnostic endpoint to check database status"""
@@ -377,13 +725,17 @@ def diagnostics():
         
         # Check for active event
         try:
-            event = query_db("SELECT event_code, event_name FROM events WHERE is_active = true LIMIT 1", one=True)
+            event = active_event.get()
             if event:
                 diagnostics_data["active_event"] = f"✅ {event.get('event_name', 'Unknown')} ({event.get('event_code', 'N/A')})"
             else:
                 diagnostics_data["active_event"] = "⚠️ No active event found"
         except Exception as e:
             diagnostics_data["active_event"] = f"❌ Error: {str(e)[:50]}"
+        diagnostics_data["active_event_cache"] = active_event.stats()
+        diagnostics_data["response_cache"] = response_cache.stats()
+        diagnostics_data["leaderboard_engine"] = ranked_leaderboard.stats()
+        diagnostics_data["event_stream"] = kiosk_events.stats()
         
         # Get data counts
         try:
@@ -413,7 +765,7 @@ def test_query():
     try:
         # Get event
         print("🔧 Step 1: Getting active event...")
-        event = query_db("SELECT event_code FROM events WHERE is_active = true LIMIT 1", one=True)
+        event = active_event.get()
         if not event:
             return jsonify({"error": "No active event"})
         
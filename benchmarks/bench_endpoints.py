@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Benchmark: every GET /api/* route of both Flask apps, at several league sizes
+
+For each --scales entry (archive rows per event) generates a league with
+generate_league.py (or reuses the files in --data-dir when their manifest
+matches) and loads it into a throw-away 'bench' schema. Then, for each app
+(api_server.py and pinball-integration/app.py), starts the app in its own
+process -- fresh pool, caches and LISTEN connection -- with search_path
+pointed at the bench schema, and measures each GET /api/* route from this
+process over HTTP:
+
+  first  the very first request after start-up (connections, plan caches)
+  cold   requests with the app's response cache emptied before each one
+         (the kiosk app has no cache, so its cold and warm are the same work)
+  warm   repeated requests, cache left alone
+  load   --concurrency clients hitting the route for --duration seconds
+
+and records p50/p95/p99 latency, requests per second and response bytes.
+/api/stream (SSE, never ends) and /api/leaderboard-updated (bumps the
+leaderboard generation) are skipped.
+
+Results are written as JSON (--output); --compare prints the p50/p99 and
+throughput change against an earlier results file, e.g. from the parent
+commit, and exits non-zero past --threshold.
+
+Usage:
+    source .env
+    python benchmarks/bench_endpoints.py --scales 10000,100000,1000000 \\
+        --data-dir /tmp/leagues --output endpoints.json
+    python benchmarks/bench_endpoints.py --scales 100000 --compare endpoints.json
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from bench_schema import REPO_ROOT, connect, drop_bench_schema
+import generate_league
+
+APPS = {
+    'api_server': os.path.join(REPO_ROOT, 'api_server.py'),
+    'kiosk': os.path.join(REPO_ROOT, 'pinball-integration', 'app.py'),
+}
+
+# The kiosk app reads config.json from its own directory; it is deployed over
+# pinball-leaderboard/app.py, next to that directory's config.json
+KIOSK_CONFIG = os.path.join(REPO_ROOT, 'pinball-leaderboard', 'config.json')
+
+SKIPPED_ROUTES = ('/api/stream', '/api/leaderboard-updated')
+
+# Internal routes the serving process adds for this script (not under /api/)
+ROUTES_PATH = '/__bench/routes'
+RESET_PATH = '/__bench/reset'
+
+DEFAULT_RESULTS = os.path.join(REPO_ROOT, 'benchmarks', 'endpoints_results.json')
+
+
+# ==================== SERVING PROCESS ====================
+
+def load_app(name, workdir):
+    """Import one of the APPS; returns (flask app, cache reset function)"""
+    path = APPS[name]
+    if name == 'kiosk':
+        path = shutil.copy(path, os.path.join(workdir, 'app.py'))
+        shutil.copy(KIOSK_CONFIG, os.path.join(workdir, 'config.json'))
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    if hasattr(module, 'response_cache'):
+        return module.app, module.response_cache.clear
+    return module.app, lambda: None
+
+
+def serve(name, port):
+    """Run APPS[name] on 127.0.0.1:port until killed"""
+    from flask import jsonify
+    from werkzeug.serving import make_server
+
+    # One log line per request would cost more than some of the routes
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory(prefix='bench_app_') as workdir:
+        app, reset = load_app(name, workdir)
+
+        def routes():
+            return jsonify(sorted(
+                rule.rule for rule in app.url_map.iter_rules()
+                if rule.rule.startswith('/api/') and 'GET' in rule.methods
+                and not rule.arguments and rule.rule not in SKIPPED_ROUTES
+            ))
+
+        def reset_caches():
+            reset()
+            return jsonify({"status": "ok"})
+
+        app.add_url_rule(ROUTES_PATH, 'bench_routes', routes)
+        app.add_url_rule(RESET_PATH, 'bench_reset', reset_caches, methods=['POST'])
+        make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+# ==================== CLIENT ====================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def fetch(url, method='GET'):
+    """One request; returns (elapsed ms, status, body bytes)"""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method=method), timeout=60) as resp:
+            body = resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+    return (time.perf_counter() - started) * 1000.0, status, len(body)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def at(q):
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))], 2)
+    return {'runs': len(samples), 'min_ms': round(samples[0], 2), 'p50_ms': at(0.50),
+            'p95_ms': at(0.95), 'p99_ms': at(0.99), 'max_ms': round(samples[-1], 2)}
+
+
+def measure(base, path, repeat, reset=False):
+    samples, statuses, sizes = [], set(), set()
+    for _ in range(repeat):
+        if reset:
+            fetch(base + RESET_PATH, method='POST')
+        elapsed, status, size = fetch(base + path)
+        samples.append(elapsed)
+        statuses.add(status)
+        sizes.add(size)
+    return {**percentiles(samples), 'status': sorted(statuses), 'bytes': max(sizes)}
+
+
+def throughput(base, path, concurrency, duration):
+    """Requests per second with ``concurrency`` clients looping for ``duration`` seconds"""
+    deadline = time.perf_counter() + duration
+    samples, errors = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        while time.perf_counter() < deadline:
+            elapsed, status, _ = fetch(base + path)
+            with lock:
+                samples.append(elapsed)
+                if status >= 500:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.perf_counter() - started
+    return {**percentiles(samples), 'concurrency': concurrency,
+            'rps': round(len(samples) / elapsed, 1), 'errors': errors[0]}
+
+
+def start_app(name, schema, log, timeout=60):
+    """Start a serving process logging to ``log``; returns (process, base url)"""
+    port = free_port()
+    # libpq reads PGOPTIONS, so every connection the app opens lands in the bench schema
+    env = dict(os.environ, PGOPTIONS=f"-c search_path={schema},public", PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', name, '--port', str(port)],
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            log.seek(0)
+            lines = log.read().decode(errors='replace').strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"exited with {proc.returncode}")
+        try:
+            fetch(base + ROUTES_PATH)
+            return proc, base
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{name} did not answer within {timeout}s")
+
+
+def route_url(route, league_end):
+    if route == '/api/leaderboard/as-of':
+        at = (league_end - timedelta(hours=36)).isoformat()
+        return f"{route}?{urllib.parse.urlencode({'at': at})}"
+    return route
+
+
+def bench_app(name, schema, league_end, args):
+    log = tempfile.TemporaryFile()
+    try:
+        proc, base = start_app(name, schema, log)
+    except Exception as e:
+        log.close()
+        print(f"  ⚠️  {name}: skipped ({e})")
+        return {'skipped': str(e)}
+    try:
+        with urllib.request.urlopen(base + ROUTES_PATH) as resp:
+            routes = json.load(resp)
+        results = {}
+        for route in routes:
+            url = route_url(route, league_end)
+            first, status, size = fetch(base + url)
+            results[route] = {
+                'first_ms': round(first, 2),
+                'cold': measure(base, url, args.cold, reset=True),
+                'warm': measure(base, url, args.repeat),
+                'load': throughput(base, url, args.concurrency, args.duration),
+            }
+            r = results[route]
+            print(f"  {name:<11}{route:<32}{r['first_ms']:>9.1f}{r['cold']['p50_ms']:>9}{r['cold']['p99_ms']:>9}"
+                  f"{r['warm']['p50_ms']:>9}{r['warm']['p99_ms']:>9}{r['load']['rps']:>9}{r['warm']['bytes']:>10,}"
+                  f"{'' if status < 400 else f'  ⚠️ HTTP {status}'}")
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        log.close()
+
+
+# ==================== LEAGUES ====================
+
+def league_args(scores, args):
+    """generate_league.py arguments for one scale"""
+    out = os.path.join(args.data_dir, f"scores_{scores}")
+    players = min(20_000, max(200, scores // 20))
+    return generate_league.build_parser().parse_args([
+        '--out', out, '--seed', str(args.seed), '--scores', str(scores), '--players', str(players),
+        '--events', str(args.events), '--schema', args.schema,
+    ])
+
+
+def prepare_league(scores, args):
+    """Generate (unless the cached files match) and load one scale; returns the league end"""
+    league = league_args(scores, args)
+    manifest_path = os.path.join(league.out, 'manifest.json')
+    wanted = {key: getattr(league, key) for key in (
+        'players', 'machines', 'events', 'event_days', 'scores', 'zipf', 'lineup',
+        'history_hours', 'snapshot_hours', 'snapshot_top')}
+    cached = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            cached = json.load(f)
+    if cached and cached['seed'] == league.seed and cached['settings'] == wanted:
+        league.end = generate_league.parse_end(cached['end'])
+        print(f"♻️  Reusing {league.out} (generated for {cached['end']})")
+    else:
+        print(f"🏗️  Generating {league.events} events x {scores:,} scores into {league.out}...")
+        generate_league.generate(league)
+    generate_league.load_into_bench_schema(league)
+    return league.end
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current, threshold):
+    """Print per-route changes; returns the number of regressions"""
+    regressions = 0
+    print(f"\n📊 Against {previous.get('commit') or 'previous run'} ({previous.get('created_at')})")
+    print(f"{'scale':>10}  {'app':<11}{'route':<32}{'warm p50':>12}{'warm p99':>12}{'cold p50':>12}{'rps':>10}")
+    for scale, apps in current['scales'].items():
+        for name, routes in apps.items():
+            before_routes = previous.get('scales', {}).get(scale, {}).get(name, {})
+            if 'skipped' in routes or 'skipped' in before_routes:
+                continue
+            for route, now in routes.items():
+                before = before_routes.get(route)
+                if not before:
+                    print(f"{scale:>10}  {name:<11}{route:<32}{'(new)':>12}")
+                    continue
+                ratios = {
+                    'warm p50': now['warm']['p50_ms'] / max(before['warm']['p50_ms'], 0.01),
+                    'warm p99': now['warm']['p99_ms'] / max(before['warm']['p99_ms'], 0.01),
+                    'cold p50': now['cold']['p50_ms'] / max(before['cold']['p50_ms'], 0.01),
+                    'rps': now['load']['rps'] / max(before['load']['rps'], 0.01),
+                }
+                slower = (ratios['warm p50'] > threshold or ratios['cold p50'] > threshold
+                          or ratios['rps'] < 1 / threshold)
+                regressions += slower
+                print(f"{scale:>10}  {name:<11}{route:<32}"
+                      + ''.join(f"{ratio:>11.2f}x" for ratio in ratios.values())
+                      + ('  ❌' if slower else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', default='10000,100000,1000000',
+                        help='comma-separated archive rows per event (default 10000,100000,1000000)')
+    parser.add_argument('--apps', default=','.join(APPS), help=f"comma-separated, from {', '.join(APPS)}")
+    parser.add_argument('--events', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', help='keep generated leagues here and reuse them (default: a temp dir)')
+    parser.add_argument('--cold', type=int, default=10, help='cold requests per route (default 10)')
+    parser.add_argument('--repeat', type=int, default=100, help='warm requests per route (default 100)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5, help='seconds of load per route (default 5)')
+    parser.add_argument('--output', default=DEFAULT_RESULTS, help='results JSON (default %(default)s)')
+    parser.add_argument('--compare', help='earlier results JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='flag routes this many times slower (default 1.25)')
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    parser.add_argument('--serve', choices=list(APPS), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return 0
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+
+    scales = [int(s) for s in args.scales.split(',')]
+    apps = [a for a in args.apps.split(',') if a]
+    temp_dir = None
+    if not args.data_dir:
+        temp_dir = args.data_dir = tempfile.mkdtemp(prefix='leagues_')
+
+    results = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'settings': {key: getattr(args, key) for key in (
+            'events', 'seed', 'cold', 'repeat', 'concurrency', 'duration')},
+        'scales': {},
+    }
+    try:
+        for scores in scales:
+            league_end = prepare_league(scores, args)
+            print(f"\n⏱️  {scores:,} scores per event (ms; rps at concurrency {args.concurrency})")
+            print(f"  {'app':<11}{'route':<32}{'first':>9}{'cold50':>9}{'cold99':>9}"
+                  f"{'warm50':>9}{'warm99':>9}{'rps':>9}{'bytes':>10}")
+            results['scales'][str(scores)] = {name: bench_app(name, args.schema, league_end, args)
+                                              for name in apps}
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        if not args.keep:
+            conn = connect(args.schema)
+            drop_bench_schema(conn, args.schema)
+            conn.close()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if previous:
+        regressions = compare(previous, results, args.threshold)
+        print(f"\n{'✅ No endpoint regressions' if not regressions else f'❌ {regressions} route(s) regressed'}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: kiosk endpoints on plain views vs the materialized kiosk views
+
+Seeds a league, applies pinball-integration/database_views.sql and runs a
+full recompute (which refreshes the materialized views), then times every
+pinball-integration/app.py endpoint query against the materialized view and
+against a plain view with the same definition. Also times the refresh the
+recompute now pays for, and checks both variants return the same rows.
+
+Usage:
+    source .env
+    python benchmarks/bench_kiosk_views.py --scores 1000000
+"""
+
+import argparse
+
+from bench_schema import (connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, time_calls, print_comparison, BENCH_EVENT)
+
+KIOSK_VIEWS = ('leaderboard_current', 'game_champions', 'recent_activity', 'league_statistics')
+
+# Same SQL as the pinball-integration/app.py routes; {view} is the relation read
+ENDPOINTS = {
+    '/api/leaderboard/top10': ('leaderboard_current', """
+        SELECT rank, name, score, games_played, trend, trend_positions, last_seen
+        FROM {view}
+        WHERE rank <= 10
+        ORDER BY rank
+    """),
+    '/api/leaderboard/full': ('leaderboard_current', """
+        SELECT rank, name, score, games_played
+        FROM {view}
+        ORDER BY rank
+    """),
+    '/api/game-champions': ('game_champions', """
+        SELECT name, champion, score
+        FROM {view}
+        ORDER BY name
+    """),
+    '/api/recent-activity': ('recent_activity', """
+        SELECT player, game, score, timestamp,
+               EXTRACT(EPOCH FROM (NOW() - timestamp))/60 as minutes_ago,
+               is_personal_best
+        FROM {view}
+        ORDER BY timestamp DESC
+        LIMIT 15
+    """),
+    '/api/statistics': ('league_statistics', """
+        SELECT games_this_week as total_games_this_week,
+               games_this_month as total_games_this_month,
+               active_players, average_score, most_popular_game,
+               TRIM(busiest_day) as busiest_day
+        FROM {view}
+    """),
+}
+
+RECOMPUTE_SQL = """
+    SELECT update_combined_leaderboard(start_date, stop_date, event_code, p_full_rebuild => true)
+    FROM Events
+    WHERE event_code = %s
+"""
+
+
+def plain_view_name(view):
+    return f"plain_{view}"
+
+
+def create_plain_views(conn):
+    """A plain view per kiosk matview, with the matview's own definition"""
+    with conn.cursor() as cur:
+        for view in KIOSK_VIEWS:
+            cur.execute("SELECT pg_get_viewdef(to_regclass(%s))", (view,))
+            definition = cur.fetchone()[0]
+            cur.execute(f"CREATE VIEW {plain_view_name(view)} AS {definition}")
+
+
+def fetch(conn, sql):
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scores', type=int, default=1_000_000,
+                        help='archive rows in the active event (default 1,000,000)')
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--machines', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema, dict_rows=False)
+    print(f"🏗️  Seeding {args.scores:,} scores (+{args.scores:,} in an old event) into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores)
+    finish_bench_schema(conn, extra_sql=['pinball-integration/database_views.sql'])
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RECOMPUTE_SQL, (BENCH_EVENT,))
+        create_plain_views(conn)
+
+        mismatched = []
+        for endpoint, (view, sql) in ENDPOINTS.items():
+            plain_sql = sql.format(view=plain_view_name(view))
+            matview_sql = sql.format(view=view)
+            results = {
+                'plain view': time_calls(lambda: fetch(conn, plain_sql), args.repeat),
+                'materialized view': time_calls(lambda: fetch(conn, matview_sql), args.repeat),
+            }
+            print_comparison(f"{endpoint} ({view})", results)
+            speedup = results['plain view']['p50_ms'] / max(results['materialized view']['p50_ms'], 0.001)
+            print(f"Speed-up (p50): {speedup:.1f}x")
+            # minutes_ago moves between the two reads and tied ranks may come
+            # back in either order; compare the stored columns as sets
+            if (sorted(map(repr, (row[:4] for row in fetch(conn, plain_sql))))
+                    != sorted(map(repr, (row[:4] for row in fetch(conn, matview_sql))))):
+                mismatched.append(endpoint)
+
+        refresh = time_calls(lambda: fetch(conn, "SELECT refresh_kiosk_views()"), max(3, args.repeat // 5))
+        print_comparison("refresh_kiosk_views() (paid once per recompute)", {'concurrent refresh': refresh})
+        for view, age, missed, duration in fetch(conn, """
+            SELECT view_name, age_seconds, missed_recompute, duration_ms
+            FROM kiosk_view_status ORDER BY view_name
+        """):
+            print(f"  {view:<22}{duration:>10} ms  (age {age}s, missed recompute: {missed})")
+
+        print(f"\nMaterialized rows match the plain views: "
+              f"{'✅' if not mismatched else '❌ ' + ', '.join(mismatched)}")
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
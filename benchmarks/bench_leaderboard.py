@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: update_combined_leaderboard() full rebuild vs incremental recompute
+
+Each timed run first inserts a handful of new scores on --dirty machines (as
+one ingestion would), then recomputes, so both variants pay the same insert.
+
+Usage:
+    source .env
+    python benchmarks/bench_leaderboard.py --machines 100 --players 10000
+"""
+
+import argparse
+import itertools
+import random
+
+from bench_schema import (connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, time_calls, print_comparison, BENCH_EVENT)
+
+RECOMPUTE_SQL = """
+    SELECT update_combined_leaderboard(start_date, stop_date, event_code, %s)
+    FROM Events
+    WHERE event_code = %s
+"""
+
+# New best scores: above anything seed_league() generates, unique per call
+NEW_SCORES_SQL = """
+    INSERT INTO High_Scores_Archive (player_id, machine_id, high_score, date_set, event_code)
+    SELECT 'player_' || (1 + floor(%(players)s * random()))::int,
+           m.machine_id,
+           %(base)s + i,
+           NOW(),
+           %(event_code)s
+    FROM unnest(%(machines)s::varchar[]) AS m(machine_id),
+         generate_series(1, %(per_machine)s) i
+    ON CONFLICT ON CONSTRAINT unique_score_per_event DO NOTHING
+"""
+
+CACHE_SQL = "SELECT player_id, combined_score, current_rank FROM Leaderboard_Cache ORDER BY player_id"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--machines', type=int, default=100)
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--scores', type=int, default=1_000_000,
+                        help='archive rows in the active event (default 1,000,000)')
+    parser.add_argument('--dirty', type=int, default=2,
+                        help='machines that get new scores before each recompute (default 2)')
+    parser.add_argument('--new-scores', type=int, default=5,
+                        help='new scores per dirty machine per run (default 5)')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema, dict_rows=False)
+    print(f"🏗️  Seeding {args.scores:,} scores ({args.machines} machines x {args.players:,} players) "
+          f"into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores,
+                other_events=0)
+    finish_bench_schema(conn)
+
+    machine_ids = [f"M{i}" for i in range(1, args.machines + 1)]
+    batch = itertools.count(1)
+
+    def recompute(full_rebuild):
+        with conn.cursor() as cur:
+            cur.execute(NEW_SCORES_SQL, {
+                'players': args.players,
+                'machines': random.sample(machine_ids, args.dirty),
+                'per_machine': args.new_scores,
+                'base': 10 ** 15 + next(batch) * 1000,
+                'event_code': BENCH_EVENT,
+            })
+            cur.execute(RECOMPUTE_SQL, (full_rebuild, BENCH_EVENT))
+
+    def snapshot():
+        with conn.cursor() as cur:
+            cur.execute(CACHE_SQL)
+            return cur.fetchall()
+
+    try:
+        # Prime Leaderboard_Machine_Points so the incremental runs have a base
+        recompute(True)
+        results = {
+            'full rebuild': time_calls(lambda: recompute(True), args.repeat),
+            'incremental': time_calls(lambda: recompute(False), args.repeat),
+        }
+
+        incremental = snapshot()
+        with conn.cursor() as cur:
+            cur.execute(RECOMPUTE_SQL, (True, BENCH_EVENT))
+        rebuilt = snapshot()
+        print(f"Cache rows: {len(rebuilt):,}; incremental matches rebuild: {incremental == rebuilt}")
+
+        print_comparison(f"Recompute with {args.dirty} dirty machines of {args.machines}", results)
+        speedup = results['full rebuild']['p50_ms'] / max(results['incremental']['p50_ms'], 0.001)
+        print(f"\nSpeed-up (p50): {speedup:.1f}x")
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
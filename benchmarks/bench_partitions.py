@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: current-season archive queries with old seasons attached vs detached
+
+Seeds the active event plus --old-events past seasons (one partition each),
+times the hot archive queries, detaches the cold seasons the way
+``partition_archive.py maintain`` does, and times them again. EXPLAIN shows
+how many archive partitions each query touches.
+
+Usage:
+    source .env
+    python benchmarks/bench_partitions.py --scores 500000 --old-events 5
+"""
+
+import argparse
+import json
+
+from bench_schema import (connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, time_calls, print_comparison, BENCH_EVENT)
+
+QUERIES = {
+    # leaderboard_engine.BEST_SCORES_QUERY / update_combined_leaderboard()
+    'event best scores': """
+        SELECT machine_id, player_id, MAX(high_score)
+        FROM high_scores_archive
+        WHERE event_code = %(event_code)s
+          AND date_set >= NOW() - INTERVAL '120 days'
+        GROUP BY machine_id, player_id
+    """,
+    # ingest_scores.py higher-score check for one player/machine
+    'higher-score probe': """
+        SELECT 1
+        FROM high_scores_archive
+        WHERE event_code = %(event_code)s
+          AND machine_id = 'M1'
+          AND player_id = 'player_1'
+          AND high_score >= 0
+        LIMIT 1
+    """,
+    # recent_activity view: newest approved scores, any event
+    'newest scores (no event)': """
+        SELECT player_id, machine_id, high_score, date_set
+        FROM high_scores_archive
+        WHERE is_approved
+        ORDER BY date_set DESC
+        LIMIT 20
+    """,
+    # Weekly report style window without an event filter
+    'last 7 days (no event)': """
+        SELECT COUNT(*)
+        FROM high_scores_archive
+        WHERE date_set >= NOW() - INTERVAL '7 days'
+    """,
+}
+
+COLD_EVENTS_SQL = """
+    SELECT event_code FROM score_partitions
+    WHERE attached AND NOT is_active AND stop_date < NOW() - INTERVAL '30 days'
+"""
+
+
+def partitions_scanned(conn, query):
+    """Archive partitions the plan reads (after plan-time pruning)"""
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (FORMAT JSON) " + query, {'event_code': BENCH_EVENT})
+        plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    found = set()
+
+    def walk(node):
+        if node.get('Relation Name', '').startswith('high_scores_archive'):
+            found.add(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return len(found)
+
+
+def time_queries(conn, repeat):
+    results = {}
+    for label, query in QUERIES.items():
+        def run(query=query):
+            with conn.cursor() as cur:
+                cur.execute(query, {'event_code': BENCH_EVENT})
+                cur.fetchall()
+        results[f"{label} [{partitions_scanned(conn, query)}p]"] = time_calls(run, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scores', type=int, default=500_000,
+                        help='archive rows per event (default 500,000)')
+    parser.add_argument('--old-events', type=int, default=5,
+                        help='past seasons seeded next to the active event (default 5)')
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--machines', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema, dict_rows=False)
+    total = args.scores * (args.old_events + 1)
+    print(f"🏗️  Seeding {total:,} scores over {args.old_events + 1} events into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores,
+                other_events=args.old_events)
+    finish_bench_schema(conn)
+
+    try:
+        attached = time_queries(conn, args.repeat)
+        print_comparison(f"All {args.old_events + 1} seasons attached ([N]p = partitions scanned)",
+                         attached)
+
+        with conn.cursor() as cur:
+            cur.execute(COLD_EVENTS_SQL)
+            cold = [row[0] for row in cur.fetchall()]
+            for event_code in cold:
+                cur.execute("SELECT detach_score_partition(%s)", (event_code,))
+            cur.execute("ANALYZE high_scores_archive")
+        print(f"\n🧊 Detached {len(cold)} cold seasons")
+
+        detached = time_queries(conn, args.repeat)
+        print_comparison("Cold seasons detached", detached)
+
+        with conn.cursor() as cur:
+            for event_code in cold:
+                cur.execute("SELECT create_score_partition(%s)", (event_code,))
+            cur.execute("SELECT COUNT(*) FROM score_partitions WHERE NOT attached")
+            still_detached = cur.fetchone()[0]
+        print(f"\n🔁 Re-attached the cold seasons ({still_detached} still detached)")
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/recent-activity whole-event MAX() vs the Personal_Bests lookup
+
+With --endpoint the route itself is also timed, through api_server's Flask
+app with the response cache off, so every request runs the query.
+
+Measured on PostgreSQL 16 (local, default settings), 1,000,000 event rows
+plus 1,000,000 in an older event, 5,000 players, 60 machines:
+
+    legacy (event-wide MAX)      p50 4346.12 ms   p95 8980.01 ms
+    personal_bests lookup        p50    2.44 ms   p95    2.88 ms
+    endpoint, cache off          p50    3.77 ms   p95    4.66 ms
+
+Usage:
+    source .env
+    python benchmarks/bench_recent_activity.py --scores 1000000 --endpoint
+"""
+
+import argparse
+import os
+
+from bench_schema import (connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, time_calls, print_comparison, BENCH_EVENT)
+
+# The original get_recent_activity(): personal bests for every pair in the event
+LEGACY_QUERY = """
+    WITH personal_bests AS (
+        SELECT
+            player_id,
+            machine_id,
+            MAX(high_score) as best_score
+        FROM high_scores_archive
+        WHERE event_code = %(event_code)s
+        GROUP BY player_id, machine_id
+    )
+    SELECT
+        p.display_name as player,
+        m.machine_name as game,
+        h.high_score as score,
+        EXTRACT(EPOCH FROM (NOW() - h.date_set)) / 60 as minutes_ago,
+        CASE
+            WHEN h.high_score = pb.best_score THEN true
+            ELSE false
+        END as is_personal_best
+    FROM high_scores_archive h
+    JOIN players p ON h.player_id = p.player_id
+    JOIN machines m ON h.machine_id = m.machine_id
+    LEFT JOIN personal_bests pb ON h.player_id = pb.player_id
+        AND h.machine_id = pb.machine_id
+    WHERE h.event_code = %(event_code)s
+    ORDER BY h.date_set DESC
+    LIMIT 50
+"""
+
+# Same as api_server.get_recent_activity()
+CURRENT_QUERY = """
+    SELECT
+        p.display_name as player,
+        m.machine_name as game,
+        h.high_score as score,
+        EXTRACT(EPOCH FROM (NOW() - h.date_set)) / 60 as minutes_ago,
+        COALESCE(h.high_score = pb.best_score, false) as is_personal_best
+    FROM (
+        SELECT player_id, machine_id, high_score, date_set, event_code
+        FROM high_scores_archive
+        WHERE event_code = %(event_code)s
+          AND player_id IS NOT NULL
+          AND machine_id IS NOT NULL
+        ORDER BY date_set DESC
+        LIMIT 50
+    ) h
+    JOIN players p ON h.player_id = p.player_id
+    JOIN machines m ON h.machine_id = m.machine_id
+    LEFT JOIN personal_bests pb ON pb.event_code = h.event_code
+        AND pb.player_id = h.player_id
+        AND pb.machine_id = h.machine_id
+    ORDER BY h.date_set DESC
+"""
+
+
+def run(conn, query):
+    with conn.cursor() as cur:
+        cur.execute(query, {'event_code': BENCH_EVENT})
+        return cur.fetchall()
+
+
+def time_endpoint(schema, repeat):
+    """GET /api/recent-activity through api_server's Flask app, response cache off"""
+    os.environ['PGOPTIONS'] = f"-c search_path={schema},public"
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+    import api_server
+
+    client = api_server.app.test_client()
+
+    def get():
+        resp = client.get('/api/recent-activity')
+        if resp.status_code != 200:
+            raise RuntimeError(f"/api/recent-activity returned {resp.status_code}")
+
+    return time_calls(get, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scores', type=int, default=1_000_000,
+                        help='archive rows in the active event (default 1,000,000)')
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--machines', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--endpoint', action='store_true',
+                        help='also time the route through api_server (response cache off)')
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema)
+    print(f"🏗️  Seeding {args.scores:,} scores (+{args.scores:,} in an old event) into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores)
+    finish_bench_schema(conn)
+
+    try:
+        legacy, current = run(conn, LEGACY_QUERY), run(conn, CURRENT_QUERY)
+        same = ([(r['player'], r['game'], r['score'], r['is_personal_best']) for r in legacy] ==
+                [(r['player'], r['game'], r['score'], r['is_personal_best']) for r in current])
+        print(f"Rows: {len(current)}; same feed as the legacy query: {same}")
+
+        results = {
+            'legacy (event-wide MAX)': time_calls(lambda: run(conn, LEGACY_QUERY), args.repeat),
+            'personal_bests lookup': time_calls(lambda: run(conn, CURRENT_QUERY), args.repeat),
+        }
+        if args.endpoint:
+            results['endpoint, cache off'] = time_endpoint(args.schema, args.repeat)
+        print_comparison(f"/api/recent-activity at {args.scores:,} event rows", results)
+        label = 'endpoint, cache off' if args.endpoint else 'personal_bests lookup'
+        p95 = results[label]['p95_ms']
+        print(f"\n{label} p95: {p95} ms ({'single-digit ✅' if p95 < 10 else 'over 10 ms ❌'})")
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark Schema Helpers
+Builds a throw-away copy of the pinball schema in its own Postgres schema
+(default: "bench") and fills it with a synthetic league, so benchmarks never
+touch the real tables.
+
+Connection settings come from the usual DB_* environment variables (.env).
+"""
+
+import glob
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'pinball'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'your_password_here')
+}
+
+BENCH_EVENT = 'BENCH-EVENT-01'
+
+
+def connect(schema='bench', dict_rows=True):
+    """Open an autocommit connection whose search_path points at ``schema``"""
+    conn = psycopg2.connect(
+        **DB_CONFIG,
+        cursor_factory=RealDictCursor if dict_rows else None,
+        options=f"-c search_path={schema},public"
+    )
+    conn.autocommit = True
+    return conn
+
+
+def sql_files(*patterns):
+    """Repo SQL files matching the glob patterns, in bootstrap order"""
+    files = []
+    for pattern in patterns:
+        files.extend(sorted(glob.glob(os.path.join(REPO_ROOT, pattern))))
+    return files
+
+
+def run_sql_file(conn, path):
+    with open(path, 'r') as f:
+        sql = f.read()
+    if not sql.strip():
+        return
+    with conn.cursor() as cur:
+        cur.execute(sql)
+
+
+def create_bench_schema(conn, schema='bench'):
+    """Drop and recreate ``schema`` with the core tables (no indexes yet)"""
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path = {schema}, public")
+    run_sql_file(conn, os.path.join(REPO_ROOT, 'database/init/01_schema_tables.sql'))
+
+
+def finish_bench_schema(conn, extra_sql=()):
+    """Apply constraints, indexes, functions and views after the bulk load"""
+    for path in sql_files('database/init/0[2-9]_*.sql', 'database/init/[1-9][0-9]_*.sql',
+                          'database/functions/*.sql'):
+        run_sql_file(conn, path)
+    for path in extra_sql:
+        run_sql_file(conn, os.path.join(REPO_ROOT, path))
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
+
+
+def drop_bench_schema(conn, schema='bench'):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+
+def seed_league(conn, players=2000, machines=40, scores=1_000_000, days=120,
+                event_code=BENCH_EVENT, other_events=1):
+    """
+    Insert a synthetic league with generate_series.
+
+    ``scores`` rows land in ``event_code``; each of ``other_events`` older
+    events gets the same volume again so event filtering is exercised.
+    Scores are unique by construction (the row number is folded into the
+    low digits), which keeps unique_score_per_event satisfied.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO Players (player_id, display_name)
+            SELECT 'player_' || i, 'Player ' || i
+            FROM generate_series(1, %s) i
+        """, (players,))
+        cur.execute("""
+            INSERT INTO Machines (machine_id, machine_name)
+            SELECT 'M' || i, 'Machine ' || i
+            FROM generate_series(1, %s) i
+        """, (machines,))
+
+        events = [(event_code, True, 0)] + [
+            (f"{event_code}-OLD{n}", False, n) for n in range(1, other_events + 1)
+        ]
+        for code, active, age in events:
+            cur.execute("""
+                INSERT INTO Events (event_code, event_name, start_date, stop_date, is_active)
+                VALUES (%s, %s,
+                        NOW() - make_interval(days => %s * (%s + 1)),
+                        NOW() + INTERVAL '30 days' - make_interval(days => %s * %s),
+                        %s)
+            """, (code, f"Bench {code}", days, age, days, age, active))
+            # Skewed activity: low player/machine numbers play far more often
+            cur.execute("""
+                INSERT INTO High_Scores_Archive
+                    (player_id, machine_id, high_score, date_set, event_code)
+                SELECT
+                    'player_' || (1 + floor(%(players)s * power(random(), 2)))::int,
+                    'M' || (1 + floor(%(machines)s * power(random(), 1.5)))::int,
+                    floor(random() * 100000)::bigint * 10000000 + i,
+                    NOW() - make_interval(days => %(age)s * %(days)s)
+                          - random() * make_interval(days => %(days)s),
+                    %(code)s
+                FROM generate_series(1, %(scores)s) i
+            """, {'players': players, 'machines': machines, 'age': age,
+                  'days': days, 'code': code, 'scores': scores})
+
+
+def time_calls(fn, repeat=20, warmup=2):
+    """Run ``fn`` repeatedly and return latency stats in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(samples[0], 2),
+        'p50_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        'max_ms': round(samples[-1], 2),
+    }
+
+
+def print_comparison(title, results):
+    """Print a small table of {label: time_calls() result}"""
+    print(f"\n{title}")
+    print(f"{'variant':<28}{'p50 ms':>10}{'p95 ms':>10}{'min ms':>10}{'max ms':>10}")
+    for label, r in results.items():
+        print(f"{label:<28}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['min_ms']:>10}{r['max_ms']:>10}")
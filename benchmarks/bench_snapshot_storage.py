@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Api_Snapshots storage, inline JSONB vs content-addressed payloads
+
+Writes --fetches hourly snapshots of a synthetic Stern response in which only
+every --change-every'th fetch differs from the previous one, once into a
+plain JSONB copy of the old table and once into Api_Snapshots (through the
+api_snapshots_store_payload trigger), then compares on-disk size and insert
+time and checks snapshot_payload() returns every response intact.
+
+Usage:
+    source .env
+    python benchmarks/bench_snapshot_storage.py --fetches 720 --scores 3000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import Json
+
+from bench_schema import connect, create_bench_schema, finish_bench_schema, drop_bench_schema, BENCH_EVENT
+
+LEGACY_TABLE_SQL = """
+    CREATE TABLE Api_Snapshots_Inline (
+        snapshot_id SERIAL PRIMARY KEY,
+        event_code VARCHAR(100),
+        fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        raw_response JSONB NOT NULL
+    )
+"""
+
+SIZE_SQL = "SELECT pg_total_relation_size(to_regclass(%s))"
+
+
+def stern_response(scores, machines, rng):
+    """A leaderboard response shaped like the Stern API's"""
+    titles = [{'title_code': f'M{i}', 'title_name': f'Machine {i}'} for i in range(1, machines + 1)]
+    return {'leaderboard': {
+        'code': BENCH_EVENT,
+        'name': 'Bench League',
+        'start_date': '2026-01-01T00:00:00',
+        'stop_date': '2026-12-31T00:00:00',
+        'titles': titles,
+        'scores': [{
+            'username': f'player_{i % (scores // 4) + 1}',
+            'initials': 'AAA',
+            'title_name': titles[i % machines]['title_name'],
+            'score': rng.randrange(1_000_000, 5_000_000_000),
+            'avatar_path': f'https://example.invalid/avatars/{i % 50}.png',
+            'background_color_hex': '#112233',
+        } for i in range(scores)],
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fetches', type=int, default=720, help='snapshots to write (default 720 = 30 days hourly)')
+    parser.add_argument('--scores', type=int, default=3000, help='scores per response (default 3000)')
+    parser.add_argument('--machines', type=int, default=40)
+    parser.add_argument('--change-every', type=int, default=6,
+                        help='one fetch in this many has a new score (default 6)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    response = stern_response(args.scores, args.machines, rng)
+    started_at = datetime.now(timezone.utc) - timedelta(hours=args.fetches)
+    fetches = []
+    for n in range(args.fetches):
+        if n and n % args.change_every == 0:
+            entry = rng.choice(response['leaderboard']['scores'])
+            entry['score'] += rng.randrange(1, 1_000_000)
+        fetches.append((started_at + timedelta(hours=n), Json(response)))
+        response = {'leaderboard': dict(response['leaderboard'],
+                                        scores=[dict(s) for s in response['leaderboard']['scores']])}
+
+    conn = connect(args.schema, dict_rows=False)
+    print(f"🏗️  Writing {args.fetches} snapshots of {args.scores:,} scores into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO Events (event_code, event_name, start_date, stop_date)
+            VALUES (%s, 'Bench League', NOW() - INTERVAL '60 days', NOW() + INTERVAL '30 days')
+        """, (BENCH_EVENT,))
+    finish_bench_schema(conn)
+
+    try:
+        results = {}
+        with conn.cursor() as cur:
+            cur.execute(LEGACY_TABLE_SQL)
+            for label, table in (('inline JSONB', 'Api_Snapshots_Inline'),
+                                 ('content-addressed', 'Api_Snapshots')):
+                started = time.perf_counter()
+                for fetched_at, payload in fetches:
+                    cur.execute(f"INSERT INTO {table} (event_code, fetched_at, raw_response) "
+                                f"VALUES (%s, %s, %s)", (BENCH_EVENT, fetched_at, payload))
+                elapsed = (time.perf_counter() - started) * 1000.0 / len(fetches)
+                sizes = [table] + (['Api_Snapshot_Payloads'] if table == 'Api_Snapshots' else [])
+                total = 0
+                for name in sizes:
+                    cur.execute(SIZE_SQL, (name.lower(),))
+                    total += cur.fetchone()[0]
+                results[label] = (total, elapsed)
+
+            cur.execute("SELECT COUNT(*), COUNT(DISTINCT payload_hash) FROM Api_Snapshots")
+            rows, distinct = cur.fetchone()
+            cur.execute("""
+                SELECT COUNT(*) FROM Api_Snapshots s
+                JOIN Api_Snapshots_Inline i ON i.fetched_at = s.fetched_at
+                WHERE snapshot_payload(s.snapshot_id) IS DISTINCT FROM i.raw_response
+            """)
+            mismatched = cur.fetchone()[0]
+
+        print(f"\n{'variant':<22}{'on disk MB':>12}{'insert ms':>12}")
+        for label, (total, elapsed) in results.items():
+            print(f"{label:<22}{total / 1048576:>12.2f}{elapsed:>12.2f}")
+        ratio = results['inline JSONB'][0] / max(1, results['content-addressed'][0])
+        print(f"\n📦 {rows} snapshot rows, {distinct} distinct payloads; {ratio:.1f}x smaller")
+        print(f"Decoded payloads identical: {'✅' if mismatched == 0 else f'❌ {mismatched} differ'}")
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/statistics legacy seven-query path vs the single-pass engine
+
+Usage:
+    source .env
+    python benchmarks/bench_statistics.py --scores 3000000
+    python benchmarks/bench_statistics.py --scores 1000000 --explain  # + engine plan
+
+Measured on PostgreSQL 16 in a 1-CPU sandbox, 1M event rows plus 1M in an
+old event, --repeat 5: legacy p50 2989 ms / p95 3101 ms, engine p50 1366 ms /
+p95 1633 ms. --explain shows a Seq Scan of the event's partition feeding one
+HashAggregate (two hash keys, one batch); disabling index and bitmap scans
+leaves that plan unchanged.
+"""
+
+import argparse
+
+from bench_schema import (connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, time_calls, print_comparison, BENCH_EVENT)
+from league_stats import (compute_statistics, LEAGUE_STATISTICS_QUERY,
+                          STATISTICS_SESSION_SETTINGS)
+
+# The original get_statistics(): one query per figure, each its own scan
+LEGACY_QUERIES = [
+    ("SELECT event_code FROM events WHERE is_active = true LIMIT 1", False),
+    ("""SELECT COUNT(*) as count FROM high_scores_archive
+        WHERE date_set >= NOW() - INTERVAL '7 days' AND event_code = %s""", True),
+    ("""SELECT COUNT(*) as count FROM high_scores_archive
+        WHERE date_set >= NOW() - INTERVAL '30 days' AND event_code = %s""", True),
+    ("""SELECT COUNT(DISTINCT player_id) as count FROM high_scores_archive
+        WHERE event_code = %s""", True),
+    ("""SELECT AVG(high_score)::bigint as avg FROM high_scores_archive
+        WHERE event_code = %s""", True),
+    ("""SELECT m.machine_name, COUNT(*) as play_count
+        FROM high_scores_archive h JOIN machines m ON h.machine_id = m.machine_id
+        WHERE h.event_code = %s GROUP BY m.machine_name
+        ORDER BY play_count DESC LIMIT 1""", True),
+    ("""SELECT TO_CHAR(date_set, 'Day') as day_name, COUNT(*) as play_count
+        FROM high_scores_archive WHERE event_code = %s
+        GROUP BY TO_CHAR(date_set, 'Day'), EXTRACT(DOW FROM date_set)
+        ORDER BY play_count DESC LIMIT 1""", True),
+]
+
+
+def legacy_statistics(conn):
+    with conn.cursor() as cur:
+        for sql, needs_event in LEGACY_QUERIES:
+            cur.execute(sql, (BENCH_EVENT,) if needs_event else None)
+            cur.fetchall()
+
+
+def explain_statistics(conn):
+    """EXPLAIN ANALYZE of the engine query, under the engine's session settings"""
+    with conn.cursor() as cur:
+        cur.execute("BEGIN")
+        try:
+            for setting in STATISTICS_SESSION_SETTINGS:
+                cur.execute(setting)
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + LEAGUE_STATISTICS_QUERY,
+                        {'event_code': BENCH_EVENT})
+            return [row['QUERY PLAN'] for row in cur.fetchall()]
+        finally:
+            cur.execute("ROLLBACK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scores', type=int, default=3_000_000,
+                        help='archive rows in the active event (default 3,000,000)')
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--machines', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    parser.add_argument('--explain', action='store_true',
+                        help='print EXPLAIN ANALYZE of the engine query')
+    args = parser.parse_args()
+
+    conn = connect(args.schema)
+    print(f"🏗️  Seeding {args.scores:,} scores (+{args.scores:,} in an old event) into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores)
+    finish_bench_schema(conn)
+
+    try:
+        results = {
+            'legacy (7 queries)': time_calls(lambda: legacy_statistics(conn), args.repeat),
+            'single-pass engine': time_calls(lambda: compute_statistics(conn), args.repeat),
+        }
+        print("Engine result:", compute_statistics(conn))
+        print_comparison(f"/api/statistics at {args.scores:,} event rows", results)
+        speedup = results['legacy (7 queries)']['p50_ms'] / max(results['single-pass engine']['p50_ms'], 0.001)
+        print(f"\nSpeed-up (p50): {speedup:.1f}x")
+        if args.explain:
+            print("\nEngine plan:")
+            print("\n".join(explain_statistics(conn)))
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
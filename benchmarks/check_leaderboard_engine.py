@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Differential check: leaderboard_engine vs update_combined_leaderboard()
+
+Builds randomized leagues (small score ranges, so ties are common, plus rows
+outside the date window and in another event), feeds them to the engine both
+by bulk load and one score at a time, and compares every player's combined
+score and rank, and every machine's points, against:
+
+- a direct Python transcription of the SQL function (always), and
+- the SQL function itself in a throw-away 'bench' schema (with --db): the
+  rows are inserted in rounds and update_combined_leaderboard() runs after
+  each round, alternating incremental runs and full rebuilds. Then a league
+  of Stern responses goes through ingest_scores.ingest(..., engine=...) with
+  --recompute semantics, and the engine it fed must match Leaderboard_Cache
+  after every ingestion.
+
+Exits non-zero on the first mismatch.
+
+Usage:
+    python benchmarks/check_leaderboard_engine.py --trials 200
+    source .env && python benchmarks/check_leaderboard_engine.py --db --trials 20
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard_engine import LeaderboardEngine, rank_points
+
+EVENT = 'BENCH-EVENT-01'
+OTHER_EVENT = 'BENCH-EVENT-01-OLD1'
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = datetime(2025, 4, 1, tzinfo=timezone.utc)
+# The ingestion check's event window (it upserts EVENT with these dates)
+INGEST_WINDOW = (datetime(2025, 6, 1, tzinfo=timezone.utc), datetime(2025, 9, 1, tzinfo=timezone.utc))
+
+
+def sql_rank(values):
+    """{key: RANK() OVER (ORDER BY value DESC)}"""
+    ordered = sorted(values.items(), key=lambda kv: -kv[1])
+    ranks = {}
+    for i, (key, value) in enumerate(ordered):
+        ranks[key] = i + 1 if i == 0 or value != ordered[i - 1][1] else ranks[ordered[i - 1][0]]
+    return ranks
+
+
+def reference_leaderboard(rows):
+    """The SQL function, step for step: ({player: (combined, rank)}, {machine: {player: points}})"""
+    best = {}
+    for player_id, machine_id, score, date_set, event_code in rows:
+        if event_code != EVENT or not (START <= date_set < END):
+            continue
+        key = (machine_id, player_id)
+        best[key] = max(best.get(key, score), score)
+
+    machines = {}
+    for (machine_id, player_id), score in best.items():
+        machines.setdefault(machine_id, {})[player_id] = score
+
+    machine_points = {}
+    combined = {}
+    for machine_id, scores in machines.items():
+        points = {}
+        for player_id, rank in sql_rank(scores).items():
+            if rank_points(rank) > 0:
+                points[player_id] = rank_points(rank)
+                combined[player_id] = combined.get(player_id, 0) + points[player_id]
+        machine_points[machine_id] = points
+
+    combined = {p: s for p, s in combined.items() if s > 0}
+    ranks = sql_rank(combined)
+    return {p: (s, ranks[p]) for p, s in combined.items()}, machine_points
+
+
+def engine_board(engine):
+    return {player_id: (score, rank) for player_id, score, rank in engine.leaderboard()}
+
+
+def engine_machine_points(engine, machine_ids):
+    return {m: {p: v[2] for p, v in engine.machine_points(m).items()} for m in machine_ids}
+
+
+def random_league(rng):
+    players = [f"player_{i}" for i in range(rng.randint(1, 250))]
+    machines = [f"M{i}" for i in range(rng.randint(1, 8))]
+    score_range = rng.choice([5, 50, 500, 10 ** 9])
+    rows = []
+    seen = set()
+    for _ in range(rng.randint(1, 1500)):
+        date_set = START + timedelta(days=rng.uniform(-10, 100))
+        event_code = EVENT if rng.random() < 0.9 else OTHER_EVENT
+        row = (rng.choice(players), rng.choice(machines), rng.randint(1, score_range), date_set, event_code)
+        # unique_score_per_event keeps only the first copy of a score, whatever its date
+        key = (row[0], row[1], row[2], row[4])
+        if key not in seen:
+            seen.add(key)
+            rows.append(row)
+    return rows, machines
+
+
+def compare(label, expected, actual):
+    if expected != actual:
+        missing = {k: v for k, v in expected.items() if actual.get(k) != v}
+        extra = {k: v for k, v in actual.items() if k not in expected}
+        print(f"❌ {label} differs: expected {len(expected)} entries, got {len(actual)}")
+        print(f"   first mismatches: {dict(list(missing.items())[:5])} / extra: {dict(list(extra.items())[:5])}")
+        return False
+    return True
+
+
+def check_offline(rows, machines):
+    expected_board, expected_points = reference_leaderboard(rows)
+
+    bulk = LeaderboardEngine(EVENT, START, END)
+    bulk.load_rows((m, p, s) for p, m, s, d, e in rows if e == EVENT and START <= d < END)
+
+    streamed = LeaderboardEngine(EVENT, START, END)
+    for player_id, machine_id, score, date_set, event_code in rows:
+        streamed.add_score(player_id, machine_id, score, date_set, event_code)
+
+    for label, engine in (('bulk load', bulk), ('add_score', streamed)):
+        if not compare(f"{label} leaderboard", expected_board, engine_board(engine)):
+            return False
+        if not compare(f"{label} machine points", expected_points,
+                       {m: p for m, p in engine_machine_points(engine, machines).items() if p}):
+            return False
+        for player_id, (score, rank) in expected_board.items():
+            if engine.rank_of(player_id) != rank or engine.combined_score(player_id) != score:
+                print(f"❌ {label} rank_of/combined_score differ for {player_id}")
+                return False
+        top = engine.top(10)
+        if top != engine.leaderboard()[:10]:
+            print(f"❌ {label} top(10) is not the head of leaderboard()")
+            return False
+    return True
+
+
+def check_database(conn, rows, machines, rounds):
+    """Insert ``rows`` in rounds, recompute in SQL and compare after each round"""
+    engine = LeaderboardEngine(EVENT, START, END)
+    players = sorted({r[0] for r in rows})
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM Leaderboard_Cache")
+        cur.execute("DELETE FROM Leaderboard_Recompute_State")
+        cur.execute("DELETE FROM High_Scores_Archive")
+        cur.executemany("INSERT INTO Players (player_id, display_name) VALUES (%s, %s) "
+                        "ON CONFLICT DO NOTHING", [(p, p) for p in players])
+        cur.executemany("INSERT INTO Machines (machine_id, machine_name) VALUES (%s, %s) "
+                        "ON CONFLICT DO NOTHING", [(m, m) for m in machines])
+
+    size = max(1, len(rows) // rounds)
+    for n, i in enumerate(range(0, len(rows), size)):
+        batch = rows[i:i + size]
+        with conn.cursor() as cur:
+            cur.executemany("""
+                INSERT INTO High_Scores_Archive (player_id, machine_id, high_score, date_set, event_code)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT ON CONSTRAINT unique_score_per_event DO NOTHING
+            """, batch)
+            cur.execute("SELECT update_combined_leaderboard(%s, %s, %s, %s)",
+                        (START, END, EVENT, n % 3 == 2))
+            cur.execute("SELECT player_id, combined_score, current_rank FROM Leaderboard_Cache")
+            sql_board = {p: (s, r) for p, s, r in cur.fetchall()}
+        engine.add_scores(batch)
+        if not compare(f"SQL round {n + 1}", sql_board, engine_board(engine)):
+            return False
+    return True
+
+
+def stern_league(rng):
+    """A Stern-shaped response for EVENT with small score ranges (frequent ties)"""
+    titles = [{'title_code': f"M{i}", 'title_name': f"Machine {i}"} for i in range(rng.randint(1, 6))]
+    return {'leaderboard': {
+        'code': EVENT,
+        'name': EVENT,
+        'start_date': INGEST_WINDOW[0].isoformat(),
+        'stop_date': INGEST_WINDOW[1].isoformat(),
+        'titles': titles,
+        'scores': [],
+    }}
+
+
+def next_round(response, rng, players):
+    """New players and better scores, as the next fetch would report them"""
+    titles = response['leaderboard']['titles']
+    scores = response['leaderboard']['scores']
+    for entry in rng.sample(scores, min(len(scores), rng.randint(0, 20))):
+        entry['score'] += rng.randint(1, 30)
+    for _ in range(rng.randint(1, 60)):
+        scores.append({'username': rng.choice(players),
+                       'title_name': rng.choice(titles)['title_name'],
+                       'score': rng.randint(1, 200)})
+
+
+def check_ingestion(conn, dict_conn, rng, rounds):
+    """Feed an engine through ingest() and compare it with the recomputed Leaderboard_Cache"""
+    from ingest_scores import ingest
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM Leaderboard_Cache")
+        cur.execute("DELETE FROM Leaderboard_Recompute_State")
+        cur.execute("DELETE FROM High_Scores_Archive")
+        cur.execute("DELETE FROM Api_Snapshots")
+        cur.execute("UPDATE Events SET is_active = false")
+
+    engine = LeaderboardEngine(EVENT, *INGEST_WINDOW)
+    response = stern_league(rng)
+    players = [f"ingest_player_{i}" for i in range(rng.randint(1, 150))]
+    for n in range(rounds):
+        next_round(response, rng, players)
+        fetched_at = INGEST_WINDOW[0] + timedelta(days=1, hours=n)
+        summary = ingest(dict_conn, response, fetched_at=fetched_at, recompute=True, engine=engine)
+        with conn.cursor() as cur:
+            cur.execute("SELECT player_id, combined_score, current_rank FROM Leaderboard_Cache")
+            sql_board = {p: (s, r) for p, s, r in cur.fetchall()}
+        if not compare(f"ingest round {n + 1} ({summary['new_scores']} new scores)",
+                       sql_board, engine_board(engine)):
+            return False
+    return True
+
+
+def setup_database(schema):
+    from bench_schema import connect, create_bench_schema, finish_bench_schema
+
+    conn = connect(schema, dict_rows=False)
+    create_bench_schema(conn, schema)
+    finish_bench_schema(conn)
+    with conn.cursor() as cur:
+        for code in (EVENT, OTHER_EVENT):
+            cur.execute("INSERT INTO Events (event_code, event_name, start_date, stop_date) "
+                        "VALUES (%s, %s, %s, %s)", (code, code, START, END))
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--db', action='store_true',
+                        help='also compare against the SQL function in a bench schema')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='ingestion rounds per trial with --db (default 5)')
+    parser.add_argument('--schema', default='bench')
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    rng = random.Random(seed)
+    print(f"🎲 {args.trials} randomized leagues (seed {seed})")
+
+    conn = setup_database(args.schema) if args.db else None
+    dict_conn = None
+    if conn is not None:
+        from bench_schema import connect
+        dict_conn = connect(args.schema)
+    try:
+        for trial in range(1, args.trials + 1):
+            rows, machines = random_league(rng)
+            ok = check_offline(rows, machines)
+            if ok and conn is not None:
+                ok = check_database(conn, rows, machines, args.rounds)
+            if ok and conn is not None:
+                ok = check_ingestion(conn, dict_conn, rng, args.rounds)
+            if not ok:
+                print(f"Failed on trial {trial} (seed {seed})")
+                sys.exit(1)
+    finally:
+        if conn is not None:
+            from bench_schema import drop_bench_schema
+            dict_conn.close()
+            drop_bench_schema(conn, args.schema)
+            conn.close()
+    print("✅ Engine output matches update_combined_leaderboard()")
+
+
+if __name__ == '__main__':
+    main()
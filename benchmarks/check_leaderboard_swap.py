@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Concurrency check: kiosk leaderboard reads during update_combined_leaderboard()
+
+Reader threads run the /api/leaderboard/top10, /api/leaderboard/full and
+leaderboard_current queries in a tight loop while a writer ingests new scores
+and recomputes (alternating incremental runs and full rebuilds). Every read
+must see a complete leaderboard without waiting on a lock:
+
+- readers run with a short lock_timeout, so any lock wait is a failure
+- top10 always returns 10 rows
+- the full board is never empty, its ranks match RANK() over its scores, and
+  its scores add up to the points every machine hands out (the bench data has
+  no tied scores, so that total never changes; a half-written board would not
+  add up)
+
+Exits non-zero if any read failed.
+
+Usage:
+    source .env
+    python benchmarks/check_leaderboard_swap.py --duration 30 --readers 8
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import threading
+import time
+
+from psycopg2 import errors
+
+from bench_schema import (connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, BENCH_EVENT)
+
+# Same SQL as api_server.get_top10() / get_full_leaderboard()
+TOP10_SQL = """
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY lc.combined_score DESC) as rank,
+        p.display_name as name,
+        lc.combined_score as score
+    FROM leaderboard_cache lc
+    JOIN players p ON lc.player_id = p.player_id
+    ORDER BY lc.combined_score DESC
+    LIMIT 10
+"""
+
+FULL_SQL = """
+    SELECT
+        lc.current_rank,
+        RANK() OVER (ORDER BY lc.combined_score DESC) as expected_rank,
+        lc.combined_score as score
+    FROM leaderboard_cache lc
+    JOIN players p ON lc.player_id = p.player_id
+    ORDER BY lc.combined_score DESC
+"""
+
+VIEW_SQL = "SELECT rank, score FROM leaderboard_current"
+
+RECOMPUTE_SQL = """
+    SELECT update_combined_leaderboard(start_date, stop_date, event_code, %s)
+    FROM Events
+    WHERE event_code = %s
+"""
+
+NEW_SCORES_SQL = """
+    INSERT INTO High_Scores_Archive (player_id, machine_id, high_score, date_set, event_code)
+    SELECT 'player_' || (1 + floor(%(players)s * random()))::int,
+           m.machine_id,
+           %(base)s + i,
+           NOW(),
+           %(event_code)s
+    FROM unnest(%(machines)s::varchar[]) AS m(machine_id),
+         generate_series(1, %(per_machine)s) i
+    ON CONFLICT ON CONSTRAINT unique_score_per_event DO NOTHING
+"""
+
+
+class Results:
+    """Thread-safe tally of reads, failures and the slowest read"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reads = 0
+        self.failures = 0
+        self.examples = []
+        self.max_read_ms = 0.0
+        self.recomputes = 0
+
+    def read(self, elapsed_ms, failure=None):
+        with self.lock:
+            self.reads += 1
+            self.max_read_ms = max(self.max_read_ms, elapsed_ms)
+            if failure:
+                self.failures += 1
+                if len(self.examples) < 20:
+                    self.examples.append(failure)
+
+
+def check_read(cur, expected_total):
+    """Run one round of kiosk queries; return a failure message or None"""
+    cur.execute(TOP10_SQL)
+    top10 = cur.fetchall()
+    if len(top10) != 10:
+        return f"top10 returned {len(top10)} rows"
+
+    cur.execute(FULL_SQL)
+    full = cur.fetchall()
+    if not full:
+        return "full leaderboard was empty"
+    bad_ranks = sum(1 for current, expected, _ in full if current != expected)
+    if bad_ranks:
+        return f"full leaderboard had {bad_ranks} rows with a stale current_rank"
+    total = sum(score for _, _, score in full)
+    if total != expected_total:
+        return f"full leaderboard scores add up to {total}, expected {expected_total}"
+
+    cur.execute(VIEW_SQL)
+    if not cur.fetchall():
+        return "leaderboard_current was empty"
+    return None
+
+
+def reader(schema, expected_total, stop, results):
+    conn = connect(schema, dict_rows=False)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET lock_timeout = '50ms'")
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with conn.cursor() as cur:
+                    failure = check_read(cur, expected_total)
+            except errors.LockNotAvailable as e:
+                failure = f"lock wait: {str(e).strip()}"
+            results.read((time.perf_counter() - started) * 1000.0, failure)
+    finally:
+        conn.close()
+
+
+def writer(schema, args, stop, results):
+    conn = connect(schema, dict_rows=False)
+    conn.autocommit = False
+    machine_ids = [f"M{i}" for i in range(1, args.machines + 1)]
+    try:
+        for batch in itertools.count(1):
+            if stop.is_set():
+                break
+            # One ingestion: new scores and the recompute in one transaction
+            with conn.cursor() as cur:
+                cur.execute(NEW_SCORES_SQL, {
+                    'players': args.players,
+                    'machines': random.sample(machine_ids, min(args.dirty, len(machine_ids))),
+                    'per_machine': 5,
+                    'base': 10 ** 15 + batch * 1000,
+                    'event_code': BENCH_EVENT,
+                })
+                cur.execute(RECOMPUTE_SQL, (batch % 2 == 0, BENCH_EVENT))
+            conn.commit()
+            with results.lock:
+                results.recomputes += 1
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run (default 30)')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--machines', type=int, default=40)
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--scores', type=int, default=500_000)
+    parser.add_argument('--dirty', type=int, default=2,
+                        help='machines that get new scores per ingestion (default 2)')
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema, dict_rows=False)
+    print(f"🏗️  Seeding {args.scores:,} scores into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores,
+                other_events=0)
+    finish_bench_schema(conn, extra_sql=['pinball-integration/database_views.sql'])
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RECOMPUTE_SQL, (True, BENCH_EVENT))
+            cur.execute("SELECT SUM(combined_score) FROM Leaderboard_Cache")
+            expected_total = cur.fetchone()[0]
+
+        results = Results()
+        stop = threading.Event()
+        threads = [threading.Thread(target=writer, args=(args.schema, args, stop, results))]
+        threads += [threading.Thread(target=reader, args=(args.schema, expected_total, stop, results))
+                    for _ in range(args.readers)]
+        print(f"🔁 {args.readers} readers vs 1 recompute writer for {args.duration:.0f}s...")
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        print(f"Recomputes: {results.recomputes}, reads: {results.reads:,}, "
+              f"slowest read: {results.max_read_ms:.1f} ms")
+        if results.failures:
+            print(f"❌ {results.failures} reads saw an incomplete leaderboard or waited on a lock:")
+            for failure in results.examples:
+                print(f"   - {failure}")
+            sys.exit(1)
+        print("✅ Every read saw a complete leaderboard without lock waits")
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
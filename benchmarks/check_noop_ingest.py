@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Check: an ingest with no new scores skips the recompute but keeps trends current
+
+Ingests a synthetic Stern response with --recompute semantics into a
+throw-away 'bench' schema (kiosk views applied), scribbles over the stored
+24-hour trends, then ingests the same response twice more. Neither later
+ingest changes a score, so neither may run update_combined_leaderboard()
+or refresh the kiosk views. The first must still roll the trends forward
+(refresh_leaderboard_trends) and bump the generation for that change; the
+second finds nothing to change and must leave the generation alone, so
+cached responses and ETags survive idle polls. Every player must have
+last_seen moved each time. Exits non-zero if any of that did not happen.
+
+Usage:
+    source .env
+    python benchmarks/check_noop_ingest.py
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bench_schema import connect, create_bench_schema, finish_bench_schema, drop_bench_schema
+from bench_snapshot_storage import stern_response
+
+from ingest_scores import ingest
+
+STATE_SQL = """
+    SELECT
+        (SELECT generation FROM Leaderboard_Generation WHERE singleton) as generation,
+        (SELECT last_mode FROM Leaderboard_Recompute_State WHERE singleton) as last_mode,
+        (SELECT last_run_at FROM Leaderboard_Recompute_State WHERE singleton) as last_run_at,
+        (SELECT min(refreshed_at) FROM Kiosk_View_Refresh) as views_refreshed_at,
+        (SELECT count(*) FROM kiosk_view_status WHERE missed_recompute) as views_missed,
+        (SELECT count(*) FROM Leaderboard_Cache WHERE trend = 'bogus') as bogus_trends,
+        (SELECT min(last_seen) FROM Players) as oldest_last_seen
+"""
+
+
+def state(conn):
+    with conn.cursor() as cur:
+        cur.execute(STATE_SQL)
+        return cur.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scores', type=int, default=2000, help='scores per response (default 2000)')
+    parser.add_argument('--machines', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema)
+    print(f"🏗️  Ingesting {args.scores:,} scores into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    finish_bench_schema(conn, extra_sql=['pinball-integration/database_views.sql'])
+
+    try:
+        response = stern_response(args.scores, args.machines, random.Random(args.seed))
+        fetched_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        ingest(conn, response, fetched_at=fetched_at, recompute=True)
+
+        with conn.cursor() as cur:
+            cur.execute("UPDATE Leaderboard_Cache SET trend = 'bogus', trend_positions = -1")
+        before = state(conn)
+
+        summary = ingest(conn, response, fetched_at=fetched_at + timedelta(hours=1), recompute=True)
+        after = state(conn)
+        idle = ingest(conn, response, fetched_at=fetched_at + timedelta(hours=2), recompute=True)
+        settled = state(conn)
+
+        checks = {
+            'no score changed': summary['scores_changed'] == 0 and summary['new_scores'] == 0,
+            'recompute skipped': not summary['recomputed'] and not idle['recomputed']
+                                 and settled['last_run_at'] == before['last_run_at']
+                                 and settled['last_mode'] == before['last_mode'],
+            'trends rolled forward': summary['trends_changed'] and after['bogus_trends'] == 0,
+            'generation bumped for the trend change': after['generation'] > before['generation'],
+            'generation kept when nothing changed': not idle['trends_changed']
+                                                    and settled['generation'] == after['generation'],
+            'kiosk views not refreshed': settled['views_refreshed_at'] == before['views_refreshed_at'],
+            'last_seen moved for every player': settled['oldest_last_seen'] > before['oldest_last_seen'],
+        }
+        for label, ok in checks.items():
+            print(f"  {'✅' if ok else '❌'} {label}")
+        return 0 if all(checks.values()) else 1
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Check: query-plan regressions for the API, kiosk view and report queries
+
+Seeds a synthetic league at --scores rows per event, applies
+pinball-integration/database_views.sql, recomputes the leaderboard and
+writes --history-days of daily Leaderboard_History keyframes. It then
+captures EXPLAIN (ANALYZE, BUFFERS) for:
+
+- every api_server.py endpoint query
+- every view in database_views.sql (for a materialized view, the query its
+  refresh runs)
+- every SELECT in the weekly bar-owner and daily summary n8n workflows
+
+Plans, timings and buffer counts are compared with the baseline file.
+A query fails if it now sequentially scans a relation it used an index
+for, or if its execution time grew past --threshold times the baseline
+(and by more than --min-ms). Latencies are only compared when the
+baseline was captured at the same scale. The first run, or any run with
+--update-baseline, saves the current plans as the baseline.
+
+The closing "index roadmap" lists every relation still read by a
+sequential scan, with the rows read and the queries responsible.
+
+Exits non-zero on any regression.
+
+Usage:
+    source .env
+    python benchmarks/check_query_plans.py --scores 1000000 --update-baseline
+    python benchmarks/check_query_plans.py --scores 1000000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bench_schema import (REPO_ROOT, connect, create_bench_schema, seed_league, finish_bench_schema,
+                          drop_bench_schema, BENCH_EVENT)
+from league_stats import LEAGUE_STATISTICS_QUERY
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'query_plans_baseline.json')
+VIEWS_FILE = os.path.join(REPO_ROOT, 'pinball-integration', 'database_views.sql')
+REPORT_WORKFLOWS = {
+    'weekly': 'workflows/Pinball Weekly Bar Owner Report.json',
+    'daily': 'workflows/Pinball Daily Email Summary.json',
+}
+
+# Same SQL as the api_server.py routes (label -> (sql, needs params))
+API_QUERIES = {
+    '/api/leaderboard/top10': ("""
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY lc.combined_score DESC) as rank,
+            p.display_name as name,
+            lc.combined_score as score,
+            lc.games_played,
+            lc.trend,
+            lc.trend_positions
+        FROM leaderboard_cache lc
+        JOIN players p ON lc.player_id = p.player_id
+        ORDER BY lc.combined_score DESC
+        LIMIT 10
+    """, False),
+    '/api/leaderboard/full': ("""
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY combined_score DESC) as rank,
+            p.display_name as name,
+            lc.combined_score as score
+        FROM leaderboard_cache lc
+        JOIN players p ON lc.player_id = p.player_id
+        ORDER BY lc.combined_score DESC
+    """, False),
+    '/api/leaderboard/as-of': ("""
+        SELECT
+            h.current_rank as rank,
+            p.display_name as name,
+            h.combined_score as score
+        FROM leaderboard_as_of(%(at)s) h
+        JOIN players p ON h.player_id = p.player_id
+        ORDER BY h.current_rank, p.display_name
+    """, True),
+    '/api/game-champions': ("""
+        SELECT
+            m.machine_name as name,
+            p.display_name as champion,
+            mc.high_score as score
+        FROM machine_champions mc
+        JOIN machines m ON mc.machine_id = m.machine_id
+        JOIN players p ON mc.player_id = p.player_id
+        WHERE mc.event_code = %(event_code)s AND m.is_active = true
+        ORDER BY mc.high_score DESC
+    """, True),
+    '/api/recent-activity': ("""
+        SELECT
+            p.display_name as player,
+            m.machine_name as game,
+            h.high_score as score,
+            EXTRACT(EPOCH FROM (NOW() - h.date_set)) / 60 as minutes_ago,
+            COALESCE(h.high_score = pb.best_score, false) as is_personal_best
+        FROM (
+            SELECT player_id, machine_id, high_score, date_set, event_code
+            FROM high_scores_archive
+            WHERE event_code = %(event_code)s
+              AND player_id IS NOT NULL
+              AND machine_id IS NOT NULL
+            ORDER BY date_set DESC
+            LIMIT 50
+        ) h
+        JOIN players p ON h.player_id = p.player_id
+        JOIN machines m ON h.machine_id = m.machine_id
+        LEFT JOIN personal_bests pb ON pb.event_code = h.event_code
+            AND pb.player_id = h.player_id
+            AND pb.machine_id = h.machine_id
+        ORDER BY h.date_set DESC
+    """, True),
+    '/api/statistics': (LEAGUE_STATISTICS_QUERY, True),
+}
+
+HISTORY_SQL = """
+    INSERT INTO Leaderboard_History (player_id, combined_score, current_rank, recorded_at)
+    SELECT c.player_id, c.combined_score, c.current_rank, NOW() - make_interval(days => d)
+    FROM Leaderboard_Cache c, generate_series(1, %(days)s) d;
+
+    INSERT INTO Leaderboard_History_Snapshots (recorded_at, is_keyframe, rows_written)
+    SELECT DISTINCT recorded_at, TRUE, 0 FROM Leaderboard_History
+    ON CONFLICT (recorded_at) DO NOTHING;
+"""
+
+RECOMPUTE_SQL = """
+    SELECT update_combined_leaderboard(start_date, stop_date, event_code, p_full_rebuild => true)
+    FROM Events
+    WHERE event_code = %s
+"""
+
+
+def strip_comments(sql):
+    return '\n'.join(line for line in sql.splitlines() if not line.strip().startswith('--')).strip()
+
+
+def view_queries(conn):
+    """Each database_views.sql view: its SELECT, or a matview's refresh query"""
+    with open(VIEWS_FILE, 'r') as f:
+        names = re.findall(r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:MATERIALIZED\s+)?VIEW\s+(\w+)',
+                           f.read(), re.IGNORECASE)
+    queries = {}
+    with conn.cursor() as cur:
+        for name in dict.fromkeys(names):
+            cur.execute("SELECT relkind, pg_get_viewdef(oid) FROM pg_class WHERE oid = to_regclass(%s)",
+                        (name,))
+            row = cur.fetchone()
+            if not row:
+                continue
+            relkind, definition = row
+            if relkind == 'm':
+                queries[f"{name} (refresh)"] = (definition.rstrip().rstrip(';'), False)
+            else:
+                queries[name] = (f"SELECT * FROM {name}", False)
+    return queries
+
+
+def workflow_queries():
+    """The read-only Postgres node queries of the report workflows"""
+    queries = {}
+    for report, path in REPORT_WORKFLOWS.items():
+        with open(os.path.join(REPO_ROOT, path), 'r') as f:
+            workflow = json.load(f)
+        for node in workflow.get('nodes', []):
+            sql = node.get('parameters', {}).get('query')
+            if not sql or node.get('type') != 'n8n-nodes-base.postgres':
+                continue
+            # EXPLAIN ANALYZE executes the statement; leave the writes alone
+            if not re.match(r'(SELECT|WITH)\b', strip_comments(sql), re.IGNORECASE):
+                continue
+            queries[f"{report} / {node['name']}"] = (sql.strip().rstrip(';'), False)
+    return queries
+
+
+def walk(node, visit):
+    visit(node)
+    for child in node.get('Plans', []):
+        walk(child, visit)
+
+
+def summarize(explained):
+    """The parts of one EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result we compare"""
+    plan = explained['Plan']
+    seq_scans, index_scans, rows_read = set(), set(), {}
+
+    def visit(node):
+        relation = node.get('Relation Name')
+        if not relation:
+            return
+        loops = node.get('Actual Loops', 1)
+        if node['Node Type'] == 'Seq Scan':
+            seq_scans.add(relation)
+            read = (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+            rows_read[relation] = rows_read.get(relation, 0) + read
+        elif 'Index' in node['Node Type'] or node['Node Type'] == 'Bitmap Heap Scan':
+            index_scans.add(relation)
+
+    walk(plan, visit)
+    return {
+        'execution_ms': round(explained['Execution Time'], 3),
+        'planning_ms': round(explained['Planning Time'], 3),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+        'rows': plan.get('Actual Rows', 0),
+        'seq_scans': sorted(seq_scans),
+        'index_scans': sorted(index_scans),
+        'seq_rows_read': rows_read,
+        'plan': plan,
+    }
+
+
+def explain(conn, sql, params, repeat):
+    """Fastest of ``repeat`` EXPLAIN ANALYZE runs (after one warm-up)"""
+    best = None
+    with conn.cursor() as cur:
+        for _ in range(repeat + 1):
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+            explained = cur.fetchone()[0]
+            if isinstance(explained, str):
+                explained = json.loads(explained)
+            run = summarize(explained[0])
+            if best is None or run['execution_ms'] < best['execution_ms']:
+                best = run
+    return best
+
+
+def compare(baseline, current, threshold, min_ms):
+    """Regressions and notes for the current run against the baseline"""
+    failures, notes = [], []
+    same_scale = baseline.get('scale') == current['scale']
+    if not same_scale:
+        notes.append(f"baseline scale {baseline.get('scale')} differs: plans compared, latencies not")
+
+    for label, now in current['queries'].items():
+        before = baseline['queries'].get(label)
+        if before is None:
+            notes.append(f"{label}: new query, no baseline")
+            continue
+        for relation in sorted(set(now['seq_scans']) - set(before['seq_scans'])):
+            failures.append(f"{label}: now seq scans {relation}"
+                            f"{' (was an index scan)' if relation in before['index_scans'] else ''}")
+        if same_scale:
+            grown = now['execution_ms'] - before['execution_ms']
+            if now['execution_ms'] > before['execution_ms'] * threshold and grown > min_ms:
+                failures.append(f"{label}: {before['execution_ms']:.1f} ms -> {now['execution_ms']:.1f} ms")
+    for label in baseline['queries']:
+        if label not in current['queries']:
+            notes.append(f"{label}: in the baseline but no longer captured")
+    return failures, notes
+
+
+def print_report(current, baseline):
+    print(f"\n{'query':<44}{'exec ms':>10}{'base ms':>10}{'hit blk':>10}{'read blk':>10}  seq scans")
+    for label, q in current['queries'].items():
+        before = (baseline or {}).get('queries', {}).get(label)
+        base = f"{before['execution_ms']:.1f}" if before else '-'
+        print(f"{label[:43]:<44}{q['execution_ms']:>10.1f}{base:>10}{q['shared_hit_blocks']:>10}"
+              f"{q['shared_read_blocks']:>10}  {', '.join(q['seq_scans']) or '-'}")
+
+    roadmap = {}
+    for label, q in current['queries'].items():
+        for relation, rows in q['seq_rows_read'].items():
+            total, queries = roadmap.get(relation, (0, []))
+            roadmap[relation] = (total + rows, queries + [label])
+    print("\n🗺️  Index roadmap: relations read by sequential scans")
+    for relation, (rows, queries) in sorted(roadmap.items(), key=lambda item: -item[1][0]):
+        print(f"  {relation:<40}{rows:>14,} rows  {'; '.join(queries)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scores', type=int, default=1_000_000,
+                        help='archive rows per event (default 1,000,000)')
+    parser.add_argument('--old-events', type=int, default=1)
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--machines', type=int, default=60)
+    parser.add_argument('--history-days', type=int, default=30,
+                        help='daily Leaderboard_History keyframes to write (default 30)')
+    parser.add_argument('--repeat', type=int, default=3, help='EXPLAIN ANALYZE runs per query (fastest kept)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='save this run as the baseline')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='fail when a query is this many times slower than the baseline (default 1.5)')
+    parser.add_argument('--min-ms', type=float, default=2.0,
+                        help='ignore slow-downs smaller than this many ms (default 2)')
+    parser.add_argument('--output', help='also write this run (plans included) to this JSON file')
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    conn = connect(args.schema, dict_rows=False)
+    print(f"🏗️  Seeding {args.scores:,} scores x {args.old_events + 1} events into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    seed_league(conn, players=args.players, machines=args.machines, scores=args.scores,
+                other_events=args.old_events)
+    finish_bench_schema(conn, extra_sql=['pinball-integration/database_views.sql'])
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RECOMPUTE_SQL, (BENCH_EVENT,))
+            cur.execute(HISTORY_SQL, {'days': args.history_days})
+            cur.execute("ANALYZE")
+            cur.execute("SHOW server_version")
+            server_version = cur.fetchone()[0]
+
+        params = {'event_code': BENCH_EVENT,
+                  'at': datetime.now(timezone.utc) - timedelta(days=args.history_days // 2)}
+        sources = {'api': API_QUERIES, 'view': view_queries(conn), 'report': workflow_queries()}
+        current = {
+            'captured_at': datetime.now(timezone.utc).isoformat(),
+            'server_version': server_version,
+            'scale': {'scores': args.scores, 'events': args.old_events + 1, 'players': args.players,
+                      'machines': args.machines, 'history_days': args.history_days},
+            'queries': {},
+        }
+        for source, queries in sources.items():
+            for label, (sql, needs_params) in queries.items():
+                current['queries'][f"{source}: {label}"] = explain(
+                    conn, sql, params if needs_params else None, args.repeat)
+        print(f"🔬 Captured {len(current['queries'])} plans")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2, default=str)
+
+        baseline = None
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        print_report(current, baseline)
+
+        if baseline is None or args.update_baseline:
+            with open(args.baseline, 'w') as f:
+                json.dump(current, f, indent=2, default=str)
+            print(f"\n📝 Saved this run as the baseline: {args.baseline}")
+            return 0
+
+        failures, notes = compare(baseline, current, args.threshold, args.min_ms)
+        for note in notes:
+            print(f"ℹ️  {note}")
+        if failures:
+            print(f"\n❌ {len(failures)} plan regressions:")
+            for failure in failures:
+                print(f"  - {failure}")
+            return 1
+        print(f"\n✅ No plan regressions against {os.path.basename(args.baseline)}")
+        return 0
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
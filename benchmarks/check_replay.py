@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Check + benchmark: replay_snapshots.py rebuilds the archive ingest_scores.py wrote
+
+Ingests --fetches hourly synthetic Stern responses with ingest_scores.ingest()
+into a throw-away 'bench' schema (a few scores improve each hour, some hours
+repeat the previous payload), then replays Api_Snapshots with the worker pool
+and compares the replayed archive with the ingested one. Prints the replay
+throughput in snapshots per minute; exits non-zero if the archives differ.
+
+Usage:
+    source .env
+    python benchmarks/check_replay.py --fetches 2000 --scores 2000 --workers 8
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench_schema import connect, create_bench_schema, finish_bench_schema, drop_bench_schema, BENCH_EVENT
+from bench_snapshot_storage import stern_response
+
+from ingest_scores import ingest
+from replay_snapshots import Replay, build_staging, stream_snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fetches', type=int, default=2000, help='ingested snapshots (default 2000)')
+    parser.add_argument('--scores', type=int, default=2000, help='scores per response (default 2000)')
+    parser.add_argument('--machines', type=int, default=40)
+    parser.add_argument('--improve', type=int, default=5, help='scores that improve per changed fetch')
+    parser.add_argument('--repeat-every', type=int, default=3,
+                        help='every Nth fetch repeats the previous payload (default 3)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--schema', default='bench')
+    parser.add_argument('--keep', action='store_true', help='keep the bench schema afterwards')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    conn = connect(args.schema)
+    print(f"🏗️  Ingesting {args.fetches} snapshots of {args.scores:,} scores into schema '{args.schema}'...")
+    create_bench_schema(conn, args.schema)
+    finish_bench_schema(conn)
+
+    try:
+        response = stern_response(args.scores, args.machines, rng)
+        fetched_at = datetime.now(timezone.utc) - timedelta(hours=args.fetches)
+        started = time.perf_counter()
+        for n in range(args.fetches):
+            if n % args.repeat_every:
+                for entry in rng.sample(response['leaderboard']['scores'], args.improve):
+                    entry['score'] += rng.randrange(1, 1_000_000)
+            ingest(conn, response, fetched_at=fetched_at + timedelta(hours=n))
+        print(f"📥 Ingested in {time.perf_counter() - started:.1f}s")
+
+        replay_conn = connect(args.schema, dict_rows=False)
+        replay_conn.autocommit = False
+        options = argparse.Namespace(event=[BENCH_EVENT], workers=args.workers, chunk=16, progress=5)
+        with tempfile.TemporaryDirectory(prefix='replay_') as workdir:
+            replay = Replay(workdir)
+            started = time.perf_counter()
+            stream_snapshots(replay_conn, options, replay, search_path=f"{args.schema},public")
+            elapsed = time.perf_counter() - started
+            files = replay.finish()
+            _, result = build_staging(replay_conn, BENCH_EVENT, files[BENCH_EVENT], for_swap=False)
+        replay_conn.close()
+
+        rate = args.fetches / elapsed * 60
+        print(f"\n⚡ Replay: {args.fetches} snapshots in {elapsed:.1f}s = {rate:,.0f} snapshots/min "
+              f"({args.workers} workers)")
+        same = result['only_current'] == 0 and result['only_replayed'] == 0
+        print(f"Replayed archive matches the ingested one: {'✅' if same else '❌'} {result}")
+        return 0 if same else 1
+    finally:
+        if not args.keep:
+            drop_bench_schema(conn, args.schema)
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
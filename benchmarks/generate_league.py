@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Synthetic league generator: COPY-ready CSV files at any scale
+
+Writes a realistic league to --out as one CSV per table (header row,
+COPY ... WITH (FORMAT csv, HEADER true)):
+
+    players.csv, machines.csv, events.csv, high_scores_archive.csv,
+    leaderboard_history.csv, api_snapshots.csv
+
+plus load.sql (psql \\copy commands, run from --out) and manifest.json
+(settings, row counts and a sha256 per file).
+
+The model:
+- Player activity is Zipf-distributed (--zipf), so a few regulars set most
+  of the scores and a long tail plays rarely.
+- Each machine has its own log-normal score distribution, with medians
+  from about 2 million to 2 billion. Each player has a fixed skill.
+- --events back-to-back seasons of --event-days; the last one is active.
+  Every season uses its own subset of the machines, and machines missing
+  from the active season's lineup are inactive.
+- Scores arrive on hourly ingestion timestamps, weighted towards evenings
+  and weekends. Like the real ingestion, each archive row is a new personal
+  best for its player and machine. Two plays of one pair in the same hour
+  are collapsed, so an event can hold slightly fewer than --scores rows.
+- Leaderboard_History gets a full leaderboard keyframe every
+  --history-hours, scored like update_combined_leaderboard() (the
+  leaderboard_engine rank points). Api_Snapshots gets a
+  Stern-shaped response for each of the last --snapshot-hours fetches of
+  every event. Each response carries the top --snapshot-top scores per
+  title. Full boards run to tens of MB per fetch at a million rows.
+
+Output depends only on the arguments: the same --seed and --end give
+byte-identical files (compare the manifest hashes). --end defaults to the
+start of the current UTC day, so pass it explicitly to pin a dataset.
+
+Usage:
+    python benchmarks/generate_league.py --out /tmp/league --scores 3000000 --events 3 --seed 1
+    source .env && python benchmarks/generate_league.py --out /tmp/league --load --schema bench
+    cd /tmp/league && psql -f load.sql      # into the current database instead
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from operator import itemgetter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard_engine import POINTS_CUTOFF, rank_points
+
+# (file, table, columns) in COPY order: referenced tables first
+TABLES = (
+    ('players', 'Players',
+     ('player_id', 'display_name', 'avatar_url', 'background_color_hex', 'is_all_access', 'last_seen')),
+    ('machines', 'Machines', ('machine_id', 'machine_name', 'artwork_url', 'is_active')),
+    ('events', 'Events',
+     ('event_code', 'event_name', 'start_date', 'stop_date', 'location_id', 'event_type', 'is_active')),
+    ('high_scores_archive', 'High_Scores_Archive',
+     ('player_id', 'machine_id', 'high_score', 'date_set', 'event_code', 'score_source', 'is_approved')),
+    ('leaderboard_history', 'Leaderboard_History',
+     ('player_id', 'combined_score', 'current_rank', 'recorded_at')),
+    ('api_snapshots', 'Api_Snapshots', ('event_code', 'fetched_at', 'raw_response')),
+)
+
+STERN_TITLES = (
+    ('GZ', 'Godzilla'), ('JP', 'Jurassic Park'), ('IMDN', 'Iron Maiden'), ('MET', 'Metallica'),
+    ('DP', 'Deadpool'), ('TMNT', 'Teenage Mutant Ninja Turtles'), ('FOO', 'Foo Fighters'),
+    ('VEN', 'Venom'), ('JAWS', 'Jaws'), ('RUSH', 'Rush'), ('BAT', 'Batman 66'),
+    ('SW', 'Star Wars'), ('MAN', 'The Mandalorian'), ('AIQ', 'Avengers Infinity Quest'),
+    ('ELV', 'Elvira'), ('LOTR', 'The Lord of the Rings'), ('STT', 'Stranger Things'),
+    ('GNR', "Guns N' Roses"), ('TRON', 'Tron Legacy'), ('MUN', 'The Munsters'),
+)
+
+SYLLABLES = ('ka', 'ro', 'mi', 'zu', 'te', 'lan', 'vor', 'pix', 'el', 'dra', 'ny', 'quo',
+             'bar', 'sen', 'tri', 'ox', 'fla', 'gor', 'wi', 'jet')
+COLORS = ('#ff6b35', '#f7931e', '#00d9ff', '#8e44ad', '#27ae60', '#c0392b', '#2c3e50', '#f1c40f')
+
+# Relative play volume by hour of day (bar hours peak in the evening) and weekday (Mon..Sun)
+HOURLY_WEIGHTS = (0.5, 0.2, 0.05, 0.02, 0.01, 0.01, 0.01, 0.02, 0.05, 0.1, 0.2, 0.4,
+                  0.6, 0.6, 0.6, 0.7, 0.9, 1.2, 1.6, 2.0, 2.2, 2.1, 1.7, 1.0)
+WEEKDAY_WEIGHTS = (0.8, 0.8, 0.9, 1.0, 1.4, 1.5, 1.1)
+
+# Fetches land a few seconds after the hour, as the cron-driven ingestion does
+FETCH_OFFSET = timedelta(seconds=5)
+
+# Every generated history snapshot is a full copy (same backfill as 04_history_tracking.sql)
+KEYFRAMES_SQL = """
+INSERT INTO Leaderboard_History_Snapshots (recorded_at, is_keyframe, rows_written)
+SELECT recorded_at, TRUE, COUNT(*)
+FROM Leaderboard_History
+GROUP BY recorded_at
+ON CONFLICT (recorded_at) DO NOTHING"""
+
+RECOMPUTE_SQL = """
+SELECT update_combined_leaderboard(start_date, stop_date, event_code, p_full_rebuild => true)
+FROM Events
+WHERE is_active"""
+
+
+def stamp(value):
+    return value.isoformat()
+
+
+def parse_end(value):
+    """ISO 8601 timestamp; naive values are taken as UTC"""
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def zipf_cum_weights(n, exponent, rng):
+    """Cumulative Zipf weights over a random permutation of range(n)"""
+    order = list(range(n))
+    rng.shuffle(order)
+    weights = [0.0] * n
+    for rank, index in enumerate(order, start=1):
+        weights[index] = 1.0 / rank ** exponent
+    return list(accumulate(weights))
+
+
+def player_name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize() \
+        + str(rng.randint(1, 999))
+
+
+def event_code(rng):
+    alphabet = 'abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+    return '-'.join(''.join(rng.choice(alphabet) for _ in range(size)) for size in (4, 3, 4))
+
+
+def hourly_counts(hours, total, rng):
+    """Split ``total`` rows over ``hours`` by the hour/weekday profile and a daily swing"""
+    day_factor = {}
+    weights = []
+    for hour in hours:
+        day = hour.date()
+        if day not in day_factor:
+            day_factor[day] = rng.uniform(0.6, 1.4)
+        weights.append(HOURLY_WEIGHTS[hour.hour] * WEEKDAY_WEIGHTS[hour.weekday()] * day_factor[day])
+    scale = total / max(sum(weights), 1e-9)
+    counts, running, assigned = [], 0.0, 0
+    for weight in weights:
+        running += weight * scale
+        counts.append(round(running) - assigned)
+        assigned += counts[-1]
+    return counts
+
+
+class LeagueWriter:
+    """One csv.writer per table plus row counts"""
+
+    def __init__(self, out):
+        self.out = out
+        self.files = {}
+        self.writers = {}
+        self.rows = {}
+        for name, _, columns in TABLES:
+            f = open(os.path.join(out, f"{name}.csv"), 'w', newline='')
+            self.files[name] = f
+            self.writers[name] = csv.writer(f)
+            self.writers[name].writerow(columns)
+            self.rows[name] = 0
+
+    def write(self, name, row):
+        self.writers[name].writerow(row)
+        self.rows[name] += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def generate(args):
+    """Write the league to args.out; returns the manifest"""
+    rng = random.Random(args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    end = args.end
+
+    players = [{
+        'player_id': f"player_{i}",
+        'display_name': player_name(rng),
+        'avatar_url': f"https://example.invalid/avatars/{rng.randrange(64)}.png",
+        'color': rng.choice(COLORS),
+        'all_access': rng.random() < 0.2,
+        'skill': rng.gauss(0.0, 1.0),
+        'last_seen': None,
+    } for i in range(1, args.players + 1)]
+    player_cum = zipf_cum_weights(args.players, args.zipf, rng)
+
+    machines = []
+    for j in range(args.machines):
+        code, name = STERN_TITLES[j] if j < len(STERN_TITLES) else (f"M{j + 1}", f"Machine {j + 1}")
+        machines.append({
+            'machine_id': code,
+            'machine_name': name,
+            'mu': math.log(10 ** rng.uniform(6.3, 9.3)),
+            'sigma': rng.uniform(0.5, 1.0),
+            'popularity': rng.paretovariate(1.5),
+        })
+
+    stop = (end + timedelta(days=args.event_days // 4)).replace(minute=0, second=0, microsecond=0)
+    events = []
+    for n in range(args.events):
+        start = stop - timedelta(days=args.event_days)
+        lineup = sorted(rng.sample(range(args.machines), max(1, round(args.machines * args.lineup))))
+        events.append({'event_code': event_code(rng), 'start': start, 'stop': stop, 'lineup': lineup})
+        stop = start
+    events.reverse()
+    for n, event in enumerate(events, start=1):
+        event['event_name'] = f"Synthetic League Season {n}"
+        event['is_active'] = n == len(events)
+    active_lineup = set(events[-1]['lineup'])
+
+    writer = LeagueWriter(args.out)
+    started = time.perf_counter()
+    try:
+        for event in events:
+            generate_event(writer, rng, args, event, players, player_cum, machines)
+            print(f"  🎯 {event['event_code']}: {writer.rows['high_scores_archive']:,} archive rows so far "
+                  f"({time.perf_counter() - started:.0f}s)")
+
+        for player in players:
+            writer.write('players', (
+                player['player_id'], player['display_name'], player['avatar_url'], player['color'],
+                't' if player['all_access'] else 'f',
+                stamp(player['last_seen'] or events[0]['start'])))
+        for index, machine in enumerate(machines):
+            writer.write('machines', (
+                machine['machine_id'], machine['machine_name'],
+                f"https://example.invalid/artwork/{machine['machine_id'].lower()}.jpg",
+                't' if index in active_lineup else 'f'))
+        for event in events:
+            writer.write('events', (
+                event['event_code'], event['event_name'], stamp(event['start']), stamp(event['stop']),
+                'SYNTH-01', 'STERN_LEAGUE', 't' if event['is_active'] else 'f'))
+    finally:
+        writer.close()
+
+    manifest = {
+        'seed': args.seed,
+        'end': stamp(end),
+        'settings': {key: getattr(args, key) for key in (
+            'players', 'machines', 'events', 'event_days', 'scores', 'zipf', 'lineup',
+            'history_hours', 'snapshot_hours', 'snapshot_top')},
+        'tables': {},
+    }
+    for name, table, columns in TABLES:
+        path = os.path.join(args.out, f"{name}.csv")
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        manifest['tables'][table] = {'file': f"{name}.csv", 'columns': list(columns),
+                                     'rows': writer.rows[name], 'sha256': digest.hexdigest()}
+    with open(os.path.join(args.out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    with open(os.path.join(args.out, 'load.sql'), 'w') as f:
+        f.write("-- Load the generated league into a database set up by bootstrap_db.sh\n"
+                "-- (empty tables); run from this directory\n")
+        for name, table, columns in TABLES:
+            f.write(f"\\copy {table} ({', '.join(columns)}) FROM '{name}.csv' "
+                    f"WITH (FORMAT csv, HEADER true)\n")
+        f.write(KEYFRAMES_SQL + ";\n" + RECOMPUTE_SQL + ";\n")
+    return manifest
+
+
+def generate_event(writer, rng, args, event, players, player_cum, machines):
+    """Archive rows, history keyframes and API snapshots for one event"""
+    lineup = event['lineup']
+    machine_cum = list(accumulate(machines[j]['popularity'] for j in lineup))
+    last_hour = min(event['stop'], args.end)
+    hours = []
+    hour = event['start']
+    while hour < last_hour:
+        hours.append(hour)
+        hour += timedelta(hours=1)
+    counts = hourly_counts(hours, args.scores, rng)
+
+    code = event['event_code']
+    best = {m: {} for m in lineup}      # machine index -> {player index: best score}
+    snapshot_from = len(hours) - args.snapshot_hours
+    player_indexes = range(len(players))
+
+    for n, (hour, count) in enumerate(zip(hours, counts)):
+        fetched_at = hour + FETCH_OFFSET
+        date_set = stamp(fetched_at)
+        if count:
+            picked_players = rng.choices(player_indexes, cum_weights=player_cum, k=count)
+            picked_machines = rng.choices(lineup, cum_weights=machine_cum, k=count)
+            seen = set()
+            for p, m in zip(picked_players, picked_machines):
+                if (p, m) in seen:
+                    continue
+                seen.add((p, m))
+                player, machine = players[p], machines[m]
+                previous = best[m].get(p)
+                attempt = int(math.exp(rng.gauss(machine['mu'] + 0.4 * machine['sigma'] * player['skill'],
+                                                 machine['sigma'])))
+                if previous is None:
+                    score = attempt
+                else:
+                    # A new personal best: a lucky game, or a small step up
+                    bump = int(math.exp(machine['mu']) * rng.expovariate(200.0))
+                    score = max(attempt, previous + bump)
+                score = score // 10 * 10
+                if previous is not None and score <= previous:
+                    score = previous + 10
+                best[m][p] = score
+                player['last_seen'] = fetched_at
+                writer.write('high_scores_archive', (
+                    player['player_id'], machine['machine_id'], score, date_set, code, 'API', 't'))
+
+        if args.history_hours and n % args.history_hours == 0:
+            for player_id, combined, rank in combined_leaderboard(best, players):
+                writer.write('leaderboard_history', (player_id, combined, rank, date_set))
+        if n >= snapshot_from:
+            writer.write('api_snapshots', (code, date_set,
+                                           stern_payload(event, best, players, machines, args.snapshot_top)))
+
+
+def combined_leaderboard(best, players):
+    """
+    [(player_id, combined_score, rank)] for the current bests, as
+    Leaderboard_Cache would hold them: RANK() per machine, rank points summed,
+    RANK() over the sums. Only each machine's point-earning head is sorted.
+    """
+    combined = {}
+    for machine_bests in best.values():
+        head = heapq.nlargest(POINTS_CUTOFF + 1, machine_bests.items(), key=itemgetter(1))
+        if len(head) > POINTS_CUTOFF and head[-1][1] == head[-2][1]:
+            # A tie straddles the cutoff: everyone on that score shares its rank
+            cutoff_score = head[-1][1]
+            head = [entry for entry in head if entry[1] != cutoff_score]
+            head += [(p, score) for p, score in machine_bests.items() if score == cutoff_score]
+        rank = 0
+        for i, (p, score) in enumerate(head):
+            if i == 0 or score != head[i - 1][1]:
+                rank = i + 1
+            points = rank_points(rank)
+            if points:
+                combined[p] = combined.get(p, 0) + points
+
+    ordered = sorted(((-score, players[p]['player_id']) for p, score in combined.items()))
+    board = []
+    for i, (neg_score, player_id) in enumerate(ordered):
+        if i == 0 or neg_score != ordered[i - 1][0]:
+            rank = i + 1
+        board.append((player_id, -neg_score, rank))
+    return board
+
+
+def stern_payload(event, best, players, machines, top=0):
+    """The Stern leaderboard response for the event's current bests (``top`` per title, 0 = all)"""
+    titles = [{'title_code': machines[j]['machine_id'], 'title_name': machines[j]['machine_name']}
+              for j in event['lineup']]
+    scores = []
+    for m, machine_bests in best.items():
+        entries = (heapq.nlargest(top, machine_bests.items(), key=itemgetter(1)) if top
+                   else machine_bests.items())
+        for p, score in entries:
+            player = players[p]
+            scores.append({
+                'username': player['player_id'],
+                'initials': player['display_name'][:3].upper(),
+                'title_name': machines[m]['machine_name'],
+                'score': score,
+                'avatar_path': player['avatar_url'],
+                'background_color_hex': player['color'],
+                'is_all_accesss': player['all_access'],
+            })
+    return json.dumps({'leaderboard': {
+        'code': event['event_code'],
+        'name': event['event_name'],
+        'start_date': event['start'].strftime('%Y-%m-%dT%H:%M:%S'),
+        'stop_date': event['stop'].strftime('%Y-%m-%dT%H:%M:%S'),
+        'titles': titles,
+        'scores': scores,
+    }}, separators=(',', ':'))
+
+
+def load_league(conn, directory):
+    """COPY a generated league into the tables on ``conn``'s search_path"""
+    with open(os.path.join(directory, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    with conn.cursor() as cur:
+        for _, table, _ in TABLES:
+            spec = manifest['tables'][table]
+            with open(os.path.join(directory, spec['file']), 'r') as f:
+                cur.copy_expert(f"COPY {table} ({', '.join(spec['columns'])}) "
+                                f"FROM STDIN WITH (FORMAT csv, HEADER true)", f)
+    return manifest
+
+
+def load_into_bench_schema(args):
+    """Fresh bench schema, COPY the files, then indexes, triggers and a leaderboard recompute"""
+    from bench_schema import REPO_ROOT, connect, create_bench_schema, finish_bench_schema, run_sql_file
+
+    conn = connect(args.schema, dict_rows=False)
+    try:
+        create_bench_schema(conn, args.schema)
+        # Leaderboard_History is created there, not in 01_schema_tables.sql;
+        # finish_bench_schema() re-runs it and its backfill marks the keyframes
+        run_sql_file(conn, os.path.join(REPO_ROOT, 'database/init/04_history_tracking.sql'))
+        started = time.perf_counter()
+        manifest = load_league(conn, args.out)
+        copied = time.perf_counter() - started
+        finish_bench_schema(conn, extra_sql=['pinball-integration/database_views.sql'])
+        with conn.cursor() as cur:
+            cur.execute(RECOMPUTE_SQL)
+        total = sum(spec['rows'] for spec in manifest['tables'].values())
+        print(f"📥 Loaded {total:,} rows into schema '{args.schema}': COPY {copied:.1f}s, "
+              f"ready after {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--out', required=True, help='directory for the CSV files')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scores', type=int, default=1_000_000, help='archive rows per event (default 1,000,000)')
+    parser.add_argument('--players', type=int, default=20_000)
+    parser.add_argument('--machines', type=int, default=40)
+    parser.add_argument('--events', type=int, default=3)
+    parser.add_argument('--event-days', type=int, default=90)
+    parser.add_argument('--zipf', type=float, default=1.0, help='player activity exponent (default 1.0)')
+    parser.add_argument('--lineup', type=float, default=0.8,
+                        help='share of the machines each event uses (default 0.8)')
+    parser.add_argument('--history-hours', type=int, default=24,
+                        help='hours between Leaderboard_History keyframes (0 = none; default 24)')
+    parser.add_argument('--snapshot-hours', type=int, default=24,
+                        help='Api_Snapshots rows per event: its last N hourly fetches (default 24)')
+    parser.add_argument('--snapshot-top', type=int, default=100,
+                        help='scores per title in each snapshot (0 = every score; default 100)')
+    parser.add_argument('--end', type=parse_end,
+                        default=datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0),
+                        help='last ingestion time, ISO 8601 (default: start of today, UTC)')
+    parser.add_argument('--load', action='store_true', help='also load the files into --schema')
+    parser.add_argument('--schema', default='bench')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    print(f"🏗️  Generating {args.events} events x {args.scores:,} scores, {args.players:,} players, "
+          f"{args.machines} machines (seed {args.seed}) into {args.out}")
+    started = time.perf_counter()
+    manifest = generate(args)
+    for table, spec in manifest['tables'].items():
+        print(f"  {table:<22}{spec['rows']:>14,} rows  {spec['sha256'][:12]}")
+    print(f"✅ Generated in {time.perf_counter() - started:.1f}s")
+
+    if args.load:
+        load_into_bench_schema(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Load test: a fleet of virtual kiosks polling a running leaderboard server
+
+Each virtual kiosk follows PinballKiosk in pinball-leaderboard/static/js/app.js:
+
+  boot     GET /api/config, then the first scene's loader
+  scenes   every display.scene_duration seconds the next scene's loader
+           (top10, champions, activity, roster, stats, round and round)
+  refresh  every api.refresh_interval ms the current scene's loader again
+  stream   one /api/stream connection; leaderboard_updated / new_high_score
+           expire the affected scenes and reload the one on screen
+
+Loaders go through fetchIfChanged(): a response still fresh by its
+Cache-Control max-age is not requested again, otherwise the request carries
+If-None-Match and a 304 keeps the cached copy.
+
+Kiosks boot spread over --ramp seconds and every timer tick is jittered by
+--jitter, so the fleet does not poll in lock-step. Everything runs on one
+asyncio loop, so thousands of kiosks fit in one process (raise `ulimit -n`
+for the streams). --speed compresses time: at --speed 10 a 60 s scene lasts
+6 s.
+
+For each --kiosks step the fleet runs for --duration seconds while the
+script samples pg_stat_activity (client connections to the server's
+database) and /api/pool (api_server.py only). It reports per-route latency
+as the kiosks saw it (p50/p95/p99), 200/304/error counts, bytes, open
+streams and DB connections. Event-loop lag is printed too: when it is high,
+the load generator is the bottleneck, not the server.
+
+Usage:
+    source .env
+    gunicorn -c gunicorn.conf.py api_server:app &
+    python benchmarks/simulate_kiosks.py --url http://localhost:5050 --kiosks 50,200,1000 --speed 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import psycopg2
+
+from bench_schema import DB_CONFIG
+
+# PinballKiosk.scenes: loader url and the /api/stream events that expire it
+SCENES = (
+    ('/api/leaderboard/top10', ('leaderboard_updated',)),
+    ('/api/game-champions', ('new_high_score',)),
+    ('/api/recent-activity', ('new_high_score',)),
+    ('/api/leaderboard/full', ('leaderboard_updated',)),
+    ('/api/statistics', ('new_high_score',)),
+)
+
+# EventSource reconnect delay; the server sends "retry: 5000"
+STREAM_RETRY_SECONDS = 5
+
+MAX_AGE = re.compile(r'max-age=(\d+)')
+
+DB_CONNECTIONS_SQL = """
+    SELECT count(*) as total,
+           count(*) FILTER (WHERE state = 'active') as active,
+           count(*) FILTER (WHERE state LIKE 'idle%') as idle
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND backend_type = 'client backend'
+      AND pid <> pg_backend_pid()
+"""
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+async def read_head(reader):
+    """Status code and lower-cased headers of an HTTP response"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed before the status line")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return status, headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def open_request(host, port, path, headers=None):
+    """Send an HTTP/1.0 GET (no keep-alive, no chunking); returns (reader, writer)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = [f"GET {path} HTTP/1.0", f"Host: {host}:{port}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    await writer.drain()
+    return reader, writer
+
+
+async def http_get(host, port, path, headers=None):
+    reader, writer = await open_request(host, port, path, headers)
+    try:
+        status, response_headers = await read_head(reader)
+        body = await reader.read()
+    finally:
+        writer.close()
+    return Response(status, response_headers, body)
+
+
+class FleetStats:
+    """Everything the kiosks of one step saw"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.bytes = defaultdict(int)
+        self.fresh = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.open_streams = 0
+        self.max_streams = 0
+        self.stream_events = defaultdict(int)
+        self.stream_rejections = 0
+        self.db_samples = []
+        self.pool_samples = []
+        self.loop_lag = []
+
+    def record(self, path, status, elapsed_ms, size):
+        self.latencies[path].append(elapsed_ms)
+        self.statuses[path][status] += 1
+        self.bytes[path] += size
+
+    def stream_opened(self):
+        self.open_streams += 1
+        self.max_streams = max(self.max_streams, self.open_streams)
+
+    def stream_closed(self):
+        self.open_streams -= 1
+
+
+class VirtualKiosk:
+    """One PinballKiosk: the same requests on the same schedule, no rendering"""
+
+    def __init__(self, fleet, rng):
+        self.fleet = fleet
+        self.rng = rng
+        self.current = 0
+        self.http_cache = {}  # url -> [etag, fresh_until]
+        self.generation = None
+        self.tasks = set()
+
+    def spawn(self, coro):
+        # Like the JS timers, a slow loader never delays the next tick
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def jittered(self, seconds):
+        jitter = self.fleet.args.jitter
+        return seconds * self.rng.uniform(1 - jitter, 1 + jitter) / self.fleet.args.speed
+
+    async def get(self, path, headers=None):
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                http_get(self.fleet.host, self.fleet.port, path, headers), self.fleet.args.timeout)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+            self.fleet.stats.failures[type(e).__name__] += 1
+            self.fleet.stats.statuses[path]['error'] += 1
+            return None
+        self.fleet.stats.record(path, response.status, (time.perf_counter() - started) * 1000.0,
+                                len(response.body))
+        return response
+
+    async def fetch_if_changed(self, url):
+        """PinballKiosk.fetchIfChanged()"""
+        cached = self.http_cache.get(url)
+        if cached and time.monotonic() < cached[1]:
+            self.fleet.stats.fresh[url] += 1
+            return
+        headers = {'If-None-Match': cached[0]} if cached and cached[0] else {}
+        response = await self.get(url, headers)
+        if response is None:
+            return
+        max_age = MAX_AGE.search(response.headers.get('cache-control', ''))
+        fresh_until = time.monotonic() + int(max_age.group(1)) / self.fleet.args.speed if max_age else 0
+        if response.status == 304 and cached:
+            cached[1] = fresh_until
+        elif response.status < 400:
+            self.http_cache[url] = [response.headers.get('etag'), fresh_until]
+
+    async def show_scene(self, index):
+        self.current = index
+        await self.fetch_if_changed(SCENES[index][0])
+
+    async def run(self, boot_delay):
+        await asyncio.sleep(boot_delay)
+        config = {}
+        response = await self.get('/api/config')
+        if response is not None and response.status == 200:
+            config = json.loads(response.body)
+        scene_duration = self.fleet.args.scene_duration or config.get('display', {}).get('scene_duration', 60)
+        refresh_seconds = (self.fleet.args.refresh_interval
+                           or config.get('api', {}).get('refresh_interval', 300000) / 1000.0)
+
+        await self.show_scene(0)
+        if self.fleet.args.stream:
+            self.spawn(self.stream())
+        self.spawn(self.refresh_timer(refresh_seconds))
+        while True:
+            await asyncio.sleep(self.jittered(scene_duration))
+            self.spawn(self.show_scene((self.current + 1) % len(SCENES)))
+
+    async def refresh_timer(self, seconds):
+        while True:
+            await asyncio.sleep(self.jittered(seconds))
+            self.spawn(self.fetch_if_changed(SCENES[self.current][0]))
+
+    def invalidate(self, event=None):
+        """PinballKiosk.invalidateScenes(); ``None`` expires every scene"""
+        affected = [url for url, events in SCENES if event is None or event in events]
+        for url in affected:
+            if url in self.http_cache:
+                self.http_cache[url][1] = 0
+        if SCENES[self.current][0] in affected:
+            self.spawn(self.fetch_if_changed(SCENES[self.current][0]))
+
+    async def stream(self):
+        """The EventSource on /api/stream, reconnecting like a browser does"""
+        stats = self.fleet.stats
+        while True:
+            writer = None
+            try:
+                reader, writer = await open_request(self.fleet.host, self.fleet.port, '/api/stream',
+                                                    {'Accept': 'text/event-stream'})
+                status, _ = await read_head(reader)
+                if status != 200:
+                    stats.stream_rejections += 1
+                else:
+                    stats.stream_opened()
+                    try:
+                        await self.read_events(reader)
+                    finally:
+                        stats.stream_closed()
+            except (OSError, ValueError, IndexError) as e:
+                stats.failures[f"stream {type(e).__name__}"] += 1
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(STREAM_RETRY_SECONDS / self.fleet.args.speed)
+
+    async def read_events(self, reader):
+        event, data = 'message', ''
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            line = line.decode('utf-8').rstrip('\r\n')
+            if line.startswith('event:'):
+                event = line[6:].strip()
+            elif line.startswith('data:'):
+                data += line[5:].strip()
+            elif not line:
+                if data:
+                    self.on_event(event, data)
+                event, data = 'message', ''
+
+    def on_event(self, event, data):
+        self.fleet.stats.stream_events[event] += 1
+        payload = json.loads(data)
+        if event == 'hello':
+            if self.generation is not None and payload.get('generation') != self.generation:
+                self.invalidate()
+            self.generation = payload.get('generation')
+        elif event == 'leaderboard_updated':
+            self.generation = payload.get('generation')
+            self.invalidate(event)
+        elif event == 'new_high_score':
+            self.invalidate(event)
+
+
+class Fleet:
+    def __init__(self, args):
+        self.args = args
+        url = urlsplit(args.url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.stats = FleetStats()
+
+    async def run(self, kiosks):
+        rng = random.Random(self.args.seed)
+        ramp = self.args.ramp if self.args.ramp is not None else 60 / self.args.speed
+        tasks = [asyncio.ensure_future(VirtualKiosk(self, random.Random(rng.random())).run(rng.uniform(0, ramp)))
+                 for _ in range(kiosks)]
+        samplers = [asyncio.ensure_future(self.sample_loop_lag())]
+        if not self.args.no_db:
+            samplers.append(asyncio.ensure_future(self.sample_db()))
+        samplers.append(asyncio.ensure_future(self.sample_pool()))
+
+        await asyncio.sleep(self.args.duration)
+        for task in tasks + samplers:
+            task.cancel()
+        # Cancelling a kiosk leaves the loaders and streams it spawned running
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return self.stats
+
+    async def sample_loop_lag(self, interval=0.1):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            self.stats.loop_lag.append((time.monotonic() - started - interval) * 1000.0)
+
+    async def sample_db(self):
+        """pg_stat_activity client connections, every --sample-every seconds"""
+        loop = asyncio.get_running_loop()
+        try:
+            conn = await loop.run_in_executor(None, lambda: psycopg2.connect(**DB_CONFIG))
+        except psycopg2.Error as e:
+            print(f"⚠️  Not sampling DB connections: {e}")
+            return
+        conn.autocommit = True
+
+        def count():
+            with conn.cursor() as cur:
+                cur.execute(DB_CONNECTIONS_SQL)
+                return cur.fetchone()
+        try:
+            while True:
+                self.stats.db_samples.append(await loop.run_in_executor(None, count))
+                await asyncio.sleep(self.args.sample_every)
+        finally:
+            conn.close()
+
+    async def sample_pool(self):
+        """/api/pool of whichever worker answers (api_server.py only)"""
+        while True:
+            try:
+                response = await asyncio.wait_for(http_get(self.host, self.port, '/api/pool'), self.args.timeout)
+            except (OSError, asyncio.TimeoutError):
+                response = None
+            if response is not None and response.status == 404:
+                return
+            if response is not None and response.status == 200:
+                self.stats.pool_samples.append(json.loads(response.body))
+            await asyncio.sleep(self.args.sample_every)
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def summarize(kiosks, stats, duration):
+    routes = {}
+    for path in sorted(set(stats.statuses) | set(stats.fresh)):
+        samples = sorted(stats.latencies.get(path, []))
+        routes[path] = {
+            'requests': sum(stats.statuses[path].values()),
+            'status': {str(code): n for code, n in sorted(stats.statuses[path].items(), key=str)},
+            'fresh_skipped': stats.fresh.get(path, 0),
+            'bytes': stats.bytes.get(path, 0),
+            **({'p50_ms': round(percentile(samples, 0.50), 1), 'p95_ms': round(percentile(samples, 0.95), 1),
+                'p99_ms': round(percentile(samples, 0.99), 1)} if samples else {}),
+        }
+    total = sum(r['requests'] for r in routes.values())
+    result = {
+        'kiosks': kiosks,
+        'requests': total,
+        'rps': round(total / duration, 1),
+        'routes': routes,
+        'failures': dict(stats.failures),
+        'streams': {'max_open': stats.max_streams, 'rejected': stats.stream_rejections,
+                    'events': dict(stats.stream_events)},
+        'loop_lag_ms': {'p99': round(percentile(sorted(stats.loop_lag), 0.99), 1),
+                        'max': round(max(stats.loop_lag), 1)} if stats.loop_lag else {},
+    }
+    if stats.db_samples:
+        totals = [s[0] for s in stats.db_samples]
+        result['db_connections'] = {'max': max(totals), 'avg': round(statistics.mean(totals), 1),
+                                    'max_active': max(s[1] for s in stats.db_samples),
+                                    'max_idle': max(s[2] for s in stats.db_samples)}
+    if stats.pool_samples:
+        result['pool'] = {'max_in_use': max(s['in_use'] for s in stats.pool_samples),
+                          'max_waiting': max(s['waiting'] for s in stats.pool_samples),
+                          'max_wait_seconds': max(s['wait_time']['max_seconds'] for s in stats.pool_samples),
+                          'workers_seen': len({s['pid'] for s in stats.pool_samples})}
+    return result
+
+
+def print_step(result):
+    print(f"\n🎰 {result['kiosks']:,} kiosks: {result['requests']:,} requests ({result['rps']}/s)")
+    print(f"  {'route':<26}{'requests':>10}{'200':>8}{'304':>8}{'errors':>8}{'fresh':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'MB':>9}")
+    for path, r in result['routes'].items():
+        status = r['status']
+        errors = sum(n for code, n in status.items() if code not in ('200', '304'))
+        print(f"  {path:<26}{r['requests']:>10,}{status.get('200', 0):>8,}{status.get('304', 0):>8,}"
+              f"{errors:>8,}{r['fresh_skipped']:>8,}{r.get('p50_ms', '-'):>9}{r.get('p95_ms', '-'):>9}"
+              f"{r.get('p99_ms', '-'):>9}{r['bytes'] / 1e6:>9.2f}")
+    streams = result['streams']
+    print(f"  📡 streams: {streams['max_open']:,} open at peak, {streams['rejected']:,} rejected, "
+          f"events {streams['events'] or '{}'}")
+    if 'db_connections' in result:
+        db = result['db_connections']
+        print(f"  🐘 DB connections: max {db['max']} (avg {db['avg']}), "
+              f"max active {db['max_active']}, max idle {db['max_idle']}")
+    if 'pool' in result:
+        pool = result['pool']
+        print(f"  🏊 pool: max in use {pool['max_in_use']}, max waiting {pool['max_waiting']}, "
+              f"longest wait {pool['max_wait_seconds']}s ({pool['workers_seen']} worker(s) seen)")
+    if result['failures']:
+        print(f"  ❌ failures: {result['failures']}")
+    if result['loop_lag_ms']:
+        print(f"  ⏱️  event-loop lag p99 {result['loop_lag_ms']['p99']} ms, max {result['loop_lag_ms']['max']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:5050', help='server base URL (default %(default)s)')
+    parser.add_argument('--kiosks', default='10,100,500',
+                        help='comma-separated fleet sizes, run one after another (default 10,100,500)')
+    parser.add_argument('--duration', type=float, default=300, help='seconds per step (default 300)')
+    parser.add_argument('--speed', type=float, default=1.0, help='time compression factor (default 1)')
+    parser.add_argument('--ramp', type=float, help='seconds over which kiosks boot (default: one scene)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='timer jitter fraction (default 0.05)')
+    parser.add_argument('--scene-duration', type=float, help='override config display.scene_duration (s)')
+    parser.add_argument('--refresh-interval', type=float, help='override config api.refresh_interval (s)')
+    parser.add_argument('--no-stream', dest='stream', action='store_false', help='kiosks without EventSource')
+    parser.add_argument('--timeout', type=float, default=30, help='request timeout in seconds (default 30)')
+    parser.add_argument('--sample-every', type=float, default=1.0, help='DB / pool sampling interval (s)')
+    parser.add_argument('--no-db', action='store_true', help='do not sample pg_stat_activity')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    steps = [int(n) for n in args.kiosks.split(',')]
+    print(f"🚀 Simulating {', '.join(f'{n:,}' for n in steps)} kiosks against {args.url} "
+          f"for {args.duration:.0f}s each (speed x{args.speed:g})")
+    results = []
+    for kiosks in steps:
+        stats = asyncio.run(Fleet(args).run(kiosks))
+        results.append(summarize(kiosks, stats, args.duration))
+        print_step(results[-1])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': args.url, 'settings': vars(args), 'steps': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+    failed = any(r['failures'] or any(
+        code == 'error' or code.startswith('5') for route in r['routes'].values() for code in route['status'])
+        for r in results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
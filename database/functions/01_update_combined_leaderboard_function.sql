@@ -1,22 +1,270 @@
 -- Function to calculate and update the Leaderboard_Cache
+--
+-- Incremental by default: only machines marked in Leaderboard_Dirty_Machines
+-- (see database/init/09_incremental_leaderboard.sql) are re-ranked, and only
+-- the players whose points on those machines changed get a new combined score.
+-- Falls back to a full rebuild when asked to (p_full_rebuild => true, e.g. for
+-- repair) or when the cache describes a different event or date window.
+--
+-- Leaderboard_Cache is only ever changed with row-level DELETE/INSERT/UPDATE
+-- (never TRUNCATE), and only after the new per-machine points are complete.
+-- Kiosk reads take ACCESS SHARE, which none of those conflict with, so they
+-- never wait on a recompute and keep seeing the previous complete leaderboard
+-- until this transaction commits and the new one appears all at once.
+-- The kiosk materialized views (database/init/15_kiosk_views.sql) are
+-- refreshed CONCURRENTLY in the same transaction as the last step, so they
+-- switch over together with the cache.
+
+-- Kiosk columns on Leaderboard_Cache (database/init/10_leaderboard_trends.sql):
+-- recount games_played for p_players (every cached player when NULL), then
+-- refresh every player's trend against the leaderboard 24 hours ago.
+-- Returns the number of cache rows whose trend changed.
+CREATE OR REPLACE FUNCTION refresh_leaderboard_trends(
+    p_start_date TIMESTAMP WITH TIME ZONE,
+    p_end_date TIMESTAMP WITH TIME ZONE,
+    p_event_code VARCHAR(100),
+    p_players VARCHAR(100)[] DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    IF p_players IS NULL THEN
+        UPDATE Leaderboard_Cache c
+        SET games_played = COALESCE(g.games_played, 0)
+        FROM Leaderboard_Cache c2
+        LEFT JOIN (
+            SELECT h.player_id, COUNT(*) AS games_played
+            FROM High_Scores_Archive h
+            WHERE h.event_code = p_event_code
+              AND h.date_set >= p_start_date
+              AND h.date_set < p_end_date
+              AND h.is_approved = TRUE
+            GROUP BY h.player_id
+        ) g ON g.player_id = c2.player_id
+        WHERE c.player_id = c2.player_id
+          AND c.games_played IS DISTINCT FROM COALESCE(g.games_played, 0);
+    ELSIF cardinality(p_players) > 0 THEN
+        UPDATE Leaderboard_Cache c
+        SET games_played = g.games_played
+        FROM (
+            SELECT DISTINCT p.player_id, (
+                SELECT COUNT(*)
+                FROM High_Scores_Archive h
+                WHERE h.player_id = p.player_id
+                  AND h.event_code = p_event_code
+                  AND h.date_set >= p_start_date
+                  AND h.date_set < p_end_date
+                  AND h.is_approved = TRUE
+            ) AS games_played
+            FROM unnest(p_players) AS p(player_id)
+        ) g
+        WHERE c.player_id = g.player_id
+          AND c.games_played IS DISTINCT FROM g.games_played;
+    END IF;
+
+    UPDATE Leaderboard_Cache c
+    SET trend = t.trend,
+        trend_positions = t.trend_positions
+    FROM (
+        SELECT
+            lc.player_id,
+            CASE
+                WHEN h.current_rank IS NULL THEN 'stable'
+                WHEN h.current_rank > lc.current_rank THEN 'up'
+                WHEN h.current_rank < lc.current_rank THEN 'down'
+                ELSE 'stable'
+            END AS trend,
+            COALESCE(ABS(h.current_rank - lc.current_rank), 0) AS trend_positions
+        FROM Leaderboard_Cache lc
+        LEFT JOIN leaderboard_as_of(NOW() - INTERVAL '24 hours') h ON h.player_id = lc.player_id
+    ) t
+    WHERE c.player_id = t.player_id
+      AND (c.trend, c.trend_positions) IS DISTINCT FROM (t.trend, t.trend_positions);
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The incremental version added p_full_rebuild; drop the old signature so
+-- existing three-argument calls are not ambiguous
+DROP FUNCTION IF EXISTS update_combined_leaderboard(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, VARCHAR);
+
 CREATE OR REPLACE FUNCTION update_combined_leaderboard(
     p_start_date TIMESTAMP WITH TIME ZONE,
     p_end_date TIMESTAMP WITH TIME ZONE,
-    p_event_code VARCHAR(100) -- Added event_code parameter for multi-event support
+    p_event_code VARCHAR(100), -- Added event_code parameter for multi-event support
+    p_full_rebuild BOOLEAN DEFAULT FALSE
 )
 RETURNS VOID AS $$
+DECLARE
+    v_state Leaderboard_Recompute_State%ROWTYPE;
+    v_machines VARCHAR(50)[];
+    v_players VARCHAR(100)[];
+    v_changed_players VARCHAR(100)[];
+    v_dirty_players VARCHAR(100)[];
 BEGIN
-    -- 1. Clear the old cache (or truncate if you don't partition by event)
-    TRUNCATE TABLE Leaderboard_Cache;
+    -- One recompute at a time; a second caller waits and then sees our result
+    PERFORM pg_advisory_xact_lock(hashtext('update_combined_leaderboard'));
+
+    SELECT * INTO v_state FROM Leaderboard_Recompute_State WHERE singleton;
+
+    IF p_full_rebuild
+       OR NOT FOUND
+       OR v_state.event_code IS DISTINCT FROM p_event_code
+       OR v_state.start_date IS DISTINCT FROM p_start_date
+       OR v_state.end_date IS DISTINCT FROM p_end_date THEN
+
+        -- Full rebuild ------------------------------------------------------
+
+        -- 1. Consume the dirty marks first: anything committed after this is
+        --    either visible to the statements below or marked again
+        DELETE FROM Leaderboard_Dirty_Machines;
+        DELETE FROM Leaderboard_Dirty_Players;
+        DELETE FROM Leaderboard_Machine_Points;
+
+        -- 2. Rank every machine and keep the rows worth points
+        INSERT INTO Leaderboard_Machine_Points
+            (event_code, machine_id, player_id, best_score, machine_rank, rank_points)
+        WITH RankedScores AS (
+            -- Step 2a: Filter to event, find the max score per player per machine
+            SELECT
+                h.player_id,
+                h.machine_id,
+                MAX(h.high_score) AS best_score,
+                -- Use window function to rank scores within each machine
+                RANK() OVER (
+                    PARTITION BY h.machine_id
+                    ORDER BY MAX(h.high_score) DESC
+                ) AS machine_rank
+            FROM
+                High_Scores_Archive h
+            WHERE
+                h.event_code = p_event_code
+                AND h.date_set >= p_start_date
+                AND h.date_set < p_end_date
+            GROUP BY
+                h.player_id, h.machine_id
+        ),
+        ScoredRanks AS (
+            -- Step 2b: Assign points based on the custom scoring logic (100, 90, GREATEST(0, 88-N))
+            SELECT
+                player_id,
+                machine_id,
+                best_score,
+                machine_rank,
+                (CASE
+                    WHEN machine_rank = 1 THEN 100
+                    WHEN machine_rank = 2 THEN 90
+                    WHEN machine_rank >= 3 THEN GREATEST(0, 88 - machine_rank)
+                    ELSE 0
+                END) AS rank_points
+            FROM
+                RankedScores
+        )
+        SELECT p_event_code, machine_id, player_id, best_score, machine_rank, rank_points
+        FROM ScoredRanks
+        WHERE rank_points > 0;
+
+        -- 3. Sum the points for the total Combined Score and determine overall
+        --    rank, then publish it over the old cache: drop players who no
+        --    longer score and write only rows whose score or rank changed
+        DELETE FROM Leaderboard_Cache c
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM Leaderboard_Machine_Points mp
+            WHERE mp.event_code = p_event_code
+              AND mp.player_id = c.player_id
+        );
+
+        INSERT INTO Leaderboard_Cache (player_id, combined_score, current_rank)
+        SELECT
+            player_id,
+            SUM(rank_points) AS total_combined_score,
+            RANK() OVER (ORDER BY SUM(rank_points) DESC) AS overall_rank
+        FROM
+            Leaderboard_Machine_Points
+        WHERE
+            event_code = p_event_code
+        GROUP BY
+            player_id
+        ON CONFLICT (player_id) DO UPDATE SET
+            combined_score = EXCLUDED.combined_score,
+            current_rank = EXCLUDED.current_rank,
+            last_updated = NOW()
+        WHERE (Leaderboard_Cache.combined_score, Leaderboard_Cache.current_rank)
+              IS DISTINCT FROM (EXCLUDED.combined_score, EXCLUDED.current_rank);
+
+        INSERT INTO Leaderboard_Recompute_State AS s
+            (singleton, event_code, start_date, end_date, last_mode,
+             last_machines, last_players, last_run_at, last_rebuild_at)
+        SELECT TRUE, p_event_code, p_start_date, p_end_date, 'rebuild',
+               COUNT(DISTINCT machine_id), COUNT(DISTINCT player_id), NOW(), NOW()
+        FROM Leaderboard_Machine_Points
+        ON CONFLICT (singleton) DO UPDATE SET
+            event_code = EXCLUDED.event_code,
+            start_date = EXCLUDED.start_date,
+            end_date = EXCLUDED.end_date,
+            last_mode = EXCLUDED.last_mode,
+            last_machines = EXCLUDED.last_machines,
+            last_players = EXCLUDED.last_players,
+            last_run_at = EXCLUDED.last_run_at,
+            last_rebuild_at = EXCLUDED.last_rebuild_at;
+
+        -- 4. Games played and rank trends for every player
+        PERFORM refresh_leaderboard_trends(p_start_date, p_end_date, p_event_code);
+
+        PERFORM bump_leaderboard_generation('update_combined_leaderboard');
+        PERFORM refresh_kiosk_views();
+        RETURN;
+    END IF;
+
+    -- Incremental -----------------------------------------------------------
+
+    -- 1. Claim the machines whose scores changed since the last run
+    WITH claimed AS (
+        DELETE FROM Leaderboard_Dirty_Machines
+        WHERE event_code = p_event_code
+        RETURNING machine_id
+    )
+    SELECT array_agg(machine_id) INTO v_machines FROM claimed;
+
+    WITH claimed AS (
+        DELETE FROM Leaderboard_Dirty_Players
+        WHERE event_code = p_event_code
+        RETURNING player_id
+    )
+    SELECT array_agg(player_id) INTO v_dirty_players FROM claimed;
+
+    IF v_machines IS NULL THEN
+        -- No new scores: only the 24-hour trend window has moved. Leave the
+        -- API response caches alone unless a trend actually changed.
+        UPDATE Leaderboard_Recompute_State
+        SET last_mode = 'noop', last_machines = 0, last_players = 0, last_run_at = NOW()
+        WHERE singleton;
+        IF refresh_leaderboard_trends(p_start_date, p_end_date, p_event_code, '{}') > 0 THEN
+            PERFORM bump_leaderboard_generation('update_combined_leaderboard');
+        END IF;
+        -- The weekly/monthly windows in league_statistics still move
+        PERFORM refresh_kiosk_views();
+        RETURN;
+    END IF;
+
+    -- 2. Re-rank only those machines, remembering who held points before and after
+    WITH removed AS (
+        DELETE FROM Leaderboard_Machine_Points
+        WHERE event_code = p_event_code
+          AND machine_id = ANY(v_machines)
+        RETURNING player_id
+    )
+    SELECT array_agg(DISTINCT player_id) INTO v_players FROM removed;
 
-    -- 2. Calculate the new Combined Score and populate the cache
-    INSERT INTO Leaderboard_Cache (player_id, combined_score, current_rank)
     WITH RankedScores AS (
-        -- Step 2a: Filter to event, find the max score per player per machine
         SELECT
             h.player_id,
             h.machine_id,
-            -- Use window function to rank scores within each machine
+            MAX(h.high_score) AS best_score,
             RANK() OVER (
                 PARTITION BY h.machine_id
                 ORDER BY MAX(h.high_score) DESC
@@ -25,15 +273,18 @@ BEGIN
             High_Scores_Archive h
         WHERE
             h.event_code = p_event_code
+            AND h.machine_id = ANY(v_machines)
             AND h.date_set >= p_start_date
             AND h.date_set < p_end_date
         GROUP BY
             h.player_id, h.machine_id
     ),
     ScoredRanks AS (
-        -- Step 2b: Assign points based on the custom scoring logic (100, 90, GREATEST(0, 88-N))
         SELECT
             player_id,
+            machine_id,
+            best_score,
+            machine_rank,
             (CASE
                 WHEN machine_rank = 1 THEN 100
                 WHEN machine_rank = 2 THEN 90
@@ -43,24 +294,67 @@ BEGIN
         FROM
             RankedScores
     ),
-    CombinedScores AS (
-        -- Step 2c: Sum the points for the total Combined Score and determine overall rank
-        SELECT
-            player_id,
-            SUM(rank_points) AS total_combined_score,
-            RANK() OVER (ORDER BY SUM(rank_points) DESC) AS overall_rank
-        FROM
-            ScoredRanks
-        GROUP BY
-            player_id
+    added AS (
+        INSERT INTO Leaderboard_Machine_Points
+            (event_code, machine_id, player_id, best_score, machine_rank, rank_points)
+        SELECT p_event_code, machine_id, player_id, best_score, machine_rank, rank_points
+        FROM ScoredRanks
+        WHERE rank_points > 0
+        RETURNING player_id
     )
-    SELECT
-        player_id,
-        total_combined_score,
-        overall_rank
-    FROM
-        CombinedScores
-    WHERE total_combined_score > 0;
+    SELECT array_agg(DISTINCT player_id) INTO v_changed_players FROM added;
+
+    SELECT array_agg(DISTINCT player_id) INTO v_players
+    FROM unnest(COALESCE(v_players, '{}') || COALESCE(v_changed_players, '{}')) AS p(player_id);
+
+    -- 3. New combined scores for the affected players only
+    DELETE FROM Leaderboard_Cache c
+    WHERE c.player_id = ANY(v_players)
+      AND NOT EXISTS (
+          SELECT 1
+          FROM Leaderboard_Machine_Points mp
+          WHERE mp.event_code = p_event_code
+            AND mp.player_id = c.player_id
+      );
+
+    INSERT INTO Leaderboard_Cache (player_id, combined_score, current_rank)
+    SELECT mp.player_id, SUM(mp.rank_points), 0
+    FROM Leaderboard_Machine_Points mp
+    WHERE mp.event_code = p_event_code
+      AND mp.player_id = ANY(v_players)
+    GROUP BY mp.player_id
+    ON CONFLICT (player_id) DO UPDATE SET
+        combined_score = EXCLUDED.combined_score,
+        last_updated = NOW()
+    WHERE Leaderboard_Cache.combined_score IS DISTINCT FROM EXCLUDED.combined_score;
+
+    -- 4. Overall ranks: one pass over the cache, writing only rows that moved
+    UPDATE Leaderboard_Cache c
+    SET current_rank = r.overall_rank,
+        last_updated = NOW()
+    FROM (
+        SELECT player_id, RANK() OVER (ORDER BY combined_score DESC) AS overall_rank
+        FROM Leaderboard_Cache
+    ) r
+    WHERE c.player_id = r.player_id
+      AND c.current_rank IS DISTINCT FROM r.overall_rank;
+
+    UPDATE Leaderboard_Recompute_State
+    SET last_mode = 'incremental',
+        last_machines = cardinality(v_machines),
+        last_players = COALESCE(cardinality(v_players), 0),
+        last_run_at = NOW()
+    WHERE singleton;
+
+    -- 5. Games played for everyone who scored or whose points moved; trends for all
+    PERFORM refresh_leaderboard_trends(p_start_date, p_end_date, p_event_code,
+                                       COALESCE(v_players, '{}') || COALESCE(v_dirty_players, '{}'));
+
+    -- 6. Publish: bump the generation so API response caches refresh
+    PERFORM bump_leaderboard_generation('update_combined_leaderboard');
+
+    -- 7. Kiosk materialized views, last so they see the finished cache
+    PERFORM refresh_kiosk_views();
 
 END;
 $$ LANGUAGE plpgsql;
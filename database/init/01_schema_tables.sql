@@ -35,16 +35,22 @@ CREATE TABLE Api_Snapshots (
 );
 
 -- The Source of Truth for Calculations
+-- One partition per event (see 13_score_partitions.sql), so queries for the
+-- current event never touch old seasons; the default partition only holds
+-- rows whose event has no partition yet
 CREATE TABLE High_Scores_Archive (
-    score_id SERIAL PRIMARY KEY,
+    score_id SERIAL,
     player_id VARCHAR(100) REFERENCES Players(player_id),
     machine_id VARCHAR(50) REFERENCES Machines(machine_id),
     high_score BIGINT NOT NULL,
     date_set TIMESTAMP WITH TIME ZONE NOT NULL,
-    event_code VARCHAR(100) REFERENCES Events(event_code),
+    event_code VARCHAR(100) NOT NULL REFERENCES Events(event_code),
     score_source VARCHAR(20) NOT NULL DEFAULT 'API',
-    is_approved BOOLEAN NOT NULL DEFAULT TRUE
-);
+    is_approved BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (score_id, event_code)
+) PARTITION BY LIST (event_code);
+
+CREATE TABLE High_Scores_Archive_Default PARTITION OF High_Scores_Archive DEFAULT;
 
 -- Fast Display for Kiosk
 CREATE TABLE Leaderboard_Cache (
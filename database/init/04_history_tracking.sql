@@ -17,6 +17,97 @@ ON Leaderboard_History(recorded_at DESC);
 CREATE INDEX IF NOT EXISTS idx_history_player_time 
 ON Leaderboard_History(player_id, recorded_at DESC);
 
+-- History is delta-encoded: a keyframe copies the whole Leaderboard_Cache,
+-- and every other snapshot writes only players whose score or rank changed
+-- since the previous one (a row with NULL score and rank means the player
+-- left the leaderboard). One row here per snapshot taken, even when it wrote
+-- nothing, so "leaderboard as of T" knows where the nearest keyframe is.
+CREATE TABLE IF NOT EXISTS Leaderboard_History_Snapshots (
+    recorded_at TIMESTAMP WITH TIME ZONE PRIMARY KEY,
+    is_keyframe BOOLEAN NOT NULL,
+    rows_written INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_history_keyframes
+ON Leaderboard_History_Snapshots(recorded_at DESC) WHERE is_keyframe;
+
+-- History written before delta encoding holds full copies: each is a keyframe
+INSERT INTO Leaderboard_History_Snapshots (recorded_at, is_keyframe, rows_written)
+SELECT recorded_at, TRUE, COUNT(*)
+FROM Leaderboard_History
+GROUP BY recorded_at
+ON CONFLICT (recorded_at) DO NOTHING;
+
+-- The full leaderboard as it stood at p_at: the nearest keyframe at or
+-- before p_at with every later delta up to p_at applied
+CREATE OR REPLACE FUNCTION leaderboard_as_of(p_at TIMESTAMP WITH TIME ZONE DEFAULT NOW())
+RETURNS TABLE (
+    player_id VARCHAR(100),
+    combined_score INTEGER,
+    current_rank INTEGER,
+    recorded_at TIMESTAMP WITH TIME ZONE
+) AS $$
+    SELECT latest.player_id, latest.combined_score, latest.current_rank, latest.recorded_at
+    FROM (
+        SELECT DISTINCT ON (h.player_id)
+            h.player_id, h.combined_score, h.current_rank, h.recorded_at
+        FROM Leaderboard_History h
+        WHERE h.recorded_at <= p_at
+          AND h.recorded_at >= (
+              SELECT k.recorded_at
+              FROM Leaderboard_History_Snapshots k
+              WHERE k.is_keyframe
+                AND k.recorded_at <= p_at
+              ORDER BY k.recorded_at DESC
+              LIMIT 1
+          )
+        ORDER BY h.player_id, h.recorded_at DESC, h.history_id DESC
+    ) latest
+    WHERE latest.current_rank IS NOT NULL;
+$$ LANGUAGE sql STABLE;
+
+-- Record the current Leaderboard_Cache in history: a keyframe when the last
+-- one is older than p_keyframe_every, otherwise only the changed rows.
+-- Returns the number of history rows written.
+CREATE OR REPLACE FUNCTION snapshot_leaderboard_history(p_keyframe_every INTERVAL DEFAULT INTERVAL '1 day')
+RETURNS INTEGER AS $$
+DECLARE
+    v_at TIMESTAMP WITH TIME ZONE;
+    v_last_keyframe TIMESTAMP WITH TIME ZONE;
+    v_keyframe BOOLEAN;
+    v_rows INTEGER;
+BEGIN
+    -- Snapshots must not interleave: each delta is taken against the last one
+    PERFORM pg_advisory_xact_lock(hashtext('snapshot_leaderboard_history'));
+    v_at := clock_timestamp();
+
+    SELECT MAX(s.recorded_at) INTO v_last_keyframe
+    FROM Leaderboard_History_Snapshots s
+    WHERE s.is_keyframe;
+
+    v_keyframe := v_last_keyframe IS NULL OR v_last_keyframe <= v_at - p_keyframe_every;
+
+    IF v_keyframe THEN
+        INSERT INTO Leaderboard_History (player_id, combined_score, current_rank, recorded_at)
+        SELECT player_id, combined_score, current_rank, v_at
+        FROM Leaderboard_Cache;
+    ELSE
+        INSERT INTO Leaderboard_History (player_id, combined_score, current_rank, recorded_at)
+        SELECT COALESCE(c.player_id, prev.player_id), c.combined_score, c.current_rank, v_at
+        FROM Leaderboard_Cache c
+        FULL JOIN leaderboard_as_of(v_at) prev ON prev.player_id = c.player_id
+        WHERE (c.combined_score, c.current_rank)
+              IS DISTINCT FROM (prev.combined_score, prev.current_rank);
+    END IF;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    INSERT INTO Leaderboard_History_Snapshots (recorded_at, is_keyframe, rows_written)
+    VALUES (v_at, v_keyframe, v_rows);
+
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Workflow health monitoring view
 CREATE OR REPLACE VIEW workflow_health AS
 SELECT 
@@ -35,19 +126,10 @@ SELECT
     h2.current_rank as rank_72h_ago,
     (h2.current_rank - h1.current_rank) as rank_change,
     h1.combined_score - h2.combined_score as score_gain
-FROM Leaderboard_History h1
+FROM leaderboard_as_of(NOW()) h1
 JOIN Players p ON h1.player_id = p.player_id
-LEFT JOIN LATERAL (
-    SELECT current_rank, combined_score
-    FROM Leaderboard_History h2
-    WHERE h2.player_id = h1.player_id
-      AND h2.recorded_at <= NOW() - INTERVAL '72 hours'
-    ORDER BY h2.recorded_at DESC
-    LIMIT 1
-) h2 ON true
-WHERE h1.recorded_at = (
-    SELECT MAX(recorded_at) 
-    FROM Leaderboard_History
-)
-AND h2.current_rank IS NOT NULL
+JOIN leaderboard_as_of(NOW() - INTERVAL '72 hours') h2 ON h2.player_id = h1.player_id
 ORDER BY rank_change DESC;
+
+COMMENT ON TABLE Leaderboard_History IS 'Delta-encoded leaderboard history; read it through leaderboard_as_of()';
+COMMENT ON FUNCTION snapshot_leaderboard_history(INTERVAL) IS 'Append changed Leaderboard_Cache rows (or a daily keyframe) to Leaderboard_History';
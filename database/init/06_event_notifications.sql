@@ -0,0 +1,28 @@
+-- Change notifications for the Events table
+-- The API server caches the active event and LISTENs on 'events_changed'
+-- Safe to run multiple times (idempotent)
+
+CREATE OR REPLACE FUNCTION notify_events_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('events_changed', COALESCE(NEW.event_code, OLD.event_code));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The hourly "Upsert Event Metadata" step rewrites the row even when nothing
+-- changed, so only real changes notify on UPDATE
+DROP TRIGGER IF EXISTS events_changed_on_update ON Events;
+CREATE TRIGGER events_changed_on_update
+    AFTER UPDATE ON Events
+    FOR EACH ROW
+    WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION notify_events_changed();
+
+DROP TRIGGER IF EXISTS events_changed_on_insert_delete ON Events;
+CREATE TRIGGER events_changed_on_insert_delete
+    AFTER INSERT OR DELETE ON Events
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_events_changed();
+
+COMMENT ON FUNCTION notify_events_changed() IS 'NOTIFY events_changed so API servers drop their cached active event';
@@ -0,0 +1,34 @@
+-- Leaderboard generation counter
+-- Bumped every time the leaderboard is recomputed; API servers key their
+-- response caches on it and LISTEN on 'leaderboard_updated' for changes
+-- Safe to run multiple times (idempotent)
+
+CREATE TABLE IF NOT EXISTS Leaderboard_Generation (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_by VARCHAR(50)
+);
+
+INSERT INTO Leaderboard_Generation (singleton) VALUES (TRUE)
+ON CONFLICT (singleton) DO NOTHING;
+
+-- Increment the generation and tell every listening API server about it
+CREATE OR REPLACE FUNCTION bump_leaderboard_generation(p_source VARCHAR(50) DEFAULT 'manual')
+RETURNS BIGINT AS $$
+DECLARE
+    v_generation BIGINT;
+BEGIN
+    UPDATE Leaderboard_Generation
+    SET generation = generation + 1,
+        updated_at = NOW(),
+        updated_by = p_source
+    WHERE singleton
+    RETURNING generation INTO v_generation;
+
+    PERFORM pg_notify('leaderboard_updated', v_generation::text);
+    RETURN v_generation;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON TABLE Leaderboard_Generation IS 'Monotonic counter of leaderboard recomputes, used for API cache invalidation';
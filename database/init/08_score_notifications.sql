@@ -0,0 +1,50 @@
+-- New high score notifications for kiosk push (/api/stream)
+-- API servers LISTEN on 'new_high_score' and forward it to connected kiosks
+-- Safe to run multiple times (idempotent)
+
+-- Statement-level with a transition table: a bulk insert sends one NOTIFY
+-- (summarising every new row) instead of one per score
+CREATE OR REPLACE FUNCTION notify_new_high_scores()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_payload TEXT;
+BEGIN
+    SELECT json_build_object(
+               'event_code', MIN(n.event_code),
+               'count', COUNT(*),
+               'machines', json_agg(DISTINCT n.machine_id),
+               'top', (SELECT json_build_object('player_id', t.player_id,
+                                                'machine_id', t.machine_id,
+                                                'high_score', t.high_score)
+                       FROM new_scores t
+                       ORDER BY t.high_score DESC
+                       LIMIT 1)
+           )::text
+    INTO v_payload
+    FROM new_scores n
+    HAVING COUNT(*) > 0;
+
+    IF v_payload IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- NOTIFY payloads must stay under 8000 bytes; drop the machine list if needed
+    IF octet_length(v_payload) > 7900 THEN
+        SELECT json_build_object('event_code', MIN(event_code), 'count', COUNT(*))::text
+        INTO v_payload
+        FROM new_scores;
+    END IF;
+
+    PERFORM pg_notify('new_high_score', v_payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS high_scores_notify_insert ON High_Scores_Archive;
+CREATE TRIGGER high_scores_notify_insert
+    AFTER INSERT ON High_Scores_Archive
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_new_high_scores();
+
+COMMENT ON FUNCTION notify_new_high_scores() IS 'NOTIFY new_high_score (one per INSERT statement) so API servers can push it to kiosks';
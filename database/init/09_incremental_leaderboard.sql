@@ -0,0 +1,114 @@
+-- State for the incremental leaderboard recompute
+-- (see database/functions/01_update_combined_leaderboard_function.sql)
+-- Safe to run multiple times (idempotent)
+
+-- Points each player currently earns on each machine (only rows worth > 0
+-- points: with 100/90/88-N scoring that is the top ~87 ranks per machine)
+CREATE TABLE IF NOT EXISTS Leaderboard_Machine_Points (
+    event_code VARCHAR(100) NOT NULL,
+    machine_id VARCHAR(50) NOT NULL,
+    player_id VARCHAR(100) NOT NULL,
+    best_score BIGINT NOT NULL,
+    machine_rank INTEGER NOT NULL,
+    rank_points INTEGER NOT NULL,
+    PRIMARY KEY (event_code, machine_id, player_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_machine_points_player
+ON Leaderboard_Machine_Points(event_code, player_id);
+
+-- Machines whose scores changed since the last recompute. Rows are written
+-- by the triggers below in the same transaction as the score change, and
+-- consumed (deleted) by the recompute in its own transaction. The triggers
+-- upsert rather than skip an existing row, so they hold its row lock until
+-- they commit: a recompute deleting the mark waits for the score to commit,
+-- and a score never goes unnoticed even if it lands mid-recompute.
+CREATE TABLE IF NOT EXISTS Leaderboard_Dirty_Machines (
+    event_code VARCHAR(100) NOT NULL,
+    machine_id VARCHAR(50) NOT NULL,
+    marked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (event_code, machine_id)
+);
+
+-- Players with score changes since the last recompute (same lifecycle as
+-- Leaderboard_Dirty_Machines); their games_played is recounted
+CREATE TABLE IF NOT EXISTS Leaderboard_Dirty_Players (
+    event_code VARCHAR(100) NOT NULL,
+    player_id VARCHAR(100) NOT NULL,
+    marked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (event_code, player_id)
+);
+
+-- What Leaderboard_Cache / Leaderboard_Machine_Points currently describe;
+-- a recompute for a different event or date window falls back to a rebuild
+CREATE TABLE IF NOT EXISTS Leaderboard_Recompute_State (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    event_code VARCHAR(100) NOT NULL,
+    start_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    end_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_mode VARCHAR(20) NOT NULL,
+    last_machines INTEGER NOT NULL DEFAULT 0,
+    last_players INTEGER NOT NULL DEFAULT 0,
+    last_run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_rebuild_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Statement-level triggers: a bulk insert marks each machine once
+CREATE OR REPLACE FUNCTION mark_machines_dirty()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO Leaderboard_Dirty_Machines (event_code, machine_id)
+        SELECT DISTINCT event_code, machine_id
+        FROM new_scores
+        WHERE event_code IS NOT NULL AND machine_id IS NOT NULL
+        ON CONFLICT (event_code, machine_id) DO UPDATE SET marked_at = NOW();
+
+        INSERT INTO Leaderboard_Dirty_Players (event_code, player_id)
+        SELECT DISTINCT event_code, player_id
+        FROM new_scores
+        WHERE event_code IS NOT NULL AND player_id IS NOT NULL
+        ON CONFLICT (event_code, player_id) DO UPDATE SET marked_at = NOW();
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO Leaderboard_Dirty_Machines (event_code, machine_id)
+        SELECT DISTINCT event_code, machine_id
+        FROM old_scores
+        WHERE event_code IS NOT NULL AND machine_id IS NOT NULL
+        ON CONFLICT (event_code, machine_id) DO UPDATE SET marked_at = NOW();
+
+        INSERT INTO Leaderboard_Dirty_Players (event_code, player_id)
+        SELECT DISTINCT event_code, player_id
+        FROM old_scores
+        WHERE event_code IS NOT NULL AND player_id IS NOT NULL
+        ON CONFLICT (event_code, player_id) DO UPDATE SET marked_at = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS high_scores_dirty_insert ON High_Scores_Archive;
+CREATE TRIGGER high_scores_dirty_insert
+    AFTER INSERT ON High_Scores_Archive
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_machines_dirty();
+
+DROP TRIGGER IF EXISTS high_scores_dirty_update ON High_Scores_Archive;
+CREATE TRIGGER high_scores_dirty_update
+    AFTER UPDATE ON High_Scores_Archive
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_machines_dirty();
+
+DROP TRIGGER IF EXISTS high_scores_dirty_delete ON High_Scores_Archive;
+CREATE TRIGGER high_scores_dirty_delete
+    AFTER DELETE ON High_Scores_Archive
+    REFERENCING OLD TABLE AS old_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_machines_dirty();
+
+COMMENT ON TABLE Leaderboard_Machine_Points IS 'Per-machine rank points behind Leaderboard_Cache, maintained by update_combined_leaderboard()';
+COMMENT ON TABLE Leaderboard_Dirty_Machines IS 'Machines with score changes not yet folded into Leaderboard_Cache';
+COMMENT ON TABLE Leaderboard_Dirty_Players IS 'Players with score changes not yet folded into Leaderboard_Cache';
@@ -0,0 +1,17 @@
+-- Precomputed kiosk columns on Leaderboard_Cache
+-- Filled by update_combined_leaderboard() at recompute time, so the top-10
+-- read needs no history or archive scan
+-- Safe to run multiple times (idempotent)
+
+ALTER TABLE Leaderboard_Cache
+    ADD COLUMN IF NOT EXISTS games_played INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS trend VARCHAR(10) NOT NULL DEFAULT 'stable',
+    ADD COLUMN IF NOT EXISTS trend_positions INTEGER NOT NULL DEFAULT 0;
+
+-- Top-N in score order straight from the index
+CREATE INDEX IF NOT EXISTS idx_leaderboard_cache_top
+ON Leaderboard_Cache(combined_score DESC)
+INCLUDE (player_id, current_rank, games_played, trend, trend_positions);
+
+COMMENT ON COLUMN Leaderboard_Cache.games_played IS 'Approved scores in the event window, recounted when the player scores';
+COMMENT ON COLUMN Leaderboard_Cache.trend IS 'up/down/stable against leaderboard_as_of(NOW() - 24 hours)';
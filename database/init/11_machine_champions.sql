@@ -0,0 +1,179 @@
+-- Maintained machine champions (top approved score per machine per event)
+-- Kept current by triggers on High_Scores_Archive, so /api/game-champions
+-- and the game_champions view read one row per machine
+-- Safe to run multiple times (idempotent)
+
+CREATE TABLE IF NOT EXISTS Machine_Champions (
+    event_code VARCHAR(100) NOT NULL,
+    machine_id VARCHAR(50) NOT NULL,
+    score_id INTEGER NOT NULL,
+    player_id VARCHAR(100) NOT NULL,
+    high_score BIGINT NOT NULL,
+    date_set TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (event_code, machine_id)
+);
+
+-- Finding a machine's next-best approved score after a retraction is one
+-- index probe
+CREATE INDEX IF NOT EXISTS idx_scores_machine_best
+ON High_Scores_Archive(event_code, machine_id, high_score DESC, score_id)
+WHERE is_approved;
+
+-- Re-derive the champion of each (event_code, machine_id) pair from the
+-- archive; pairs without an approved score lose their row. Ties go to the
+-- score that was recorded first.
+CREATE OR REPLACE FUNCTION refresh_machine_champions(
+    p_event_codes VARCHAR(100)[],
+    p_machine_ids VARCHAR(50)[]
+)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM Machine_Champions mc
+    USING unnest(p_event_codes, p_machine_ids) AS pairs(event_code, machine_id)
+    WHERE mc.event_code = pairs.event_code
+      AND mc.machine_id = pairs.machine_id
+      AND NOT EXISTS (
+          SELECT 1
+          FROM High_Scores_Archive h
+          WHERE h.event_code = pairs.event_code
+            AND h.machine_id = pairs.machine_id
+            AND h.is_approved
+            AND h.player_id IS NOT NULL
+      );
+
+    INSERT INTO Machine_Champions
+        (event_code, machine_id, score_id, player_id, high_score, date_set)
+    SELECT best.event_code, best.machine_id, best.score_id, best.player_id, best.high_score, best.date_set
+    FROM (
+        SELECT DISTINCT event_code, machine_id
+        FROM unnest(p_event_codes, p_machine_ids) AS t(event_code, machine_id)
+        WHERE event_code IS NOT NULL AND machine_id IS NOT NULL
+    ) pairs
+    CROSS JOIN LATERAL (
+        SELECT h.event_code, h.machine_id, h.score_id, h.player_id, h.high_score, h.date_set
+        FROM High_Scores_Archive h
+        WHERE h.event_code = pairs.event_code
+          AND h.machine_id = pairs.machine_id
+          AND h.is_approved
+          AND h.player_id IS NOT NULL
+        ORDER BY h.high_score DESC, h.score_id
+        LIMIT 1
+    ) best
+    ON CONFLICT (event_code, machine_id) DO UPDATE SET
+        score_id = EXCLUDED.score_id,
+        player_id = EXCLUDED.player_id,
+        high_score = EXCLUDED.high_score,
+        date_set = EXCLUDED.date_set,
+        updated_at = NOW()
+    WHERE (Machine_Champions.score_id, Machine_Champions.player_id,
+           Machine_Champions.high_score, Machine_Champions.date_set)
+          IS DISTINCT FROM
+          (EXCLUDED.score_id, EXCLUDED.player_id, EXCLUDED.high_score, EXCLUDED.date_set);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Repair drift: re-derive every champion (of one event, or of all events)
+CREATE OR REPLACE FUNCTION rebuild_machine_champions(p_event_code VARCHAR(100) DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_event_codes VARCHAR(100)[];
+    v_machine_ids VARCHAR(50)[];
+BEGIN
+    -- Every pair that has a champion row or any score, so stale rows go too
+    SELECT array_agg(event_code), array_agg(machine_id)
+    INTO v_event_codes, v_machine_ids
+    FROM (
+        SELECT event_code, machine_id
+        FROM Machine_Champions
+        WHERE p_event_code IS NULL OR event_code = p_event_code
+        UNION
+        SELECT DISTINCT event_code, machine_id
+        FROM High_Scores_Archive
+        WHERE p_event_code IS NULL OR event_code = p_event_code
+    ) pairs;
+
+    PERFORM refresh_machine_champions(COALESCE(v_event_codes, '{}'), COALESCE(v_machine_ids, '{}'));
+
+    RETURN (SELECT COUNT(*) FROM Machine_Champions
+            WHERE p_event_code IS NULL OR event_code = p_event_code);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level triggers. A new approved score only has to beat the current
+-- champion; an update or delete (is_approved flipped, score corrected, row
+-- removed) re-derives every pair it touched.
+CREATE OR REPLACE FUNCTION maintain_machine_champions()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_event_codes VARCHAR(100)[];
+    v_machine_ids VARCHAR(50)[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO Machine_Champions
+            (event_code, machine_id, score_id, player_id, high_score, date_set)
+        SELECT DISTINCT ON (n.event_code, n.machine_id)
+            n.event_code, n.machine_id, n.score_id, n.player_id, n.high_score, n.date_set
+        FROM new_scores n
+        WHERE n.is_approved
+          AND n.event_code IS NOT NULL
+          AND n.machine_id IS NOT NULL
+          AND n.player_id IS NOT NULL
+        ORDER BY n.event_code, n.machine_id, n.high_score DESC, n.score_id
+        ON CONFLICT (event_code, machine_id) DO UPDATE SET
+            score_id = EXCLUDED.score_id,
+            player_id = EXCLUDED.player_id,
+            high_score = EXCLUDED.high_score,
+            date_set = EXCLUDED.date_set,
+            updated_at = NOW()
+        WHERE EXCLUDED.high_score > Machine_Champions.high_score;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(event_code), array_agg(machine_id)
+        INTO v_event_codes, v_machine_ids
+        FROM (
+            SELECT event_code, machine_id FROM old_scores
+            UNION
+            SELECT event_code, machine_id FROM new_scores
+        ) touched;
+    ELSE
+        SELECT array_agg(event_code), array_agg(machine_id)
+        INTO v_event_codes, v_machine_ids
+        FROM (SELECT DISTINCT event_code, machine_id FROM old_scores) touched;
+    END IF;
+
+    IF v_event_codes IS NOT NULL THEN
+        PERFORM refresh_machine_champions(v_event_codes, v_machine_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS high_scores_champions_insert ON High_Scores_Archive;
+CREATE TRIGGER high_scores_champions_insert
+    AFTER INSERT ON High_Scores_Archive
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_machine_champions();
+
+DROP TRIGGER IF EXISTS high_scores_champions_update ON High_Scores_Archive;
+CREATE TRIGGER high_scores_champions_update
+    AFTER UPDATE ON High_Scores_Archive
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_machine_champions();
+
+DROP TRIGGER IF EXISTS high_scores_champions_delete ON High_Scores_Archive;
+CREATE TRIGGER high_scores_champions_delete
+    AFTER DELETE ON High_Scores_Archive
+    REFERENCING OLD TABLE AS old_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_machine_champions();
+
+-- Backfill (and, on re-runs, repair)
+SELECT rebuild_machine_champions();
+
+COMMENT ON TABLE Machine_Champions IS 'Top approved score per machine per event, maintained by triggers on High_Scores_Archive';
+COMMENT ON FUNCTION rebuild_machine_champions(VARCHAR) IS 'Re-derive Machine_Champions from High_Scores_Archive to repair drift';
@@ -0,0 +1,164 @@
+-- Maintained personal bests (best approved score per player per machine per event)
+-- Kept current by triggers on High_Scores_Archive, so the recent-activity feed
+-- looks up only the rows it returns instead of aggregating the whole event
+-- Safe to run multiple times (idempotent)
+
+CREATE TABLE IF NOT EXISTS Personal_Bests (
+    event_code VARCHAR(100) NOT NULL,
+    player_id VARCHAR(100) NOT NULL,
+    machine_id VARCHAR(50) NOT NULL,
+    best_score BIGINT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (event_code, player_id, machine_id)
+);
+
+-- Cross-event lookups (recent_activity view)
+CREATE INDEX IF NOT EXISTS idx_personal_bests_player_machine
+ON Personal_Bests(player_id, machine_id);
+
+-- Newest scores of one event without walking every other event's rows
+CREATE INDEX IF NOT EXISTS idx_scores_event_date
+ON High_Scores_Archive(event_code, date_set DESC);
+
+-- Re-derive the personal best of each (event_code, player_id, machine_id)
+-- triple from the archive; triples without an approved score lose their row
+CREATE OR REPLACE FUNCTION refresh_personal_bests(
+    p_event_codes VARCHAR(100)[],
+    p_player_ids VARCHAR(100)[],
+    p_machine_ids VARCHAR(50)[]
+)
+RETURNS VOID AS $$
+BEGIN
+    WITH triples AS (
+        SELECT DISTINCT event_code, player_id, machine_id
+        FROM unnest(p_event_codes, p_player_ids, p_machine_ids) AS t(event_code, player_id, machine_id)
+        WHERE event_code IS NOT NULL AND player_id IS NOT NULL AND machine_id IS NOT NULL
+    ),
+    bests AS (
+        SELECT t.event_code, t.player_id, t.machine_id, (
+            SELECT MAX(h.high_score)
+            FROM High_Scores_Archive h
+            WHERE h.player_id = t.player_id
+              AND h.machine_id = t.machine_id
+              AND h.event_code = t.event_code
+              AND h.is_approved
+        ) AS best_score
+        FROM triples t
+    ),
+    removed AS (
+        DELETE FROM Personal_Bests pb
+        USING bests b
+        WHERE pb.event_code = b.event_code
+          AND pb.player_id = b.player_id
+          AND pb.machine_id = b.machine_id
+          AND b.best_score IS NULL
+    )
+    INSERT INTO Personal_Bests (event_code, player_id, machine_id, best_score)
+    SELECT event_code, player_id, machine_id, best_score
+    FROM bests
+    WHERE best_score IS NOT NULL
+    ON CONFLICT (event_code, player_id, machine_id) DO UPDATE SET
+        best_score = EXCLUDED.best_score,
+        updated_at = NOW()
+    WHERE Personal_Bests.best_score IS DISTINCT FROM EXCLUDED.best_score;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Repair drift: re-derive every personal best (of one event, or of all events)
+CREATE OR REPLACE FUNCTION rebuild_personal_bests(p_event_code VARCHAR(100) DEFAULT NULL)
+RETURNS INTEGER AS $$
+BEGIN
+    DELETE FROM Personal_Bests
+    WHERE p_event_code IS NULL OR event_code = p_event_code;
+
+    INSERT INTO Personal_Bests (event_code, player_id, machine_id, best_score)
+    SELECT event_code, player_id, machine_id, MAX(high_score)
+    FROM High_Scores_Archive
+    WHERE is_approved
+      AND event_code IS NOT NULL
+      AND player_id IS NOT NULL
+      AND machine_id IS NOT NULL
+      AND (p_event_code IS NULL OR event_code = p_event_code)
+    GROUP BY event_code, player_id, machine_id
+    ON CONFLICT (event_code, player_id, machine_id) DO UPDATE SET
+        best_score = GREATEST(Personal_Bests.best_score, EXCLUDED.best_score),
+        updated_at = NOW();
+
+    RETURN (SELECT COUNT(*) FROM Personal_Bests
+            WHERE p_event_code IS NULL OR event_code = p_event_code);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level triggers. New approved scores raise the best in place; an
+-- update or delete (is_approved flipped, score corrected, row removed)
+-- re-derives every triple it touched.
+CREATE OR REPLACE FUNCTION maintain_personal_bests()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_event_codes VARCHAR(100)[];
+    v_player_ids VARCHAR(100)[];
+    v_machine_ids VARCHAR(50)[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO Personal_Bests (event_code, player_id, machine_id, best_score)
+        SELECT n.event_code, n.player_id, n.machine_id, MAX(n.high_score)
+        FROM new_scores n
+        WHERE n.is_approved
+          AND n.event_code IS NOT NULL
+          AND n.player_id IS NOT NULL
+          AND n.machine_id IS NOT NULL
+        GROUP BY n.event_code, n.player_id, n.machine_id
+        ON CONFLICT (event_code, player_id, machine_id) DO UPDATE SET
+            best_score = EXCLUDED.best_score,
+            updated_at = NOW()
+        WHERE EXCLUDED.best_score > Personal_Bests.best_score;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(event_code), array_agg(player_id), array_agg(machine_id)
+        INTO v_event_codes, v_player_ids, v_machine_ids
+        FROM (
+            SELECT event_code, player_id, machine_id FROM old_scores
+            UNION
+            SELECT event_code, player_id, machine_id FROM new_scores
+        ) touched;
+    ELSE
+        SELECT array_agg(event_code), array_agg(player_id), array_agg(machine_id)
+        INTO v_event_codes, v_player_ids, v_machine_ids
+        FROM (SELECT DISTINCT event_code, player_id, machine_id FROM old_scores) touched;
+    END IF;
+
+    IF v_event_codes IS NOT NULL THEN
+        PERFORM refresh_personal_bests(v_event_codes, v_player_ids, v_machine_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS high_scores_bests_insert ON High_Scores_Archive;
+CREATE TRIGGER high_scores_bests_insert
+    AFTER INSERT ON High_Scores_Archive
+    REFERENCING NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_personal_bests();
+
+DROP TRIGGER IF EXISTS high_scores_bests_update ON High_Scores_Archive;
+CREATE TRIGGER high_scores_bests_update
+    AFTER UPDATE ON High_Scores_Archive
+    REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_personal_bests();
+
+DROP TRIGGER IF EXISTS high_scores_bests_delete ON High_Scores_Archive;
+CREATE TRIGGER high_scores_bests_delete
+    AFTER DELETE ON High_Scores_Archive
+    REFERENCING OLD TABLE AS old_scores
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_personal_bests();
+
+-- Backfill (and, on re-runs, repair)
+SELECT rebuild_personal_bests();
+
+COMMENT ON TABLE Personal_Bests IS 'Best approved score per player per machine per event, maintained by triggers on High_Scores_Archive';
+COMMENT ON FUNCTION rebuild_personal_bests(VARCHAR) IS 'Re-derive Personal_Bests from High_Scores_Archive to repair drift';
@@ -0,0 +1,125 @@
+-- Per-event partitions of High_Scores_Archive
+-- Every event gets its own LIST partition, created when the event row is
+-- inserted, so event_code filters prune to one partition and cold seasons can
+-- be detached (partition_archive.py maintain) without touching the current one.
+-- Databases whose archive is still a plain table are converted with
+-- partition_archive.py migrate; until then these functions do nothing.
+-- Safe to run multiple times (idempotent)
+
+-- Deterministic partition name: readable prefix plus a hash, since event codes
+-- are case-sensitive and may contain characters identifiers can't
+CREATE OR REPLACE FUNCTION score_partition_name(p_event_code VARCHAR(100))
+RETURNS TEXT AS $$
+    SELECT 'high_scores_archive_'
+        || left(trim(both '_' from regexp_replace(lower(p_event_code), '[^a-z0-9]+', '_', 'g')), 32)
+        || '_' || left(md5(p_event_code), 8);
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION score_archive_is_partitioned()
+RETURNS BOOLEAN AS $$
+    SELECT COALESCE((SELECT relkind = 'p' FROM pg_class
+                     WHERE oid = to_regclass('high_scores_archive')), false);
+$$ LANGUAGE sql STABLE;
+
+-- Create (or re-attach) the partition for one event. Rows that reached the
+-- default partition before it existed are moved in first. ATTACH only takes
+-- SHARE UPDATE EXCLUSIVE on the archive, so reads and writes carry on.
+CREATE OR REPLACE FUNCTION create_score_partition(p_event_code VARCHAR(100))
+RETURNS TEXT AS $$
+DECLARE
+    v_name TEXT := score_partition_name(p_event_code);
+    v_table REGCLASS;
+BEGIN
+    IF p_event_code IS NULL OR NOT score_archive_is_partitioned() THEN
+        RETURN NULL;
+    END IF;
+
+    v_table := to_regclass(quote_ident(v_name));
+    IF v_table IS NOT NULL AND EXISTS (
+        SELECT 1 FROM pg_inherits
+        WHERE inhrelid = v_table
+          AND inhparent = 'high_scores_archive'::regclass
+    ) THEN
+        RETURN v_name;
+    END IF;
+
+    -- A detached (cold) partition is re-attached as is
+    IF v_table IS NULL THEN
+        EXECUTE format('CREATE TABLE %I (LIKE High_Scores_Archive INCLUDING DEFAULTS)', v_name);
+        -- Lets ATTACH skip its validation scan
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT partition_event_code CHECK (event_code = %L)',
+                       v_name, p_event_code);
+    END IF;
+
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM High_Scores_Archive_Default WHERE event_code = %L RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        p_event_code, v_name);
+
+    EXECUTE format('ALTER TABLE High_Scores_Archive ATTACH PARTITION %I FOR VALUES IN (%L)',
+                   v_name, p_event_code);
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach one event's partition. The table stays, under the same name, and
+-- create_score_partition() re-attaches it. Machine_Champions, Personal_Bests
+-- and the leaderboard tables keep their rows, but a rebuild_*() repair run
+-- afterwards no longer sees the detached scores.
+CREATE OR REPLACE FUNCTION detach_score_partition(p_event_code VARCHAR(100))
+RETURNS TEXT AS $$
+DECLARE
+    v_name TEXT := score_partition_name(p_event_code);
+BEGIN
+    IF NOT score_archive_is_partitioned() OR NOT EXISTS (
+        SELECT 1 FROM pg_inherits
+        WHERE inhrelid = to_regclass(quote_ident(v_name))
+          AND inhparent = 'high_scores_archive'::regclass
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    EXECUTE format('ALTER TABLE High_Scores_Archive DETACH PARTITION %I', v_name);
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New events get their partition before their first score arrives
+CREATE OR REPLACE FUNCTION create_event_score_partition()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM create_score_partition(NEW.event_code);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS events_score_partition ON Events;
+CREATE TRIGGER events_score_partition
+    AFTER INSERT ON Events
+    FOR EACH ROW
+    EXECUTE FUNCTION create_event_score_partition();
+
+-- Partition state per event, for maintenance and monitoring
+CREATE OR REPLACE VIEW score_partitions AS
+SELECT
+    e.event_code,
+    e.event_name,
+    e.is_active,
+    e.stop_date,
+    score_partition_name(e.event_code) AS partition_name,
+    c.oid IS NOT NULL AS partition_exists,
+    i.inhrelid IS NOT NULL AS attached,
+    GREATEST(c.reltuples, 0)::bigint AS estimated_rows
+FROM Events e
+LEFT JOIN pg_class c ON c.oid = to_regclass(quote_ident(score_partition_name(e.event_code)))
+LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+    AND i.inhparent = to_regclass('high_scores_archive');
+
+-- Backfill: one partition per existing event
+SELECT create_score_partition(event_code) FROM Events ORDER BY event_code;
+
+COMMENT ON FUNCTION create_score_partition(VARCHAR) IS 'Create or re-attach the High_Scores_Archive partition of one event';
+COMMENT ON FUNCTION detach_score_partition(VARCHAR) IS 'Detach the High_Scores_Archive partition of one (cold) event';
+COMMENT ON VIEW score_partitions IS 'High_Scores_Archive partition per event: name, attached or detached, estimated rows';
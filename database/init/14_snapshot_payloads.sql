@@ -0,0 +1,104 @@
+-- Content-addressed storage for Api_Snapshots payloads
+-- The hourly fetch usually returns the same Stern JSON as the hour before.
+-- Every Api_Snapshots row is still written (one row per fetch), but its
+-- payload is stored once per distinct content, compressed, in
+-- Api_Snapshot_Payloads; the row keeps the hash, byte size and score count.
+-- Writers are unchanged: a BEFORE INSERT trigger moves raw_response out.
+-- Read payloads through snapshot_payload(snapshot_id) or api_snapshots_decoded.
+-- Safe to run multiple times (idempotent)
+
+CREATE TABLE IF NOT EXISTS Api_Snapshot_Payloads (
+    payload_hash CHAR(64) PRIMARY KEY, -- sha256 of the canonical jsonb text
+    payload JSONB NOT NULL,
+    byte_size INTEGER NOT NULL,
+    first_seen_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- lz4 compresses the payload faster and smaller than the default pglz;
+-- servers built without lz4 keep pglz
+DO $$
+BEGIN
+    EXECUTE 'ALTER TABLE Api_Snapshot_Payloads ALTER COLUMN payload SET COMPRESSION lz4';
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'lz4 not available (%), payloads stay pglz-compressed', SQLERRM;
+END;
+$$;
+
+ALTER TABLE Api_Snapshots
+    ADD COLUMN IF NOT EXISTS payload_hash CHAR(64) REFERENCES Api_Snapshot_Payloads(payload_hash),
+    ADD COLUMN IF NOT EXISTS byte_size INTEGER,
+    ADD COLUMN IF NOT EXISTS score_count INTEGER;
+
+ALTER TABLE Api_Snapshots ALTER COLUMN raw_response DROP NOT NULL;
+
+-- Scores in a Stern leaderboard response (leaderboard.scores), or the
+-- length of a bare array response
+CREATE OR REPLACE FUNCTION snapshot_score_count(p_payload JSONB)
+RETURNS INTEGER AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(p_payload -> 'leaderboard' -> 'scores') = 'array'
+            THEN jsonb_array_length(p_payload -> 'leaderboard' -> 'scores')
+        WHEN jsonb_typeof(p_payload) = 'array'
+            THEN jsonb_array_length(p_payload)
+        ELSE 0
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Hash the incoming raw_response, store it once, keep only the reference
+CREATE OR REPLACE FUNCTION store_snapshot_payload()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_text TEXT;
+BEGIN
+    IF NEW.raw_response IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    v_text := NEW.raw_response::text;
+    NEW.payload_hash := encode(sha256(convert_to(v_text, 'UTF8')), 'hex');
+    NEW.byte_size := octet_length(v_text);
+    NEW.score_count := snapshot_score_count(NEW.raw_response);
+
+    INSERT INTO Api_Snapshot_Payloads (payload_hash, payload, byte_size)
+    VALUES (NEW.payload_hash, NEW.raw_response, NEW.byte_size)
+    ON CONFLICT (payload_hash) DO NOTHING;
+
+    NEW.raw_response := NULL;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS api_snapshots_store_payload ON Api_Snapshots;
+CREATE TRIGGER api_snapshots_store_payload
+    BEFORE INSERT OR UPDATE OF raw_response ON Api_Snapshots
+    FOR EACH ROW
+    EXECUTE FUNCTION store_snapshot_payload();
+
+-- Decoded payload of one snapshot
+CREATE OR REPLACE FUNCTION snapshot_payload(p_snapshot_id INTEGER)
+RETURNS JSONB AS $$
+    SELECT COALESCE(s.raw_response, p.payload)
+    FROM Api_Snapshots s
+    LEFT JOIN Api_Snapshot_Payloads p ON p.payload_hash = s.payload_hash
+    WHERE s.snapshot_id = p_snapshot_id;
+$$ LANGUAGE sql STABLE;
+
+-- Api_Snapshots as it looked before, raw_response included
+CREATE OR REPLACE VIEW api_snapshots_decoded AS
+SELECT
+    s.snapshot_id,
+    s.event_code,
+    s.fetched_at,
+    s.payload_hash,
+    s.byte_size,
+    s.score_count,
+    COALESCE(s.raw_response, p.payload) as raw_response
+FROM Api_Snapshots s
+LEFT JOIN Api_Snapshot_Payloads p ON p.payload_hash = s.payload_hash;
+
+-- Backfill: move payloads written before this file (the trigger does the work)
+UPDATE Api_Snapshots SET raw_response = raw_response WHERE raw_response IS NOT NULL;
+
+COMMENT ON TABLE Api_Snapshot_Payloads IS 'Distinct Stern API payloads, keyed by sha256; Api_Snapshots rows reference them';
+COMMENT ON FUNCTION snapshot_payload(INTEGER) IS 'Decoded raw_response of one Api_Snapshots row';
+COMMENT ON VIEW api_snapshots_decoded IS 'Api_Snapshots with raw_response joined back from Api_Snapshot_Payloads';
@@ -0,0 +1,81 @@
+-- Kiosk materialized views: refresh bookkeeping
+-- pinball-integration/database_views.sql materializes the views the kiosk
+-- server reads (leaderboard_current, game_champions, recent_activity,
+-- league_statistics). update_combined_leaderboard() refreshes them
+-- CONCURRENTLY as its last step, so kiosk reads never wait on a refresh and
+-- never re-run the archive aggregates themselves.
+-- Kiosk_View_Refresh records when (and at which leaderboard generation) each
+-- view was last refreshed; kiosk_view_status compares that with the last
+-- recompute so the server can report stale data.
+-- Views that are missing (database_views.sql not applied yet) or still plain
+-- views are skipped.
+-- Safe to run multiple times (idempotent)
+
+CREATE TABLE IF NOT EXISTS Kiosk_View_Refresh (
+    view_name VARCHAR(63) PRIMARY KEY,
+    generation BIGINT NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    duration_ms NUMERIC(10, 1)
+);
+
+-- Refresh every kiosk materialized view; returns the number refreshed
+CREATE OR REPLACE FUNCTION refresh_kiosk_views()
+RETURNS INTEGER AS $$
+DECLARE
+    v_view TEXT;
+    v_populated BOOLEAN;
+    v_started TIMESTAMP WITH TIME ZONE;
+    v_generation BIGINT;
+    v_refreshed INTEGER := 0;
+BEGIN
+    SELECT generation INTO v_generation FROM Leaderboard_Generation WHERE singleton;
+
+    FOREACH v_view IN ARRAY ARRAY['leaderboard_current', 'game_champions',
+                                  'recent_activity', 'league_statistics'] LOOP
+        SELECT c.relispopulated INTO v_populated
+        FROM pg_class c
+        WHERE c.oid = to_regclass(v_view)
+          AND c.relkind = 'm';
+        IF NOT FOUND THEN
+            CONTINUE;
+        END IF;
+
+        v_started := clock_timestamp();
+        -- CONCURRENTLY needs the view populated once (and a unique index)
+        IF v_populated THEN
+            EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', v_view);
+        ELSE
+            EXECUTE format('REFRESH MATERIALIZED VIEW %I', v_view);
+        END IF;
+
+        INSERT INTO Kiosk_View_Refresh (view_name, generation, refreshed_at, duration_ms)
+        VALUES (v_view, COALESCE(v_generation, 0), NOW(),
+                EXTRACT(EPOCH FROM (clock_timestamp() - v_started)) * 1000)
+        ON CONFLICT (view_name) DO UPDATE SET
+            generation = EXCLUDED.generation,
+            refreshed_at = EXCLUDED.refreshed_at,
+            duration_ms = EXCLUDED.duration_ms;
+        v_refreshed := v_refreshed + 1;
+    END LOOP;
+
+    RETURN v_refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One row per refreshed kiosk view. The refresh runs in the recompute's
+-- transaction, so a view refreshed before the last recompute started missed it
+CREATE OR REPLACE VIEW kiosk_view_status AS
+SELECT
+    r.view_name,
+    r.generation,
+    r.refreshed_at,
+    EXTRACT(EPOCH FROM (NOW() - r.refreshed_at))::INTEGER as age_seconds,
+    r.duration_ms,
+    s.last_run_at as last_recompute_at,
+    COALESCE(s.last_run_at > r.refreshed_at, FALSE) as missed_recompute
+FROM Kiosk_View_Refresh r
+LEFT JOIN Leaderboard_Recompute_State s ON s.singleton;
+
+COMMENT ON TABLE Kiosk_View_Refresh IS 'Last refresh of each kiosk materialized view and the leaderboard generation it reflects';
+COMMENT ON FUNCTION refresh_kiosk_views() IS 'REFRESH MATERIALIZED VIEW CONCURRENTLY for every kiosk view; called by update_combined_leaderboard()';
+COMMENT ON VIEW kiosk_view_status IS 'Kiosk materialized views with their refresh age and whether they missed the last recompute';
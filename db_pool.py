@@ -0,0 +1,327 @@
+"""
+Database Connection Pool
+Bounded, thread-safe psycopg2 connection pool for the API server
+
+Settings (environment variables):
+    DB_POOL_MIN           connections opened eagerly on first use (default 1)
+    DB_POOL_MAX           hard cap on open connections per process (default 10)
+    DB_POOL_TIMEOUT       seconds a request waits for a free connection (default 5)
+    DB_POOL_MAX_LIFETIME  seconds before a connection is recycled (default 1800)
+    DB_POOL_PING_AFTER    idle seconds after which checkout pings with SELECT 1 (default 30)
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+# Checkout latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class _PooledConnection:
+    """Bookkeeping for one physical connection"""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Connections are opened lazily up to ``maxconn``. On checkout a connection
+    older than ``max_lifetime`` is recycled, and one that has been idle longer
+    than ``ping_after`` is verified with ``SELECT 1`` before it is handed out.
+    Pooled connections run in autocommit mode; callers that need a
+    transaction issue ``BEGIN`` themselves.
+    """
+
+    def __init__(self, connect_kwargs, minconn=1, maxconn=10, timeout=5.0,
+                 max_lifetime=1800.0, ping_after=30.0):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError("Invalid pool bounds: min=%s max=%s" % (minconn, maxconn))
+        self.connect_kwargs = dict(connect_kwargs)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition(threading.Lock())
+        self._reset_state()
+
+    def _reset_state(self):
+        """(Re)initialise all mutable state for the current process"""
+        self._pid = os.getpid()
+        self._idle = []          # LIFO stack of _PooledConnection
+        self._in_use = {}        # id(conn) -> _PooledConnection
+        self._opening = 0        # connections being opened outside the lock
+        self._waiting = 0
+        self._warmed = False
+        self._counters = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'recycled_max_lifetime': 0,
+            'failed_health_checks': 0,
+            'discarded_broken': 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._checkout_total = 0.0
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    # ---------- connection lifecycle ----------
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        conn.autocommit = True
+        return _PooledConnection(conn)
+
+    def _close(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._counters['connections_closed'] += 1
+
+    def _is_healthy(self, entry, now):
+        """Cheap local checks first; only ping if the connection sat idle a while"""
+        conn = entry.conn
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if now - entry.last_used < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _check_fork(self):
+        # Connections inherited across a fork (gunicorn --preload) belong to the
+        # parent; forget them without closing the parent's sockets.
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    def _warm(self):
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            needed = self.minconn - len(self._idle) - len(self._in_use) - self._opening
+            self._opening += max(needed, 0)
+        for _ in range(max(needed, 0)):
+            try:
+                entry = self._connect()
+            except Exception as e:
+                print(f"⚠️ Pool warm-up connection failed: {e}")
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+                continue
+            with self._cond:
+                self._opening -= 1
+                self._counters['connections_opened'] += 1
+                self._idle.append(entry)
+                self._cond.notify()
+
+    # ---------- checkout / checkin ----------
+
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds for a free slot"""
+        self._check_fork()
+        if not self._warmed:
+            self._warm()
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = 0.0
+
+        while True:
+            entry = None
+            must_open = False
+            with self._cond:
+                while not self._idle and len(self._in_use) + self._opening >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            "No database connection available after %.1fs (max=%d)"
+                            % (self.timeout, self.maxconn))
+                    self._waiting += 1
+                    wait_started = time.monotonic()
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                        waited += time.monotonic() - wait_started
+                if self._idle:
+                    entry = self._idle.pop()
+                    # Reserve the slot while we health-check outside the lock
+                    self._opening += 1
+                else:
+                    self._opening += 1
+                    must_open = True
+
+            if must_open:
+                try:
+                    entry = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._counters['connections_opened'] += 1
+            else:
+                now = time.monotonic()
+                recycle = now - entry.created_at >= self.max_lifetime
+                if recycle or not self._is_healthy(entry, now):
+                    with self._cond:
+                        key = 'recycled_max_lifetime' if recycle else 'failed_health_checks'
+                        self._counters[key] += 1
+                        self._opening -= 1
+                        self._cond.notify()
+                    self._close(entry)
+                    continue
+
+            with self._cond:
+                self._opening -= 1
+                self._in_use[id(entry.conn)] = entry
+                elapsed = time.monotonic() - started
+                self._record_checkout(waited, elapsed)
+            return entry.conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool (or close it if broken / discarded)"""
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Not ours (e.g. checked out before a fork) - just close it
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+            except Exception:
+                discard = True
+        if conn.closed or discard:
+            with self._cond:
+                self._counters['discarded_broken'] += 1
+                self._cond.notify()
+            self._close(entry)
+            return
+
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always returns it"""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def closeall(self):
+        """Close every idle connection; in-use connections are closed on return"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._warmed = False
+        for entry in idle:
+            self._close(entry)
+
+    # ---------- metrics ----------
+
+    def _record_checkout(self, waited, elapsed):
+        """Caller must hold the lock"""
+        self._counters['checkouts'] += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._checkout_total += elapsed
+        self._latency_counts[bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000.0)] += 1
+
+    def stats(self):
+        """Snapshot of pool occupancy, wait time and checkout latency"""
+        with self._cond:
+            checkouts = self._counters['checkouts']
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS, self._latency_counts):
+                cumulative += count
+                buckets[f"le_{bound}ms"] = cumulative
+            buckets["le_inf"] = cumulative + self._latency_counts[-1]
+            return {
+                "pid": self._pid,
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": len(self._idle) + len(self._in_use),
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "waiting": self._waiting,
+                "wait_time": {
+                    "total_seconds": round(self._wait_total, 6),
+                    "max_seconds": round(self._wait_max, 6),
+                    "avg_ms": round(self._wait_total * 1000.0 / checkouts, 3) if checkouts else 0,
+                },
+                "checkout_latency": {
+                    "avg_ms": round(self._checkout_total * 1000.0 / checkouts, 3) if checkouts else 0,
+                    "histogram": buckets,
+                },
+                "settings": {
+                    "timeout_seconds": self.timeout,
+                    "max_lifetime_seconds": self.max_lifetime,
+                    "ping_after_seconds": self.ping_after,
+                },
+                **self._counters,
+            }
+
+
+def pool_from_env(connect_kwargs):
+    """Build a ConnectionPool using the DB_POOL_* environment variables"""
+    return ConnectionPool(
+        connect_kwargs,
+        minconn=int(os.getenv('DB_POOL_MIN', '1')),
+        maxconn=int(os.getenv('DB_POOL_MAX', '10')),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        ping_after=float(os.getenv('DB_POOL_PING_AFTER', '30')),
+    )
@@ -0,0 +1,137 @@
+"""
+Kiosk Event Stream
+Server-Sent Events fan-out of Postgres notifications to connected kiosks
+
+Every worker holds exactly one LISTEN connection (pg_listener); each SSE
+client only gets a small in-memory queue. Under gunicorn's gevent worker
+(gunicorn.conf.py) a connected kiosk costs a greenlet, not a thread.
+
+Settings (environment variables):
+    SSE_HEARTBEAT_SECONDS  keep-alive comment interval (default 15)
+    SSE_MAX_CLIENTS        connections accepted per worker (default 1000)
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+
+# Notification channel -> (SSE event name, key for a non-JSON-object payload)
+STREAM_CHANNELS = {
+    'leaderboard_updated': ('leaderboard_updated', 'generation'),
+    'new_high_score': ('new_high_score', 'payload'),
+}
+
+# Events queued for a client that stops reading before it is dropped
+CLIENT_QUEUE_SIZE = 100
+
+_CLOSE = object()
+
+
+class TooManyClients(Exception):
+    """Raised when a worker already serves SSE_MAX_CLIENTS streams"""
+
+
+class EventBroadcaster:
+    """Fan notifications out to every connected SSE client"""
+
+    def __init__(self, listener, heartbeat=None, max_clients=None):
+        self.listener = listener
+        self.heartbeat = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15')) if heartbeat is None else heartbeat
+        self.max_clients = int(os.getenv('SSE_MAX_CLIENTS', '1000')) if max_clients is None else max_clients
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.events_published = 0
+        self.clients_dropped = 0
+        for channel, (event, field) in STREAM_CHANNELS.items():
+            listener.subscribe(channel, self._relay(event, field))
+
+    def _relay(self, event, field):
+        def handler(payload):
+            try:
+                data = json.loads(payload) if payload else {}
+            except ValueError:
+                data = payload
+            if not isinstance(data, dict):
+                data = {field: data}
+            self.publish(event, data)
+        return handler
+
+    def publish(self, event, data):
+        """Queue ``event`` for every client; clients that fell behind are dropped"""
+        frame = self.format_event(event, data, next(self._ids))
+        with self._lock:
+            clients = list(self._clients)
+            self.events_published += 1
+        for client in clients:
+            try:
+                client.put_nowait(frame)
+            except queue.Full:
+                self._drop(client)
+
+    def _drop(self, client):
+        with self._lock:
+            if client not in self._clients:
+                return
+            self._clients.discard(client)
+            self.clients_dropped += 1
+        # Make room for the close marker so the stream generator ends
+        try:
+            while True:
+                client.get_nowait()
+        except queue.Empty:
+            pass
+        client.put_nowait(_CLOSE)
+
+    @staticmethod
+    def format_event(event, data, event_id=None):
+        lines = []
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"event: {event}")
+        lines.append(f"data: {json.dumps(data, default=str)}")
+        return ("\n".join(lines) + "\n\n").encode('utf-8')
+
+    def stream(self, hello=None):
+        """Register a client and return a generator of SSE frames for it"""
+        self.listener.ensure_started()
+        client = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                raise TooManyClients(f"{len(self._clients)} streams already open")
+            self._clients.add(client)
+
+        def generate():
+            try:
+                # Tell EventSource how long to wait before reconnecting
+                yield b"retry: 5000\n\n"
+                if hello is not None:
+                    yield self.format_event('hello', hello)
+                while True:
+                    try:
+                        frame = client.get(timeout=self.heartbeat)
+                    except queue.Empty:
+                        # Comment line keeps proxies from closing an idle stream
+                        yield b": keep-alive\n\n"
+                        continue
+                    if frame is _CLOSE:
+                        return
+                    yield frame
+            finally:
+                with self._lock:
+                    self._clients.discard(client)
+
+        return generate()
+
+    def stats(self):
+        with self._lock:
+            clients = len(self._clients)
+        return {
+            "clients": clients,
+            "max_clients": self.max_clients,
+            "events_published": self.events_published,
+            "clients_dropped": self.clients_dropped,
+            "listener_connected": self.listener.connected,
+        }
@@ -0,0 +1,40 @@
+"""
+Gunicorn settings for the leaderboard API
+
+gevent workers let every kiosk hold its /api/stream connection open as a
+greenlet instead of tying up a worker thread. psycogreen makes psycopg2
+yield to other greenlets while it waits on Postgres.
+
+Each worker writes its /metrics series to METRICS_DIR so any worker can
+serve the totals of all of them (see metrics.py).
+"""
+
+import os
+import tempfile
+
+# Set before the workers import api_server, so they inherit it
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'pinball-metrics'))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5050')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_class = 'gevent'
+# Concurrent connections (SSE streams included) per worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+timeout = 60
+
+
+def on_starting(server):
+    import metrics
+    # Counts from a previous run would otherwise be summed into this one
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+    metrics.clear_directory(os.environ['METRICS_DIR'])
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid, os.environ['METRICS_DIR'])
+
+
+def post_fork(server, worker):
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Pinball Score Ingestion
+Bulk replacement for the per-score n8n loop: fetch the Stern leaderboard,
+upsert players and machines, keep only scores that beat the archive, and
+record the raw snapshot - all in one transaction.
+
+Usage (cron or n8n "Execute Command"):
+    python ingest_scores.py                       # fetch STERN_EVENT_CODE from the Stern API
+    python ingest_scores.py --file response.json  # ingest a saved response ('-' = stdin)
+    python ingest_scores.py --recompute --json    # also rebuild the leaderboard; JSON summary
+    python ingest_scores.py --full                # skip the diff against the previous snapshot
+
+Connection settings come from the usual DB_* environment variables (.env).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, Json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'pinball'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'your_password_here')
+}
+
+DEFAULT_EVENT_CODE = os.getenv('STERN_EVENT_CODE', 'hJjW-WXu-oCGQ')
+STERN_API_URL = ('https://api.prd.sternpinball.io/api/v1/portal/leaderboards/'
+                 '?event_code={event_code}&event_state=current&format=json')
+
+# ==================== PARSING ====================
+
+def parse_leaderboard(raw, fetched_at):
+    """
+    Split a Stern leaderboard response into (event, machines, scores, skipped).
+
+    Mirrors the n8n "Extract Event Metadata" / "Extract Score Data" nodes.
+    Scores whose title is missing from ``leaderboard.titles`` (or that have
+    no username) cannot be stored and are returned separately as skipped.
+    """
+    leaderboard = raw.get('leaderboard') or {}
+    event = {
+        'event_code': leaderboard.get('code') or DEFAULT_EVENT_CODE,
+        'event_name': leaderboard.get('name') or 'Unknown Event',
+        'start_date': leaderboard.get('start_date'),
+        'stop_date': leaderboard.get('stop_date'),
+    }
+
+    titles = leaderboard.get('titles') if isinstance(leaderboard.get('titles'), list) else []
+    machine_ids = {t.get('title_name'): t.get('title_code') for t in titles}
+    machines = {}
+    for title in titles:
+        if title.get('title_code'):
+            machines[title['title_code']] = title.get('title_name') or title['title_code']
+
+    scores = []
+    skipped = 0
+    for score in leaderboard.get('scores') if isinstance(leaderboard.get('scores'), list) else []:
+        machine_id = machine_ids.get(score.get('title_name'))
+        if not machine_id or not score.get('username') or score.get('score') is None:
+            skipped += 1
+            continue
+        scores.append({
+            'player_id': score['username'],
+            'display_name': score['username'],
+            'initials': score.get('initials'),
+            'avatar_url': score.get('avatar_path'),
+            'background_color_hex': score.get('background_color_hex'),
+            # The Stern API spells it "is_all_accesss"
+            'is_all_access': bool(score.get('is_all_accesss', score.get('is_all_access', False))),
+            'machine_id': machine_id,
+            'high_score': int(score['score']),
+            'date_set': fetched_at,
+        })
+    return event, machines, scores, skipped
+
+
+def best_scores(scores):
+    """Highest score per (player, machine); only the best can beat the archive"""
+    best = {}
+    for score in scores:
+        key = (score['player_id'], score['machine_id'])
+        if key not in best or score['high_score'] > best[key]['high_score']:
+            best[key] = score
+    return list(best.values())
+
+
+def unique_players(scores):
+    """Last-seen profile per player (ON CONFLICT can't touch a row twice)"""
+    players = {}
+    for score in scores:
+        players[score['player_id']] = score
+    return list(players.values())
+
+
+PROFILE_FIELDS = ('display_name', 'avatar_url', 'background_color_hex', 'is_all_access')
+
+
+def diff_leaderboards(previous, current):
+    """
+    Compare two parsed responses, each ``(machines, candidates, players)``,
+    keyed by (username, title_code).
+
+    Returns only what the database steps need to see: candidates that are new
+    or beat the previous response, players who are new, changed profile or
+    have such a score, and titles that are new or renamed, plus counts of
+    what was added and removed.
+    """
+    prev_machines, prev_candidates, prev_players = previous
+    machines, candidates, players = current
+
+    prev_best = {(s['player_id'], s['machine_id']): s['high_score'] for s in prev_candidates}
+    changed = []
+    for score in candidates:
+        before = prev_best.get((score['player_id'], score['machine_id']))
+        if before is None or score['high_score'] > before:
+            changed.append(score)
+
+    prev_profiles = {p['player_id']: tuple(p[f] for f in PROFILE_FIELDS) for p in prev_players}
+    scored = {score['player_id'] for score in changed}
+    changed_players = [p for p in players
+                       if p['player_id'] in scored
+                       or prev_profiles.get(p['player_id']) != tuple(p[f] for f in PROFILE_FIELDS)]
+
+    player_ids = {p['player_id'] for p in players}
+    return {
+        'scores': changed,
+        'players': changed_players,
+        'machines': {code: name for code, name in machines.items() if prev_machines.get(code) != name},
+        'players_added': len(player_ids - prev_profiles.keys()),
+        'players_removed': len(prev_profiles.keys() - player_ids),
+        'titles_added': len(machines.keys() - prev_machines.keys()),
+        'titles_removed': len(prev_machines.keys() - machines.keys()),
+    }
+
+# ==================== DATABASE STAGES ====================
+
+UPSERT_EVENT_SQL = """
+    INSERT INTO Events (event_code, event_name, start_date, stop_date, location_id, event_type)
+    VALUES (%(event_code)s, %(event_name)s, %(start_date)s::timestamp, %(stop_date)s::timestamp,
+            '11440', 'STERN_LEAGUE')
+    ON CONFLICT (event_code)
+    DO UPDATE SET
+        event_name = EXCLUDED.event_name,
+        start_date = EXCLUDED.start_date,
+        stop_date = EXCLUDED.stop_date,
+        is_active = true
+"""
+
+# The api_snapshots_store_payload trigger stores raw_response once per
+# distinct content in Api_Snapshot_Payloads and keeps only its hash here
+ARCHIVE_SNAPSHOT_SQL = """
+    INSERT INTO Api_Snapshots (event_code, fetched_at, raw_response)
+    VALUES (%s, %s, %s)
+    RETURNING snapshot_id, payload_hash
+"""
+
+SNAPSHOT_PAYLOAD_SQL = "SELECT snapshot_payload(%s) as raw_response"
+
+# The diff stage's baseline: the newest snapshot already stored for the event
+PREVIOUS_SNAPSHOT_SQL = """
+    SELECT snapshot_id, payload_hash
+    FROM Api_Snapshots
+    WHERE event_code = %s
+    ORDER BY fetched_at DESC, snapshot_id DESC
+    LIMIT 1
+"""
+
+UPSERT_PLAYERS_SQL = """
+    INSERT INTO Players (player_id, display_name, avatar_url, background_color_hex, is_all_access, last_seen)
+    SELECT p.player_id, p.display_name, p.avatar_url, p.background_color_hex, p.is_all_access, NOW()
+    FROM unnest(%s::varchar[], %s::varchar[], %s::text[], %s::varchar[], %s::boolean[])
+         AS p(player_id, display_name, avatar_url, background_color_hex, is_all_access)
+    ON CONFLICT (player_id)
+    DO UPDATE SET
+        display_name = EXCLUDED.display_name,
+        avatar_url = EXCLUDED.avatar_url,
+        background_color_hex = EXCLUDED.background_color_hex,
+        is_all_access = EXCLUDED.is_all_access,
+        last_seen = NOW()
+"""
+
+# Players the diff left out were still in the response: keep last_seen current
+TOUCH_PLAYERS_SQL = """
+    UPDATE Players SET last_seen = NOW()
+    WHERE player_id = ANY(%s::varchar[])
+"""
+
+UPSERT_MACHINES_SQL = """
+    INSERT INTO Machines (machine_id, machine_name, is_active)
+    SELECT m.machine_id, m.machine_name, true
+    FROM unnest(%s::varchar[], %s::varchar[]) AS m(machine_id, machine_name)
+    ON CONFLICT (machine_id)
+    DO UPDATE SET
+        machine_name = EXCLUDED.machine_name,
+        is_active = true
+"""
+
+# Set-based "Check for Higher Score" + "Insert New High Score": a score is
+# new when no archived score for the same player/machine/event is >= it
+INSERT_HIGHER_SCORES_SQL = """
+    INSERT INTO High_Scores_Archive
+        (player_id, machine_id, high_score, date_set, event_code, score_source, is_approved)
+    SELECT i.player_id, i.machine_id, i.high_score, %(date_set)s, %(event_code)s, 'API', true
+    FROM unnest(%(player_ids)s::varchar[], %(machine_ids)s::varchar[], %(high_scores)s::bigint[])
+         AS i(player_id, machine_id, high_score)
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM High_Scores_Archive h
+        WHERE h.event_code = %(event_code)s
+          AND h.machine_id = i.machine_id
+          AND h.player_id = i.player_id
+          AND h.high_score >= i.high_score
+    )
+    ON CONFLICT ON CONSTRAINT unique_score_per_event DO NOTHING
+    RETURNING player_id, machine_id, high_score, date_set, event_code
+"""
+
+# Same steps as the n8n "Recalculate Leaderboard" and history nodes
+RECOMPUTE_SQL = """
+    SELECT update_combined_leaderboard(start_date, stop_date, event_code)
+    FROM Events
+    WHERE is_active = true
+    LIMIT 1
+"""
+
+SNAPSHOT_HISTORY_SQL = "SELECT snapshot_leaderboard_history()"
+
+# With no new scores only the 24-hour trend window moves; the API caches are
+# invalidated only if a trend actually changed
+REFRESH_TRENDS_SQL = """
+    SELECT CASE WHEN refresh_leaderboard_trends(start_date, stop_date, event_code, '{}') > 0
+                THEN bump_leaderboard_generation('ingest_scores')
+           END as generation
+    FROM Events
+    WHERE is_active = true
+    LIMIT 1
+"""
+
+
+class StageTimer:
+    """Collects wall-clock milliseconds per named stage"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def ingest(conn, raw, fetched_at=None, recompute=False, timer=None, full=False, engine=None):
+    """
+    Ingest one Stern leaderboard response in a single transaction.
+
+    Returns a summary dict (counts per stage). Nothing is written if any
+    stage fails. With ``recompute`` the leaderboard rebuild and history
+    snapshot run in the same transaction.
+
+    Only scores, players and titles that changed since the event's previous
+    snapshot reach the database steps; ``full`` processes the whole
+    response. When no score changed the recompute is skipped; the 24-hour
+    trends are still rolled forward, and the leaderboard generation bumped
+    only if one of them changed.
+
+    A long-running caller can pass its ``engine`` (leaderboard_engine.
+    LeaderboardEngine for the event): the rows actually inserted are applied
+    to it after the commit, and ``players_moved`` counts the players whose
+    combined score changed, without asking Postgres for rankings.
+    """
+    timer = timer or StageTimer()
+    fetched_at = fetched_at or datetime.now(timezone.utc)
+
+    with timer.stage('parse'):
+        event, machines, scores, skipped = parse_leaderboard(raw, fetched_at)
+        candidates = best_scores(scores)
+        players = unique_players(scores)
+        seen_players = [p['player_id'] for p in players]
+
+    summary = {
+        'event_code': event['event_code'],
+        'scores_received': len(scores) + skipped,
+        'scores_skipped': skipped,
+        'players': len(players),
+        'machines': len(machines),
+        'scores_compared': len(candidates),
+        'scores_changed': len(candidates),
+        'players_added': None,
+        'players_removed': None,
+        'titles_added': None,
+        'titles_removed': None,
+        'diff_base': None,
+        'new_scores': 0,
+        'snapshot_id': None,
+        'snapshot_hash': None,
+        'recomputed': False,
+        'trends_changed': False,
+        'players_moved': None,
+    }
+    inserted = []
+
+    try:
+        with conn.cursor() as cur:
+            # One ingestion per event at a time; a second run waits, then
+            # sees the first run's scores in its higher-score check
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('ingest_scores:' || %s))",
+                        (event['event_code'],))
+
+            with timer.stage('event'):
+                cur.execute(UPSERT_EVENT_SQL, event)
+
+            with timer.stage('snapshot'):
+                cur.execute(PREVIOUS_SNAPSHOT_SQL, (event['event_code'],))
+                previous = cur.fetchone()
+                cur.execute(ARCHIVE_SNAPSHOT_SQL, (event['event_code'], fetched_at, Json(raw)))
+                snapshot = cur.fetchone()
+                summary['snapshot_id'] = snapshot['snapshot_id']
+                summary['snapshot_hash'] = snapshot['payload_hash']
+
+            with timer.stage('diff'):
+                if previous is not None and not full:
+                    if previous['payload_hash'] == snapshot['payload_hash']:
+                        # Byte-identical response: nothing to compare
+                        prev_parsed = (machines, candidates, players)
+                    else:
+                        cur.execute(SNAPSHOT_PAYLOAD_SQL, (previous['snapshot_id'],))
+                        _, prev_machines, prev_scores, _ = parse_leaderboard(
+                            cur.fetchone()['raw_response'] or {}, fetched_at)
+                        prev_parsed = (prev_machines, best_scores(prev_scores),
+                                       unique_players(prev_scores))
+                    delta = diff_leaderboards(prev_parsed, (machines, candidates, players))
+                    candidates, players, machines = delta['scores'], delta['players'], delta['machines']
+                    summary['diff_base'] = previous['snapshot_id']
+                    for key in ('players_added', 'players_removed', 'titles_added', 'titles_removed'):
+                        summary[key] = delta[key]
+                summary['scores_changed'] = len(candidates)
+
+            if players:
+                with timer.stage('players'):
+                    cur.execute(UPSERT_PLAYERS_SQL, (
+                        [p['player_id'] for p in players],
+                        [p['display_name'] for p in players],
+                        [p['avatar_url'] for p in players],
+                        [p['background_color_hex'] for p in players],
+                        [p['is_all_access'] for p in players],
+                    ))
+            if len(players) < len(seen_players):
+                with timer.stage('last_seen'):
+                    upserted = {p['player_id'] for p in players}
+                    cur.execute(TOUCH_PLAYERS_SQL,
+                                ([player_id for player_id in seen_players if player_id not in upserted],))
+
+            if machines:
+                with timer.stage('machines'):
+                    cur.execute(UPSERT_MACHINES_SQL, (list(machines), list(machines.values())))
+
+            if candidates:
+                with timer.stage('scores'):
+                    cur.execute(INSERT_HIGHER_SCORES_SQL, {
+                        'player_ids': [s['player_id'] for s in candidates],
+                        'machine_ids': [s['machine_id'] for s in candidates],
+                        'high_scores': [s['high_score'] for s in candidates],
+                        'date_set': fetched_at,
+                        'event_code': event['event_code'],
+                    })
+                    inserted = cur.fetchall()
+                    summary['new_scores'] = len(inserted)
+
+            if recompute and candidates:
+                with timer.stage('recompute'):
+                    cur.execute(RECOMPUTE_SQL)
+                    cur.execute(SNAPSHOT_HISTORY_SQL)
+                summary['recomputed'] = True
+            elif recompute:
+                with timer.stage('trends'):
+                    cur.execute(REFRESH_TRENDS_SQL)
+                    row = cur.fetchone()
+                summary['trends_changed'] = bool(row and row['generation'] is not None)
+
+        with timer.stage('commit'):
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if engine is not None:
+        with timer.stage('engine'):
+            moved = engine.add_scores((r['player_id'], r['machine_id'], r['high_score'], r['date_set'], r['event_code'])
+                                      for r in inserted)
+        summary['players_moved'] = len(moved)
+    summary['timings_ms'] = timer.timings
+    return summary
+
+
+def load_snapshot(conn, snapshot_id):
+    """Decoded Stern response stored for one Api_Snapshots row (None if unknown)"""
+    with conn.cursor() as cur:
+        cur.execute(SNAPSHOT_PAYLOAD_SQL, (snapshot_id,))
+        row = cur.fetchone()
+    if row is None:
+        return None
+    return row['raw_response'] if isinstance(row, dict) else row[0]
+
+# ==================== COMMAND LINE ====================
+
+def load_response(args):
+    """Read the Stern response from --file / stdin, or fetch it from the API"""
+    if args.file == '-':
+        return json.load(sys.stdin)
+    if args.file:
+        with open(args.file, 'r') as f:
+            return json.load(f)
+    url = STERN_API_URL.format(event_code=args.event_code)
+    with urllib.request.urlopen(url, timeout=args.timeout) as resp:
+        return json.load(resp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-ingest a Stern leaderboard response')
+    parser.add_argument('--file', help="saved API response to ingest ('-' reads stdin)")
+    parser.add_argument('--event-code', default=DEFAULT_EVENT_CODE,
+                        help='Stern event code to fetch (default: STERN_EVENT_CODE)')
+    parser.add_argument('--timeout', type=float, default=30, help='API fetch timeout in seconds')
+    parser.add_argument('--recompute', action='store_true',
+                        help='rebuild the leaderboard and snapshot history in the same transaction')
+    parser.add_argument('--json', action='store_true', help='print the summary as one JSON line')
+    parser.add_argument('--full', action='store_true',
+                        help='process every score, not only those changed since the last snapshot')
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    try:
+        with timer.stage('fetch'):
+            raw = load_response(args)
+    except Exception as e:
+        print(f"❌ Could not load leaderboard response: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+
+    conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+    try:
+        summary = ingest(conn, raw, recompute=args.recompute, timer=timer, full=args.full)
+    except Exception as e:
+        print(f"❌ Ingestion failed (rolled back): {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(summary, default=str))
+        return 0
+
+    print(f"🎮 Event {summary['event_code']} (snapshot #{summary['snapshot_id']})")
+    print(f"📥 {summary['scores_received']} scores received, {summary['scores_skipped']} skipped, "
+          f"{summary['players']} players, {summary['machines']} machines")
+    if summary['diff_base'] is not None:
+        print(f"🔍 {summary['scores_changed']} scores changed of {summary['scores_compared']} "
+              f"since snapshot #{summary['diff_base']} (players +{summary['players_added']}"
+              f"/-{summary['players_removed']}, titles +{summary['titles_added']}"
+              f"/-{summary['titles_removed']})")
+    print(f"🏆 {summary['new_scores']} new high scores"
+          + (" - leaderboard recomputed" if summary['recomputed'] else "")
+          + (" - nothing changed, recompute skipped" if args.recompute and not summary['scores_changed'] else "")
+          + (" (trends rolled forward)" if summary['trends_changed'] else ""))
+    for stage, ms in summary['timings_ms'].items():
+        print(f"⏱️  {stage:<10} {ms:>9.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
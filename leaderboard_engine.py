@@ -0,0 +1,620 @@
+"""
+Leaderboard Engine
+In-process combined leaderboard that applies the same scoring as
+update_combined_leaderboard() (database/functions/01_update_combined_leaderboard_function.sql)
+
+Per machine, players are ranked by their best score with RANK() semantics
+(ties share a rank, the next rank skips): rank 1 = 100 points, rank 2 = 90,
+rank N >= 3 = max(0, 88 - N). A player's combined score is the sum over
+machines, and the overall rank is RANK() over combined scores of every player
+with more than 0 points.
+
+Memory layout: player ids are interned to ints. Each machine keeps its best
+scores in an order-statistic treap stored in parallel ``array``s (key = negated
+score and player int, so in-order is best-first; plus priority, children and
+subtree size) and a player -> best dict; combined scores live in one ``array``
+indexed by player int. Overall ranks come from a Fenwick tree over combined
+score values, so ``rank_of()`` is O(log max_score).
+
+A new score costs O(log n) for its machine: it replaces the player's old entry
+in the treap and reads both ranks as counts of strictly better entries. Only
+the players it passed can lose a rank, and only those within POINTS_CUTOFF
+lose points; they are visited in order from the new entry and each costs one
+O(log max_score) tree update. Scores landing past the cutoff stop after the
+rank lookup.
+
+``SyncedLeaderboard`` keeps an engine for the active event in step with
+High_Scores_Archive, one catch-up per leaderboard generation, for the API.
+"""
+
+import heapq
+import os
+import random
+import threading
+from array import array
+from collections import namedtuple
+
+# Ranks beyond this earn 0 points (88 - 88 = 0)
+POINTS_CUTOFF = 87
+
+# High_Scores_Archive rows the SQL function counts, best per player per machine
+BEST_SCORES_QUERY = """
+    SELECT machine_id, player_id, MAX(high_score) as best_score
+    FROM high_scores_archive
+    WHERE event_code = %(event_code)s
+      AND date_set >= %(start_date)s
+      AND date_set < %(end_date)s
+    GROUP BY machine_id, player_id
+"""
+
+# Catch-up: archive rows added since the last sync
+NEW_SCORES_QUERY = """
+    SELECT score_id, player_id, machine_id, high_score, date_set
+    FROM high_scores_archive
+    WHERE event_code = %(event_code)s
+      AND score_id > %(high_water)s
+    ORDER BY score_id
+"""
+
+# What the engine must have seen after a catch-up; anything else means rows
+# were deleted or committed below the high-water mark, so it reloads
+ARCHIVE_EXTENT_QUERY = """
+    SELECT count(*) as rows, COALESCE(max(score_id), 0) as high_water
+    FROM high_scores_archive
+    WHERE event_code = %(event_code)s
+"""
+
+DISPLAY_NAMES_QUERY = """
+    SELECT player_id, display_name
+    FROM players
+    WHERE player_id = ANY(%s)
+"""
+
+
+def rank_points(rank):
+    """Points for a machine rank (same CASE as the SQL function)"""
+    if rank == 1:
+        return 100
+    if rank == 2:
+        return 90
+    return max(0, 88 - rank)
+
+
+class _Fenwick:
+    """Counts of players per combined score value (1..size)"""
+
+    __slots__ = ('size', 'tree', 'total')
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = array('l', [0]) * (size + 1)
+        self.total = 0
+
+    def add(self, value, delta):
+        self.total += delta
+        i = value
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def count_upto(self, value):
+        value = min(value, self.size)
+        n = 0
+        while value > 0:
+            n += self.tree[value]
+            value -= value & -value
+        return n
+
+    def count_above(self, value):
+        return self.total - self.count_upto(value)
+
+
+class _MachineBoard:
+    """One machine's best scores as an order-statistic treap, best first"""
+
+    __slots__ = ('neg', 'player', 'prio', 'left', 'right', 'size', 'root', 'free', 'best')
+
+    def __init__(self):
+        # Node 0 is the empty tree (size 0)
+        self.neg = array('q', [0])      # -best_score
+        self.player = array('l', [0])   # player int (breaks ties, keeps keys unique)
+        self.prio = array('d', [0.0])
+        self.left = array('l', [0])
+        self.right = array('l', [0])
+        self.size = array('l', [0])
+        self.root = 0
+        self.free = []
+        self.best = {}                  # player int -> best score
+
+    def __len__(self):
+        return self.size[self.root]
+
+    def _node(self, neg, player, prio):
+        if self.free:
+            t = self.free.pop()
+            self.neg[t], self.player[t], self.prio[t] = neg, player, prio
+            self.left[t] = self.right[t] = 0
+            self.size[t] = 1
+            return t
+        self.neg.append(neg)
+        self.player.append(player)
+        self.prio.append(prio)
+        self.left.append(0)
+        self.right.append(0)
+        self.size.append(1)
+        return len(self.neg) - 1
+
+    def _resize(self, t):
+        self.size[t] = self.size[self.left[t]] + self.size[self.right[t]] + 1
+
+    def _split(self, t, neg, player):
+        """(keys < (neg, player), keys >= (neg, player))"""
+        if not t:
+            return 0, 0
+        if (self.neg[t], self.player[t]) < (neg, player):
+            low, high = self._split(self.right[t], neg, player)
+            self.right[t] = low
+            self._resize(t)
+            return t, high
+        low, high = self._split(self.left[t], neg, player)
+        self.left[t] = high
+        self._resize(t)
+        return low, t
+
+    def _merge(self, a, b):
+        if not a or not b:
+            return a or b
+        if self.prio[a] > self.prio[b]:
+            self.right[a] = self._merge(self.right[a], b)
+            self._resize(a)
+            return a
+        self.left[b] = self._merge(a, self.left[b])
+        self._resize(b)
+        return b
+
+    def load(self, bests):
+        """Replace the board with ``bests`` ({player int: best score})"""
+        entries = sorted((-score, player) for player, score in bests.items())
+        self.__init__()
+        self.best = dict(bests)
+        if not entries:
+            return
+        # Balanced from the sorted entries; priorities fall with depth so the
+        # heap order holds and later inserts find their level at random
+        levels = []
+
+        def build(lo, hi, level):
+            if lo >= hi:
+                return 0
+            mid = (lo + hi) // 2
+            t = self._node(entries[mid][0], entries[mid][1], 0.0)
+            levels.append((level, t))
+            self.left[t] = build(lo, mid, level + 1)
+            self.right[t] = build(mid + 1, hi, level + 1)
+            self._resize(t)
+            return t
+
+        self.root = build(0, len(entries), 0)
+        levels.sort()
+        priorities = sorted((random.random() for _ in levels), reverse=True)
+        for (_, t), prio in zip(levels, priorities):
+            self.prio[t] = prio
+
+    def count_better(self, score):
+        """Entries with a strictly higher best than ``score`` (RANK() - 1)"""
+        neg = -score
+        t = self.root
+        n = 0
+        while t:
+            if self.neg[t] < neg:
+                n += self.size[self.left[t]] + 1
+                t = self.right[t]
+            else:
+                t = self.left[t]
+        return n
+
+    def rank_of_score(self, score):
+        """RANK() of ``score``: 1 + number of players with a strictly higher best"""
+        return self.count_better(score) + 1
+
+    def entries_from(self, index):
+        """Yield (-score, player int) in rank order, starting at position ``index``"""
+        stack = []
+        t = self.root
+        while t:
+            before = self.size[self.left[t]]
+            if index < before:
+                stack.append(t)
+                t = self.left[t]
+            elif index == before:
+                stack.append(t)
+                break
+            else:
+                index -= before + 1
+                t = self.right[t]
+        while stack:
+            t = stack.pop()
+            yield self.neg[t], self.player[t]
+            child = self.right[t]
+            while child:
+                stack.append(child)
+                child = self.left[child]
+
+    def head_points(self):
+        """{player int: points} for every entry ranked within POINTS_CUTOFF"""
+        points = {}
+        rank = 0
+        previous = None
+        for i, (neg, player) in enumerate(self.entries_from(0)):
+            if neg != previous:
+                rank = i + 1
+                previous = neg
+                if rank > POINTS_CUTOFF:
+                    break
+            points[player] = rank_points(rank)
+        return points
+
+    def set_best(self, player, score):
+        """
+        Record a new best for ``player``. Returns {player int: points delta}
+        for every player whose points on this machine moved, or None if the
+        score is not higher than the player's best.
+        """
+        old = self.best.get(player)
+        if old is not None:
+            if score <= old:
+                return None
+            old_points = rank_points(self.rank_of_score(old))
+            low, rest = self._split(self.root, -old, player)
+            node, high = self._split(rest, -old, player + 1)
+            self.free.append(node)
+            self.root = self._merge(low, high)
+        else:
+            old_points = 0
+
+        low, high = self._split(self.root, -score, player)
+        self.root = self._merge(self._merge(low, self._node(-score, player, random.random())), high)
+        self.best[player] = score
+
+        new_rank = self.rank_of_score(score)
+        deltas = {}
+        if rank_points(new_rank) != old_points:
+            deltas[player] = rank_points(new_rank) - old_points
+        if new_rank > POINTS_CUTOFF:
+            # Everyone it passed was already past the cutoff
+            return deltas
+
+        # Players it passed: best in [old, score) (any lower best if new here).
+        # Each drops one rank; start right after the entries tied with ``score``
+        index = self._count_at_least(score)
+        rank = 0
+        previous = None
+        for i, (neg, passed) in enumerate(self.entries_from(index), start=index):
+            if old is not None and -neg < old:
+                break
+            if neg != previous:
+                rank = i + 1
+                previous = neg
+                if rank - 1 > POINTS_CUTOFF:
+                    break
+            delta = rank_points(rank) - rank_points(rank - 1)
+            if delta:
+                deltas[passed] = delta
+        return deltas
+
+    def _count_at_least(self, score):
+        """Entries with a best of ``score`` or higher"""
+        neg = -score
+        t = self.root
+        n = 0
+        while t:
+            if self.neg[t] <= neg:
+                n += self.size[self.left[t]] + 1
+                t = self.right[t]
+            else:
+                t = self.left[t]
+        return n
+
+
+class LeaderboardEngine:
+    """
+    Combined leaderboard for one event and date window, kept in memory.
+
+    Feed it with ``load()`` (bulk, from High_Scores_Archive) and then
+    ``add_score()`` for every new archive row; read it with ``leaderboard()``,
+    ``top()`` and ``rank_of()``. Not thread-safe: callers share it behind a lock.
+    """
+
+    def __init__(self, event_code=None, start_date=None, end_date=None):
+        self.event_code = event_code
+        self.start_date = start_date
+        self.end_date = end_date
+        self._player_ids = []          # player int -> player_id
+        self._player_index = {}        # player_id -> player int
+        self._machines = {}            # machine_id -> _MachineBoard
+        self._combined = array('l')    # player int -> combined score
+        self._ranked = _Fenwick(100)
+
+    # ---------------- loading ----------------
+
+    def _intern(self, player_id):
+        player = self._player_index.get(player_id)
+        if player is None:
+            player = len(self._player_ids)
+            self._player_index[player_id] = player
+            self._player_ids.append(player_id)
+            self._combined.append(0)
+        return player
+
+    def _rebuild_ranks(self):
+        # Combined scores can never exceed 100 per machine
+        self._ranked = _Fenwick(max(100, 100 * len(self._machines)))
+        for score in self._combined:
+            if score > 0:
+                self._ranked.add(score, 1)
+
+    def load_rows(self, rows):
+        """Replace the engine state with (machine_id, player_id, score) rows"""
+        self._player_ids = []
+        self._player_index = {}
+        self._machines = {}
+        self._combined = array('l')
+
+        bests = {}
+        for machine_id, player_id, score in rows:
+            if machine_id is None or player_id is None:
+                continue
+            player = self._intern(player_id)
+            machine = bests.setdefault(machine_id, {})
+            if score > machine.get(player, score - 1):
+                machine[player] = score
+
+        for machine_id, machine_bests in bests.items():
+            board = _MachineBoard()
+            board.load(machine_bests)
+            self._machines[machine_id] = board
+            for player, points in board.head_points().items():
+                self._combined[player] += points
+        self._rebuild_ranks()
+
+    def load(self, conn, event_code, start_date, end_date, itersize=50000):
+        """
+        Bulk-load the event's best scores from High_Scores_Archive.
+
+        Uses a server-side cursor so the rows are streamed rather than held
+        twice; expects a connection that is not in autocommit mode.
+        """
+        self.event_code = event_code
+        self.start_date = start_date
+        self.end_date = end_date
+        with conn.cursor(name='leaderboard_engine_load') as cur:
+            cur.itersize = itersize
+            cur.execute(BEST_SCORES_QUERY, {'event_code': event_code,
+                                            'start_date': start_date,
+                                            'end_date': end_date})
+            self.load_rows((row[0], row[1], row[2]) if not isinstance(row, dict)
+                           else (row['machine_id'], row['player_id'], row['best_score'])
+                           for row in cur)
+
+    # ---------------- updates ----------------
+
+    def _set_combined(self, player, score):
+        old = self._combined[player]
+        if old == score:
+            return
+        if old > 0:
+            self._ranked.add(old, -1)
+        if score > 0:
+            self._ranked.add(score, 1)
+        self._combined[player] = score
+
+    def add_score(self, player_id, machine_id, high_score, date_set=None, event_code=None):
+        """
+        Apply one archive row. Rows for another event or outside the date
+        window are ignored, as the SQL function would. Returns the set of
+        player_ids whose combined score changed.
+        """
+        if event_code is not None and self.event_code is not None and event_code != self.event_code:
+            return set()
+        if date_set is not None:
+            if self.start_date is not None and date_set < self.start_date:
+                return set()
+            if self.end_date is not None and date_set >= self.end_date:
+                return set()
+        if machine_id is None or player_id is None:
+            return set()
+
+        player = self._intern(player_id)
+        board = self._machines.get(machine_id)
+        if board is None:
+            board = self._machines[machine_id] = _MachineBoard()
+            if 100 * len(self._machines) > self._ranked.size:
+                self._rebuild_ranks()
+
+        deltas = board.set_best(player, high_score)
+        if not deltas:
+            return set()
+        for p, delta in deltas.items():
+            self._set_combined(p, self._combined[p] + delta)
+        return {self._player_ids[p] for p in deltas}
+
+    def add_scores(self, rows):
+        """Apply many (player_id, machine_id, high_score[, date_set[, event_code]]) rows"""
+        changed = set()
+        for row in rows:
+            changed |= self.add_score(*row)
+        return changed
+
+    # ---------------- reads ----------------
+
+    def combined_score(self, player_id):
+        player = self._player_index.get(player_id)
+        return self._combined[player] if player is not None else 0
+
+    def rank_of(self, player_id):
+        """Overall RANK() of ``player_id``, or None if they have no points"""
+        score = self.combined_score(player_id)
+        if score <= 0:
+            return None
+        return self._ranked.count_above(score) + 1
+
+    def player_count(self):
+        """Players with more than 0 points (rows in Leaderboard_Cache)"""
+        return self._ranked.total
+
+    def leaderboard(self):
+        """
+        [(player_id, combined_score, rank)] for every player with points,
+        best first (ties by player_id) - the contents of Leaderboard_Cache.
+        """
+        entries = sorted((-score, self._player_ids[player])
+                         for player, score in enumerate(self._combined) if score > 0)
+        return self._ranked_entries(entries)
+
+    def top(self, n=10):
+        """First ``n`` rows of ``leaderboard()``"""
+        entries = heapq.nsmallest(n, ((-score, self._player_ids[player])
+                                      for player, score in enumerate(self._combined) if score > 0))
+        return self._ranked_entries(entries)
+
+    @staticmethod
+    def _ranked_entries(entries):
+        result = []
+        rank = 0
+        for i, (neg_score, player_id) in enumerate(entries):
+            if i == 0 or neg_score != entries[i - 1][0]:
+                rank = i + 1
+            result.append((player_id, -neg_score, rank))
+        return result
+
+    def machine_points(self, machine_id):
+        """{player_id: (best_score, machine_rank, rank_points)} for points-earning players"""
+        board = self._machines.get(machine_id)
+        if board is None:
+            return {}
+        return {self._player_ids[p]: (board.best[p], board.rank_of_score(board.best[p]), points)
+                for p, points in board.head_points().items()}
+
+    def stats(self):
+        return {
+            "event_code": self.event_code,
+            "players": len(self._player_ids),
+            "ranked_players": self._ranked.total,
+            "machines": len(self._machines),
+            "entries": sum(len(board) for board in self._machines.values()),
+        }
+
+
+# One published state of the leaderboard: rows are (player_id, combined_score,
+# rank), best first; names maps player_id -> display_name
+LeaderboardSnapshot = namedtuple('LeaderboardSnapshot', 'generation event_code rows names')
+
+
+class SyncedLeaderboard:
+    """
+    The active event's LeaderboardEngine, kept in step with High_Scores_Archive.
+
+    ``snapshot()`` catches up at most once per leaderboard generation, in one
+    read-only snapshot: archive rows above the last score_id seen go through
+    ``add_score()``. A new event or date window, or an archive whose row
+    count or highest score_id no longer matches what was applied, reloads the
+    engine from scratch. Rankings are then served from memory; only the
+    display names are read along with the catch-up.
+
+    Settings (environment variables):
+        LEADERBOARD_ENGINE_ENABLED  set to "false" to rank in SQL instead (default true)
+    """
+
+    def __init__(self, pool, tracker, resolver, enabled=None):
+        self.pool = pool
+        self.tracker = tracker
+        self.resolver = resolver
+        if enabled is None:
+            enabled = os.getenv('LEADERBOARD_ENGINE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._engine = None
+        self._rows_seen = 0
+        self._high_water = 0
+        self._snapshot = None
+        self.catch_ups = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def snapshot(self):
+        """Current LeaderboardSnapshot, or None if the caller should fall back to SQL"""
+        if not self.enabled:
+            return None
+        generation = self.tracker.current()
+        if generation is None:
+            return None
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation >= generation:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.generation >= generation:
+                return snapshot
+            try:
+                snapshot = self._sync()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Could not sync the leaderboard engine: {type(e).__name__}: {e}")
+                # Rebuild from scratch next time rather than trust a half-applied catch-up
+                self._engine = None
+                return None
+            self._snapshot = snapshot
+            return snapshot
+
+    def _sync(self):
+        event = self.resolver.get()
+        with self.pool.connection() as conn:
+            # Generation, archive and names from one snapshot; putconn() restores autocommit
+            conn.autocommit = False
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                cur.execute("SELECT generation FROM leaderboard_generation WHERE singleton")
+                row = cur.fetchone()
+                generation = row['generation'] if row else 0
+                if event is None:
+                    self._engine = None
+                    return LeaderboardSnapshot(generation, None, [], {})
+
+                params = {'event_code': event['event_code']}
+                engine = self._engine
+                if (engine is not None
+                        and (engine.event_code, engine.start_date, engine.end_date)
+                        == (event['event_code'], event['start_date'], event['stop_date'])):
+                    cur.execute(NEW_SCORES_QUERY, {**params, 'high_water': self._high_water})
+                    new_rows = cur.fetchall()
+                    for r in new_rows:
+                        engine.add_score(r['player_id'], r['machine_id'], r['high_score'], r['date_set'])
+                    self._rows_seen += len(new_rows)
+                    if new_rows:
+                        self._high_water = new_rows[-1]['score_id']
+                    self.catch_ups += 1
+                cur.execute(ARCHIVE_EXTENT_QUERY, params)
+                extent = cur.fetchone()
+                if engine is None or (extent['rows'], extent['high_water']) != (self._rows_seen, self._high_water):
+                    engine = LeaderboardEngine()
+                    engine.load(conn, event['event_code'], event['start_date'], event['stop_date'])
+                    self._engine = engine
+                    self._rows_seen, self._high_water = extent['rows'], extent['high_water']
+                    self.reloads += 1
+
+                rows = engine.leaderboard()
+                cur.execute(DISPLAY_NAMES_QUERY, ([player_id for player_id, _, _ in rows],))
+                names = {r['player_id']: r['display_name'] for r in cur.fetchall()}
+        return LeaderboardSnapshot(generation, event['event_code'], rows, names)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "generation": snapshot.generation if snapshot else None,
+            "ranked_players": len(snapshot.rows) if snapshot else 0,
+            "catch_ups": self.catch_ups,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "engine": self._engine.stats() if self._engine is not None else None,
+        }
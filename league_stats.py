@@ -0,0 +1,133 @@
+"""
+League Statistics Engine
+Computes every /api/statistics figure in one pass over the active event's scores
+"""
+
+EMPTY_STATISTICS = {
+    "total_games_this_week": 0,
+    "total_games_this_month": 0,
+    "active_players": 0,
+    "average_score": 0,
+    "most_popular_game": "N/A",
+    "busiest_day": "N/A"
+}
+
+# High_Scores_Archive is scanned once: a single hashed GROUPING SETS
+# aggregate builds per-machine groups (carrying window counts, score sums and
+# per-weekday plays) and per-player groups in the same pass. Event totals are
+# summed from the machine groups rather than adding a () grouping set, which
+# costs a third more aggregate work per row.
+# GROUPING() bits: machine_id=2, player_id=1 (set = rolled up).
+LEAGUE_STATISTICS_QUERY = """
+    WITH grouped AS (
+        SELECT
+            GROUPING(machine_id, player_id) as grouping_id,
+            machine_id,
+            player_id,
+            COUNT(*) as plays,
+            COUNT(*) FILTER (WHERE date_set >= NOW() - INTERVAL '7 days') as games_week,
+            COUNT(*) FILTER (WHERE date_set >= NOW() - INTERVAL '30 days') as games_month,
+            SUM(high_score) as score_total,
+            ARRAY[
+                COUNT(*) FILTER (WHERE dow = 0), COUNT(*) FILTER (WHERE dow = 1),
+                COUNT(*) FILTER (WHERE dow = 2), COUNT(*) FILTER (WHERE dow = 3),
+                COUNT(*) FILTER (WHERE dow = 4), COUNT(*) FILTER (WHERE dow = 5),
+                COUNT(*) FILTER (WHERE dow = 6)
+            ] as plays_by_dow
+        FROM (
+            SELECT machine_id, player_id, high_score, date_set,
+                   date_part('dow', date_set) as dow
+            FROM high_scores_archive
+            WHERE event_code = %(event_code)s
+        ) event_scores
+        GROUP BY GROUPING SETS ((machine_id), (player_id))
+    ),
+    machine_groups AS (
+        SELECT * FROM grouped WHERE grouping_id = 1
+    ),
+    totals AS (
+        SELECT
+            SUM(games_week)::bigint as games_week,
+            SUM(games_month)::bigint as games_month,
+            (SUM(score_total) / NULLIF(SUM(plays), 0))::bigint as avg_score
+        FROM machine_groups
+    ),
+    day_totals AS (
+        -- plays_by_dow[1] is Sunday (dow 0)
+        SELECT d.ord - 1 as dow, SUM(d.plays) as plays
+        FROM machine_groups mg,
+             unnest(mg.plays_by_dow) WITH ORDINALITY as d(plays, ord)
+        GROUP BY d.ord
+    )
+    SELECT
+        t.games_week,
+        t.games_month,
+        (
+            SELECT COUNT(*) FROM grouped
+            WHERE grouping_id = 2 AND player_id IS NOT NULL
+        ) as active_players,
+        t.avg_score,
+        (
+            SELECT m.machine_name
+            FROM machine_groups mg
+            JOIN machines m ON mg.machine_id = m.machine_id
+            GROUP BY m.machine_name
+            ORDER BY SUM(mg.plays) DESC, m.machine_name
+            LIMIT 1
+        ) as most_popular_game,
+        (
+            -- 2023-01-01 was a Sunday
+            SELECT TO_CHAR(DATE '2023-01-01' + dt.dow::int, 'Day')
+            FROM day_totals dt
+            WHERE dt.plays > 0
+            ORDER BY dt.plays DESC, dt.dow
+            LIMIT 1
+        ) as busiest_day
+    FROM totals t;
+"""
+
+# Statistics read the whole event: partition pruning leaves a sequential scan
+# of the event's partition feeding the hashed grouping sets. work_mem keeps
+# the per-player groups of a large league from spilling to disk.
+STATISTICS_SESSION_SETTINGS = (
+    "SET LOCAL work_mem = '32MB'",
+)
+
+ACTIVE_EVENT_QUERY = "SELECT event_code FROM events WHERE is_active = true LIMIT 1"
+
+
+def compute_statistics(conn, event_code=None):
+    """
+    Return the league statistics dict for ``event_code`` (or the active event).
+
+    The event lookup and the aggregate run inside one read-only
+    REPEATABLE READ transaction, so every figure comes from the same snapshot.
+    Expects an autocommit connection whose cursors return dict rows.
+    """
+    with conn.cursor() as cur:
+        cur.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        try:
+            for setting in STATISTICS_SESSION_SETTINGS:
+                cur.execute(setting)
+            if event_code is None:
+                cur.execute(ACTIVE_EVENT_QUERY)
+                event = cur.fetchone()
+                event_code = event['event_code'] if event else None
+            if not event_code:
+                return dict(EMPTY_STATISTICS)
+
+            cur.execute(LEAGUE_STATISTICS_QUERY, {'event_code': event_code})
+            row = cur.fetchone()
+        finally:
+            cur.execute("COMMIT")
+
+    if not row:
+        return dict(EMPTY_STATISTICS)
+    return {
+        "total_games_this_week": row['games_week'] or 0,
+        "total_games_this_month": row['games_month'] or 0,
+        "active_players": row['active_players'] or 0,
+        "average_score": row['avg_score'] or 0,
+        "most_popular_game": row['most_popular_game'] or "N/A",
+        "busiest_day": row['busiest_day'].strip() if row['busiest_day'] else "N/A"
+    }
@@ -0,0 +1,276 @@
+"""
+Prometheus Metrics
+Counters and histograms for the API server, rendered in the Prometheus text
+exposition format (version 0.0.4) without a client library
+
+With several gunicorn workers a scrape reaches one worker, so each worker
+also writes its series to a file in a shared directory and /metrics sums
+the files of every worker (like prometheus_client's multiprocess mode).
+Series carry no pid label. gunicorn.conf.py points METRICS_DIR at the
+directory, empties it when the master starts and marks a worker's file dead
+when the worker exits: the counts of a dead worker stay in the totals, its
+gauges are dropped. Without METRICS_DIR (flask run, a single process) only
+the local series are rendered.
+
+Settings (environment variables):
+    METRICS_DIR             shared directory for per-worker files (unset: single process)
+    METRICS_FLUSH_INTERVAL  seconds between a worker's file writes (default 5);
+                            other workers' numbers in a scrape are at most this old
+"""
+
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+# Histogram bucket upper bounds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        documentation = self.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+        return [f"# HELP {self.name} {documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def series(self):
+        """[(((label, value), ...), value)] for this process"""
+        with self._lock:
+            return [(tuple(zip(self.labelnames, key)), value) for key, value in self._series.items()]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def samples(self, series):
+        for labels, value in series:
+            yield self.name, labels, value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def series(self):
+        with self._lock:
+            return [(tuple(zip(self.labelnames, key)), [list(counts), total])
+                    for key, (counts, total) in self._series.items()]
+
+    @staticmethod
+    def merge(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+
+    def samples(self, series):
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (('le', _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Gauge(_Metric):
+    """Read when rendered: ``collect()`` returns [(labels dict, value), ...]"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, collect, kind='gauge'):
+        super().__init__(name, documentation)
+        self.collect = collect
+        self.kind = kind
+
+    def series(self):
+        return [(tuple(sorted(labels.items())), value) for labels, value in self.collect()]
+
+    @staticmethod
+    def merge(a, b):
+        # Summed over live workers (pool connections, cache hits)
+        return a + b
+
+    def samples(self, series):
+        for labels, value in series:
+            yield self.name, labels, value
+
+
+class Registry:
+    def __init__(self, directory=None, flush_interval=None):
+        self.directory = directory if directory is not None else os.getenv('METRICS_DIR') or None
+        self.flush_interval = (float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+                               if flush_interval is None else flush_interval)
+        self._metrics = []
+        self._lock = threading.Lock()
+        self._pid = None
+        self._path = None
+        self._thread = None
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, collect, kind='gauge'):
+        """``kind='counter'`` exposes a count kept elsewhere (e.g. cache hits)"""
+        return self._register(Gauge(name, documentation, collect, kind))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # ---------- per-worker files ----------
+
+    def ensure_started(self):
+        """Start this process's flush thread (no-op without a directory)"""
+        if self.directory is None:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # New file per process: a recycled pid never overwrites a dead worker's counts
+                self._pid = os.getpid()
+                self._path = os.path.join(self.directory, f"worker_{self._pid}_{uuid.uuid4().hex[:8]}.json")
+                # A worker that exits cleanly leaves its final counts behind
+                atexit.register(self.flush)
+            self._thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️ Could not write metrics to {self.directory}: {e}")
+
+    def snapshot(self):
+        """This process's series: {name: {"kind": ..., "series": [[labels, value], ...]}}"""
+        return {metric.name: {'kind': metric.kind,
+                              'series': [[list(map(list, labels)), value] for labels, value in metric.series()]}
+                for metric in self._metrics}
+
+    def flush(self):
+        """Write this process's series to its file (atomically)"""
+        if self._path is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self._path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(tmp, self._path)
+
+    def _collect(self):
+        """{name: {labels: value}} summed over every worker file (or just this process)"""
+        if self.directory is None or self._path is None:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path, 'r') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    # Replaced or removed between glob() and open()
+                    continue
+
+        merged = {}
+        for metric in self._metrics:
+            totals = merged[metric.name] = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(metric.name, {}).get('series', ()):
+                    labels = tuple(map(tuple, labels))
+                    totals[labels] = metric.merge(totals[labels], value) if labels in totals else value
+        return merged
+
+    def render(self):
+        """Every metric in the text exposition format"""
+        merged = self._collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            for name, labels, value in metric.samples(sorted(merged[metric.name].items())):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def clear_directory(directory):
+    """Remove every worker file; call once before the workers start"""
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def mark_process_dead(pid, directory):
+    """Keep an exited worker's counts in the totals but drop its gauges"""
+    for path in glob.glob(os.path.join(directory, f"worker_{pid}_*.json")):
+        try:
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Gauges report live state; counters and histograms are cumulative
+        kept = {name: data for name, data in snapshot.items() if data['kind'] != 'gauge'}
+        dead_path = os.path.join(directory, 'dead_' + os.path.basename(path)[len('worker_'):])
+        with open(dead_path, 'w') as f:
+            json.dump(kept, f, separators=(',', ':'))
+        os.remove(path)
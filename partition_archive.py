@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+High_Scores_Archive Partitioning
+Convert the archive to one partition per event without taking it offline,
+and keep the partitions in shape afterwards.
+
+Usage (cron or n8n "Execute Command" for maintain):
+    python partition_archive.py status                         # partition per event
+    python partition_archive.py migrate                        # plain table -> partitioned
+    python partition_archive.py maintain --cold-after-days 90  # create missing, detach cold
+    python partition_archive.py attach EVENT_CODE              # bring a cold event back
+
+migrate copies the archive into a partitioned twin in batches while a change
+log trigger records every score written meanwhile. Logged changes are
+replayed until the backlog is small. The final replay and the rename swap
+run under one short ACCESS EXCLUSIVE lock; materialized views on the archive
+are recreated empty inside it and refreshed after it. The old table is kept as
+High_Scores_Archive_Unpartitioned until --drop-old (or a manual DROP).
+
+Connection settings come from the usual DB_* environment variables (.env).
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import psycopg2
+import psycopg2.errors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'pinball'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'your_password_here')
+}
+
+PARTITIONS_SQL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   'database/init/13_score_partitions.sql')
+
+ARCHIVE = 'high_scores_archive'
+PARTITIONED = 'high_scores_archive_partitioned'
+UNPARTITIONED = 'high_scores_archive_unpartitioned'
+
+# Suffix for the twin's indexes until the swap frees the original names
+TWIN_SUFFIX = '_part'
+OLD_SUFFIX = '_unpartitioned'
+
+# Score ids written to the archive while it is being copied. Statement-level
+# triggers, like the other archive triggers, so an ingest batch costs one
+# extra INSERT ... SELECT
+CHANGE_LOG_SQL = """
+    CREATE TABLE IF NOT EXISTS Score_Migration_Log (
+        score_id INTEGER NOT NULL
+    );
+
+    CREATE OR REPLACE FUNCTION log_score_migration_change()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            INSERT INTO Score_Migration_Log (score_id) SELECT score_id FROM old_scores;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO Score_Migration_Log (score_id) SELECT score_id FROM new_scores;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS high_scores_migration_insert ON High_Scores_Archive;
+    CREATE TRIGGER high_scores_migration_insert
+        AFTER INSERT ON High_Scores_Archive
+        REFERENCING NEW TABLE AS new_scores
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION log_score_migration_change();
+
+    DROP TRIGGER IF EXISTS high_scores_migration_update ON High_Scores_Archive;
+    CREATE TRIGGER high_scores_migration_update
+        AFTER UPDATE ON High_Scores_Archive
+        REFERENCING OLD TABLE AS old_scores NEW TABLE AS new_scores
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION log_score_migration_change();
+
+    DROP TRIGGER IF EXISTS high_scores_migration_delete ON High_Scores_Archive;
+    CREATE TRIGGER high_scores_migration_delete
+        AFTER DELETE ON High_Scores_Archive
+        REFERENCING OLD TABLE AS old_scores
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION log_score_migration_change();
+"""
+
+MIGRATION_TRIGGERS = ('high_scores_migration_insert', 'high_scores_migration_update',
+                      'high_scores_migration_delete')
+
+DROP_CHANGE_LOG_SQL = """
+    DROP TABLE IF EXISTS Score_Migration_Log;
+    DROP FUNCTION IF EXISTS log_score_migration_change();
+"""
+
+COPY_BATCH_SQL = """
+    INSERT INTO High_Scores_Archive_Partitioned
+    SELECT * FROM High_Scores_Archive
+    WHERE score_id > %s AND score_id <= %s
+    ON CONFLICT DO NOTHING
+"""
+
+COLD_EVENTS_SQL = """
+    SELECT event_code, partition_name, attached, partition_exists, estimated_rows,
+           NOT is_active AND stop_date < NOW() - make_interval(days => %s) as is_cold
+    FROM score_partitions
+    ORDER BY stop_date, event_code
+"""
+
+
+def log(message):
+    print(message, flush=True)
+
+
+def fetch_all(cur, sql, params=None):
+    cur.execute(sql, params)
+    return cur.fetchall()
+
+
+def fetch_value(cur, sql, params=None):
+    cur.execute(sql, params)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def with_lock_retry(conn, fn, lock_timeout='2s', attempts=30, pause=1.0):
+    """
+    Run ``fn(cur)`` in its own transaction with a short lock_timeout, retrying
+    when the lock is busy, so DDL never queues the kiosk's reads behind it.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+                result = fn(cur)
+            conn.commit()
+            return result
+        except psycopg2.errors.LockNotAvailable:
+            conn.rollback()
+            if attempt == attempts:
+                raise
+            log(f"⏳ Lock busy, retrying ({attempt}/{attempts})...")
+            time.sleep(pause)
+
+
+def archive_is_partitioned(cur):
+    return fetch_value(cur, """
+        SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)
+    """, (ARCHIVE,))
+
+
+def install_partition_functions(conn):
+    """(Re)load 13_score_partitions.sql: score_partition_name() and friends"""
+    with open(PARTITIONS_SQL_FILE, 'r') as f:
+        sql = f.read()
+    with conn.cursor() as cur:
+        cur.execute(sql)
+    conn.commit()
+
+
+# ==================== MIGRATE ====================
+
+def archive_indexes(cur, table):
+    """[(index name, CREATE INDEX statement)] for indexes not backing a constraint"""
+    return fetch_all(cur, """
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+          )
+        ORDER BY c.relname
+    """, (table,))
+
+
+def all_index_names(cur, table):
+    return [row[0] for row in fetch_all(cur, """
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s)
+        ORDER BY c.relname
+    """, (table,))]
+
+
+def create_partitioned_twin(conn):
+    """Empty High_Scores_Archive_Partitioned with every constraint and index of the archive"""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE {PARTITIONED} (LIKE {ARCHIVE} INCLUDING DEFAULTS)
+                PARTITION BY LIST (event_code)
+        """)
+        cur.execute(f"ALTER TABLE {PARTITIONED} ALTER COLUMN event_code SET NOT NULL")
+        cur.execute(f"""
+            ALTER TABLE {PARTITIONED}
+                ADD CONSTRAINT {ARCHIVE}_pkey{TWIN_SUFFIX} PRIMARY KEY (score_id, event_code)
+        """)
+        cur.execute(f"CREATE TABLE {ARCHIVE}_default PARTITION OF {PARTITIONED} DEFAULT")
+        for (event_code,) in fetch_all(cur, "SELECT event_code FROM Events ORDER BY event_code"):
+            cur.execute(f"""
+                SELECT format('CREATE TABLE %%I PARTITION OF {PARTITIONED} FOR VALUES IN (%%L)',
+                              score_partition_name(%s), %s)
+            """, (event_code, event_code))
+            cur.execute(cur.fetchone()[0])
+
+        # Constraints go on while the twin is empty, so the copy maintains
+        # them instead of a long validating scan at the end
+        for name, contype, definition in fetch_all(cur, """
+            SELECT conname, contype, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype IN ('u', 'f', 'c')
+            ORDER BY contype DESC, conname
+        """, (ARCHIVE,)):
+            # Unique constraints own an index, whose name is taken until the swap
+            twin_name = name + TWIN_SUFFIX if contype == 'u' else name
+            cur.execute(f'ALTER TABLE {PARTITIONED} ADD CONSTRAINT "{twin_name}" {definition}')
+
+        for name, definition in archive_indexes(cur, ARCHIVE):
+            statement = re.sub(r'^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ',
+                               lambda m: f'CREATE {m.group(1) or ""}INDEX "{name}{TWIN_SUFFIX}" '
+                                         f'ON {PARTITIONED} ',
+                               definition)
+            cur.execute(statement)
+    conn.commit()
+
+
+def copy_batches(conn, batch_size):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COALESCE(MIN(score_id) - 1, 0), COALESCE(MAX(score_id), 0) FROM {ARCHIVE}")
+        low, high = cur.fetchone()
+    conn.commit()
+
+    copied = 0
+    started = time.perf_counter()
+    for start in range(low, high, batch_size):
+        with conn.cursor() as cur:
+            cur.execute(COPY_BATCH_SQL, (start, min(start + batch_size, high)))
+            copied += cur.rowcount
+        conn.commit()
+        done = min(start + batch_size, high) - low
+        log(f"📦 Copied {copied:,} rows (score_id {done:,}/{high - low:,}, "
+            f"{time.perf_counter() - started:.0f}s)")
+    return copied
+
+
+def replay_changes(cur):
+    """Re-copy the score ids logged since the last replay; returns how many"""
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS replay_ids (score_id INTEGER) ON COMMIT DELETE ROWS")
+    cur.execute("""
+        WITH claimed AS (
+            DELETE FROM Score_Migration_Log RETURNING score_id
+        )
+        INSERT INTO replay_ids SELECT DISTINCT score_id FROM claimed
+    """)
+    replayed = cur.rowcount
+    if replayed:
+        cur.execute(f"DELETE FROM {PARTITIONED} p USING replay_ids r WHERE p.score_id = r.score_id")
+        cur.execute(f"""
+            INSERT INTO {PARTITIONED}
+            SELECT a.* FROM {ARCHIVE} a JOIN replay_ids r ON r.score_id = a.score_id
+        """)
+    return replayed
+
+
+def swap_tables(conn):
+    """Final replay plus the rename swap, under one ACCESS EXCLUSIVE lock"""
+
+    def swap(cur):
+        cur.execute(f"LOCK TABLE {ARCHIVE} IN ACCESS EXCLUSIVE MODE")
+        replayed = replay_changes(cur)
+
+        sequence = fetch_value(cur, "SELECT pg_get_serial_sequence(%s, 'score_id')", (ARCHIVE,))
+        # Deparsed while the name still points at the old table; re-run after
+        # the rename they bind to the partitioned one
+        triggers = fetch_all(cur, """
+            SELECT tgname, pg_get_triggerdef(oid)
+            FROM pg_trigger
+            WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal
+            ORDER BY tgname
+        """, (ARCHIVE,))
+        views = fetch_all(cur, """
+            SELECT DISTINCT v.oid::regclass::text, pg_get_viewdef(v.oid), v.relkind
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            WHERE d.classid = 'pg_rewrite'::regclass
+              AND d.refobjid = to_regclass(%s)
+              AND v.oid <> d.refobjid
+        """, (ARCHIVE,))
+        # Materialized views can't be re-pointed in place: keep their indexes
+        # (the unique ones REFRESH ... CONCURRENTLY needs) to rebuild them
+        matview_indexes = {view: [row[0] for row in fetch_all(cur, """
+            SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = to_regclass(%s)
+        """, (view,))] for view, _, relkind in views if relkind == 'm'}
+
+        for name, _ in triggers:
+            cur.execute(f'DROP TRIGGER "{name}" ON {ARCHIVE}')
+        old_indexes = all_index_names(cur, ARCHIVE)
+        cur.execute(f"ALTER TABLE {ARCHIVE} RENAME TO {UNPARTITIONED}")
+        for name in old_indexes:
+            cur.execute(f'ALTER INDEX "{name}" RENAME TO "{name}{OLD_SUFFIX}"')
+
+        cur.execute(f"ALTER TABLE {PARTITIONED} RENAME TO {ARCHIVE}")
+        for name in all_index_names(cur, ARCHIVE):
+            if name.endswith(TWIN_SUFFIX):
+                cur.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:-len(TWIN_SUFFIX)]}"')
+        if sequence:
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {ARCHIVE}.score_id")
+
+        for name, definition in triggers:
+            if name not in MIGRATION_TRIGGERS:
+                cur.execute(definition)
+        for view, definition, relkind in views:
+            if relkind == 'm':
+                # Empty for now: populating them here would re-run the archive
+                # aggregates with the lock held. refresh_matviews() fills them
+                # once the swap has committed
+                cur.execute(f"DROP MATERIALIZED VIEW {view}")
+                cur.execute(f"CREATE MATERIALIZED VIEW {view} AS {definition.rstrip().rstrip(';')} "
+                            f"WITH NO DATA")
+                for index in matview_indexes[view]:
+                    cur.execute(index)
+                continue
+            cur.execute(f"CREATE OR REPLACE VIEW {view} AS {definition}")
+        return replayed, len(triggers), len(views), sorted(matview_indexes)
+
+    return with_lock_retry(conn, swap)
+
+
+def refresh_matviews(conn, views):
+    """
+    Populate the materialized views the swap recreated WITH NO DATA. Plain
+    REFRESH, since CONCURRENTLY needs a populated view; it locks only the view
+    itself, so archive writes carry on meanwhile.
+    """
+    for view in views:
+        started = time.monotonic()
+        with conn.cursor() as cur:
+            cur.execute(f"REFRESH MATERIALIZED VIEW {view}")
+        conn.commit()
+        log(f"🔄 Refreshed {view} ({time.monotonic() - started:.1f}s)")
+
+
+def migrate(conn, args):
+    with conn.cursor() as cur:
+        if archive_is_partitioned(cur):
+            log("✅ High_Scores_Archive is already partitioned")
+            return 0
+        missing_event = fetch_value(cur, f"SELECT COUNT(*) FROM {ARCHIVE} WHERE event_code IS NULL")
+        referenced_by = fetch_all(cur, """
+            SELECT conrelid::regclass::text FROM pg_constraint
+            WHERE confrelid = to_regclass(%s) AND contype = 'f'
+        """, (ARCHIVE,))
+    conn.commit()
+
+    if missing_event:
+        log(f"❌ {missing_event} scores have no event_code; partitions are per event. "
+            "Assign or delete them first.")
+        return 1
+    if referenced_by:
+        log("❌ Foreign keys reference High_Scores_Archive.score_id from: "
+            + ", ".join(row[0] for row in referenced_by)
+            + ". score_id is no longer unique on its own once partitioned.")
+        return 1
+
+    install_partition_functions(conn)
+
+    with conn.cursor() as cur:
+        leftover = fetch_value(cur, "SELECT to_regclass(%s) IS NOT NULL", (PARTITIONED,))
+    conn.commit()
+    if leftover:
+        log("🧹 Dropping the partitioned copy left by an interrupted run")
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE {PARTITIONED}")
+        conn.commit()
+
+    log("📝 Logging archive changes while the copy runs...")
+    with_lock_retry(conn, lambda cur: cur.execute(CHANGE_LOG_SQL))
+
+    log("🏗️  Creating the partitioned copy...")
+    create_partitioned_twin(conn)
+
+    copied = copy_batches(conn, args.batch_size)
+    log(f"📦 Bulk copy finished: {copied:,} rows")
+
+    # Catch up without any lock until a replay is small enough to finish
+    # inside the swap
+    for _ in range(args.max_replays):
+        with conn.cursor() as cur:
+            replayed = replay_changes(cur)
+        conn.commit()
+        log(f"🔁 Replayed {replayed:,} changed scores")
+        if replayed <= args.swap_threshold:
+            break
+
+    log("🔀 Swapping tables...")
+    replayed, triggers, views, matviews = swap_tables(conn)
+    log(f"✅ High_Scores_Archive is partitioned ({replayed} changes replayed under lock, "
+        f"{triggers} triggers and {views} views moved over)")
+    refresh_matviews(conn, matviews)
+
+    with conn.cursor() as cur:
+        cur.execute(DROP_CHANGE_LOG_SQL)
+        # Events created during the copy landed in the default partition
+        cur.execute("SELECT create_score_partition(event_code) FROM Events ORDER BY event_code")
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE {ARCHIVE}")
+        if args.drop_old:
+            cur.execute(f"DROP TABLE {UNPARTITIONED}")
+            log(f"🗑️  Dropped {UNPARTITIONED}")
+        else:
+            log(f"ℹ️  The old table is kept as {UNPARTITIONED}; "
+                f"DROP TABLE {UNPARTITIONED}; once you are satisfied")
+    return 0
+
+
+# ==================== MAINTAIN ====================
+
+def maintain(conn, args):
+    with conn.cursor() as cur:
+        if not archive_is_partitioned(cur):
+            log("❌ High_Scores_Archive is not partitioned yet; run: python partition_archive.py migrate")
+            return 1
+        events = fetch_all(cur, COLD_EVENTS_SQL, (args.cold_after_days,))
+    conn.commit()
+
+    created = detached = 0
+    for event_code, partition, attached, exists, rows, is_cold in events:
+        if is_cold and attached:
+            log(f"🧊 Detach {event_code} ({partition}, ~{rows:,} rows)")
+            if not args.dry_run:
+                with_lock_retry(conn, lambda cur: cur.execute(
+                    "SELECT detach_score_partition(%s)", (event_code,)))
+            detached += 1
+        elif not is_cold and not attached:
+            log(f"➕ {'Re-attach' if exists else 'Create'} partition for {event_code} ({partition})")
+            if not args.dry_run:
+                with_lock_retry(conn, lambda cur: cur.execute(
+                    "SELECT create_score_partition(%s)", (event_code,)))
+            created += 1
+
+    with conn.cursor() as cur:
+        stray = fetch_value(cur, f"SELECT COUNT(*) FROM {ARCHIVE}_default")
+    conn.commit()
+    suffix = " (dry run)" if args.dry_run else ""
+    log(f"✅ {created} partitions created, {detached} cold events detached{suffix}")
+    if stray:
+        log(f"⚠️  {stray:,} scores sit in the default partition (event without a partition)")
+    return 0
+
+
+def attach(conn, args):
+    partition = with_lock_retry(conn, lambda cur: fetch_value(
+        cur, "SELECT create_score_partition(%s)", (args.event_code,)))
+    if partition is None:
+        log("❌ High_Scores_Archive is not partitioned yet; run: python partition_archive.py migrate")
+        return 1
+    log(f"✅ {args.event_code} is attached ({partition})")
+    return 0
+
+
+def status(conn, args):
+    with conn.cursor() as cur:
+        if not archive_is_partitioned(cur):
+            log("ℹ️  High_Scores_Archive is a plain table (not partitioned)")
+            return 0
+        rows = fetch_all(cur, COLD_EVENTS_SQL, (args.cold_after_days,))
+        stray = fetch_value(cur, f"SELECT COUNT(*) FROM {ARCHIVE}_default")
+    conn.commit()
+    print(f"{'event_code':<24}{'state':<12}{'~rows':>12}  partition")
+    for event_code, partition, attached, exists, rows, is_cold in rows:
+        state = 'attached' if attached else ('detached' if exists else 'missing')
+        if is_cold and attached:
+            state += '*'
+        print(f"{event_code:<24}{state:<12}{rows or 0:>12,}  {partition}")
+    print(f"default partition: {stray:,} rows   (* = cold, detached by maintain)")
+    return 0
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    parser = argparse.ArgumentParser(description='Partition High_Scores_Archive by event')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('migrate', help='convert the plain archive table, online')
+    cmd.add_argument('--batch-size', type=int, default=50000, help='score ids per copy batch')
+    cmd.add_argument('--max-replays', type=int, default=20,
+                     help='catch-up passes before swapping anyway')
+    cmd.add_argument('--swap-threshold', type=int, default=1000,
+                     help='swap once a catch-up pass replays at most this many scores')
+    cmd.add_argument('--drop-old', action='store_true', help='drop the unpartitioned table afterwards')
+    cmd.set_defaults(handler=migrate)
+
+    for name, handler, text in (('maintain', maintain, 'create missing partitions, detach cold events'),
+                                ('status', status, 'show the partition of every event')):
+        cmd = commands.add_parser(name, help=text)
+        cmd.add_argument('--cold-after-days', type=int, default=90,
+                         help='inactive events stopped this long ago are cold (default 90)')
+        cmd.add_argument('--dry-run', action='store_true', help='print the actions only')
+        cmd.set_defaults(handler=handler)
+
+    cmd = commands.add_parser('attach', help='re-attach (or create) the partition of one event')
+    cmd.add_argument('event_code')
+    cmd.set_defaults(handler=attach)
+
+    args = parser.parse_args()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        return args.handler(conn, args)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ {args.command} failed: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Postgres LISTEN/NOTIFY Dispatcher
+One dedicated LISTEN connection per process that fans notifications out to
+in-process subscribers (caches, push channels)
+"""
+
+import os
+import select
+import threading
+import time
+
+import psycopg2
+
+
+class NotificationListener:
+    """
+    Background thread holding a single LISTEN connection.
+
+    ``subscribe(channel, callback)`` registers ``callback(payload)`` for a
+    channel. Callbacks registered with ``on_reconnect`` run every time the
+    connection is (re)established, because notifications sent while we were
+    disconnected are lost and caches must assume they missed something.
+    The thread starts lazily on first use so it is created in each gunicorn
+    worker rather than in a pre-fork master.
+    """
+
+    def __init__(self, connect_kwargs, reconnect_delay=5.0, poll_timeout=5.0):
+        self.connect_kwargs = {k: v for k, v in connect_kwargs.items() if k != 'cursor_factory'}
+        self.reconnect_delay = reconnect_delay
+        self.poll_timeout = poll_timeout
+        self._subscribers = {}
+        self._reconnect_callbacks = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._conn = None
+        self._connected = threading.Event()
+        self._listening = set()
+        self.notifications_received = 0
+        self.reconnects = 0
+
+    @property
+    def connected(self):
+        """True while the LISTEN connection is up (and this process owns it)"""
+        return self._pid == os.getpid() and self._connected.is_set()
+
+    def subscribe(self, channel, callback):
+        """Register ``callback(payload)`` for NOTIFYs on ``channel``"""
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+    def on_reconnect(self, callback):
+        """Register ``callback()`` to run after every (re)connect"""
+        with self._lock:
+            self._reconnect_callbacks.append(callback)
+
+    def ensure_started(self):
+        """Start the listener thread for this process if it is not running"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._connected.clear()
+            self._listening = set()
+            self._conn = None
+            self._thread = threading.Thread(target=self._run, name='pg-listener', daemon=True)
+            self._thread.start()
+
+    def wait_connected(self, timeout=None):
+        """Block until the LISTEN connection is up; returns False on timeout"""
+        return self._connected.wait(timeout)
+
+    # ---------- listener thread ----------
+
+    def _listen_new_channels(self):
+        with self._lock:
+            channels = [c for c in self._subscribers if c not in self._listening]
+        if not channels:
+            return
+        cur = self._conn.cursor()
+        for channel in channels:
+            cur.execute(f'LISTEN "{channel}"')
+            self._listening.add(channel)
+        cur.close()
+
+    def _dispatch(self, notify):
+        self.notifications_received += 1
+        with self._lock:
+            callbacks = list(self._subscribers.get(notify.channel, ()))
+        for callback in callbacks:
+            try:
+                callback(notify.payload)
+            except Exception as e:
+                print(f"⚠️ Notification handler for '{notify.channel}' failed: {e}")
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        conn.autocommit = True
+        self._conn = conn
+        self._listening = set()
+        self._listen_new_channels()
+        self._connected.set()
+        with self._lock:
+            callbacks = list(self._reconnect_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Reconnect handler failed: {e}")
+
+    def _run(self):
+        while True:
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._connect()
+                self._listen_new_channels()
+                if select.select([self._conn], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                self._conn.poll()
+                while self._conn.notifies:
+                    self._dispatch(self._conn.notifies.pop(0))
+            except Exception as e:
+                if self._connected.is_set():
+                    print(f"⚠️ LISTEN connection lost: {e}")
+                self._connected.clear()
+                try:
+                    if self._conn is not None:
+                        self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+                self.reconnects += 1
+                time.sleep(self.reconnect_delay)
+
+    def stats(self):
+        with self._lock:
+            channels = sorted(self._subscribers)
+        return {
+            "connected": self.connected,
+            "channels": channels,
+            "notifications_received": self.notifications_received,
+            "reconnects": self.reconnects,
+        }
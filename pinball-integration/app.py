@@ -16,7 +16,12 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='static')
-CORS(app)
+# Kiosk JS can read the freshness headers set by with_freshness()
+CORS(app, expose_headers=['X-Data-Refreshed-At', 'X-Data-Age-Seconds', 'X-Data-Stale'])
+
+# The kiosk views are materialized and refreshed by every leaderboard
+# recompute (hourly); older data than this is reported as stale
+KIOSK_STALE_AFTER_SECONDS = int(os.getenv('KIOSK_STALE_AFTER_SECONDS', '7200'))
 
 # Load configuration
 def load_config():
@@ -42,6 +47,47 @@ def get_db_connection():
         logger.error(f"Database connection error: {e}")
         raise
 
+def describe_freshness(row):
+    """Freshness of one kiosk_view_status row"""
+    stale = bool(row['missed_recompute']) or row['age_seconds'] > KIOSK_STALE_AFTER_SECONDS
+    return {
+        "refreshed_at": row['refreshed_at'].isoformat(),
+        "age_seconds": row['age_seconds'],
+        "missed_recompute": bool(row['missed_recompute']),
+        "stale": stale
+    }
+
+def view_freshness(cur, view):
+    """Refresh status of a kiosk materialized view (None if not tracked)"""
+    try:
+        cur.execute("""
+            SELECT refreshed_at, age_seconds, missed_recompute
+            FROM kiosk_view_status
+            WHERE view_name = %s
+        """, (view,))
+        row = cur.fetchone()
+    except psycopg2.Error as e:
+        # database/init/15_kiosk_views.sql not applied: nothing to report
+        cur.connection.rollback()
+        logger.warning(f"Could not read kiosk_view_status: {e}")
+        return None
+
+    if not row:
+        return None
+    freshness = describe_freshness(row)
+    if freshness['stale']:
+        logger.warning(f"{view} is stale: refreshed {freshness['age_seconds']}s ago"
+                       f"{' and missed the last recompute' if freshness['missed_recompute'] else ''}")
+    return freshness
+
+def with_freshness(response, freshness):
+    """Tag a kiosk response with the age of the materialized view behind it"""
+    if freshness:
+        response.headers['X-Data-Refreshed-At'] = freshness['refreshed_at']
+        response.headers['X-Data-Age-Seconds'] = str(freshness['age_seconds'])
+        response.headers['X-Data-Stale'] = 'true' if freshness['stale'] else 'false'
+    return response
+
 def format_score(score):
     """Format large numbers with M/K suffixes"""
     if score >= 1_000_000:
@@ -87,11 +133,12 @@ def top_10():
             if player.get('last_seen'):
                 player['last_seen'] = player['last_seen'].isoformat()
         
+        freshness = view_freshness(cur, 'leaderboard_current')
         cur.close()
         conn.close()
         
         logger.info(f"Retrieved {len(players)} top players")
-        return jsonify(players)
+        return with_freshness(jsonify(players), freshness)
         
     except Exception as e:
         logger.error(f"Error fetching top 10: {e}")
@@ -115,11 +162,12 @@ def full_leaderboard():
         """)
         
         players = cur.fetchall()
+        freshness = view_freshness(cur, 'leaderboard_current')
         cur.close()
         conn.close()
         
         logger.info(f"Retrieved {len(players)} total players")
-        return jsonify(players)
+        return with_freshness(jsonify(players), freshness)
         
     except Exception as e:
         logger.error(f"Error fetching full leaderboard: {e}")
@@ -142,11 +190,12 @@ def game_champions():
         """)
         
         champions = cur.fetchall()
+        freshness = view_freshness(cur, 'game_champions')
         cur.close()
         conn.close()
         
         logger.info(f"Retrieved {len(champions)} game champions")
-        return jsonify(champions)
+        return with_freshness(jsonify(champions), freshness)
         
     except Exception as e:
         logger.error(f"Error fetching game champions: {e}")
@@ -165,7 +214,7 @@ def recent_activity():
                 game,
                 score,
                 timestamp,
-                minutes_ago,
+                EXTRACT(EPOCH FROM (NOW() - timestamp))/60 as minutes_ago,
                 is_personal_best
             FROM recent_activity
             ORDER BY timestamp DESC
@@ -182,11 +231,12 @@ def recent_activity():
             if activity.get('minutes_ago'):
                 activity['minutes_ago'] = int(activity['minutes_ago'])
         
+        freshness = view_freshness(cur, 'recent_activity')
         cur.close()
         conn.close()
         
         logger.info(f"Retrieved {len(activities)} recent activities")
-        return jsonify(activities)
+        return with_freshness(jsonify(activities), freshness)
         
     except Exception as e:
         logger.error(f"Error fetching recent activity: {e}")
@@ -211,22 +261,23 @@ def statistics():
         """)
         
         stats = cur.fetchone()
+        freshness = view_freshness(cur, 'league_statistics')
         cur.close()
         conn.close()
         
         if stats:
             logger.info("Retrieved league statistics")
-            return jsonify(stats)
+            return with_freshness(jsonify(stats), freshness)
         else:
             logger.warning("No statistics data available")
-            return jsonify({
+            return with_freshness(jsonify({
                 "total_games_this_week": 0,
                 "total_games_this_month": 0,
                 "active_players": 0,
                 "average_score": 0,
                 "most_popular_game": "N/A",
                 "busiest_day": "N/A"
-            })
+            }), freshness)
         
     except Exception as e:
         logger.error(f"Error fetching statistics: {e}")
@@ -234,16 +285,29 @@ def statistics():
 
 @app.route('/api/health')
 def health_check():
-    """Health check endpoint to verify database connection"""
+    """Health check endpoint to verify database connection and kiosk view freshness"""
     try:
         conn = get_db_connection()
-        cur = conn.cursor()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
         cur.execute('SELECT 1')
+        try:
+            cur.execute("""
+                SELECT view_name, refreshed_at, age_seconds, missed_recompute
+                FROM kiosk_view_status
+                ORDER BY view_name
+            """)
+            views = {row['view_name']: describe_freshness(row) for row in cur.fetchall()}
+        except psycopg2.Error as e:
+            logger.warning(f"Could not read kiosk_view_status: {e}")
+            views = {}
         cur.close()
         conn.close()
+        stale_views = [name for name, view in views.items() if view['stale']]
         return jsonify({
-            "status": "healthy",
+            "status": "stale" if stale_views else "healthy",
             "database": "connected",
+            "views": views,
+            "stale_views": stale_views,
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -1,114 +1,119 @@
 -- Database Views for Pinball Leaderboard Kiosk
 -- These views are optimized for your actual schema structure
 -- Run these after your database is initialized
+--
+-- The four views the kiosk server reads are MATERIALIZED: kiosk requests read
+-- stored rows instead of re-running the joins and aggregates. Each has a
+-- unique index so update_combined_leaderboard() can refresh it CONCURRENTLY
+-- (refresh_kiosk_views(), database/init/15_kiosk_views.sql) without blocking
+-- readers. Re-running this file drops and recreates them with current data.
+
+-- Drop the kiosk views, plain (older installs) or materialized
+DO $$
+DECLARE
+    v RECORD;
+BEGIN
+    FOR v IN
+        SELECT c.oid::regclass AS rel, c.relkind
+        FROM pg_class c
+        WHERE c.oid IN (to_regclass('leaderboard_current'), to_regclass('game_champions'),
+                        to_regclass('recent_activity'), to_regclass('league_statistics'))
+    LOOP
+        EXECUTE format('DROP %s %s',
+                       CASE v.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END, v.rel);
+    END LOOP;
+END;
+$$;
 
 -- ==============================================
 -- VIEW 1: Current Leaderboard with Trends
 -- ==============================================
-CREATE OR REPLACE VIEW leaderboard_current AS
-WITH current_rankings AS (
-    SELECT 
-        lc.player_id,
-        p.display_name as name,
-        lc.combined_score as score,
-        lc.current_rank as rank,
-        p.avatar_url,
-        p.background_color_hex,
-        p.last_seen,
-        lc.last_updated
-    FROM Leaderboard_Cache lc
-    JOIN Players p ON lc.player_id = p.player_id
-),
-games_played AS (
-    SELECT 
-        player_id,
-        COUNT(*) as games_played
-    FROM High_Scores_Archive
-    WHERE is_approved = TRUE
-    GROUP BY player_id
-),
-rank_history AS (
-    -- Get rank from 24 hours ago for trend calculation
-    SELECT DISTINCT ON (player_id)
-        player_id,
-        current_rank as rank_24h_ago
-    FROM Leaderboard_History
-    WHERE recorded_at <= NOW() - INTERVAL '24 hours'
-    ORDER BY player_id, recorded_at DESC
-)
+CREATE MATERIALIZED VIEW leaderboard_current AS
+-- games_played and the 24h trend are stored on Leaderboard_Cache at recompute
+-- time (refresh_leaderboard_trends); casts keep the view's original column types
 SELECT 
-    cr.rank,
-    cr.name,
-    cr.score,
-    COALESCE(gp.games_played, 0) as games_played,
-    CASE 
-        WHEN rh.rank_24h_ago IS NULL THEN 'stable'
-        WHEN rh.rank_24h_ago > cr.rank THEN 'up'
-        WHEN rh.rank_24h_ago < cr.rank THEN 'down'
-        ELSE 'stable'
-    END as trend,
-    COALESCE(ABS(rh.rank_24h_ago - cr.rank), 0) as trend_positions,
-    cr.last_seen,
-    cr.avatar_url,
-    cr.background_color_hex
-FROM current_rankings cr
-LEFT JOIN games_played gp ON cr.player_id = gp.player_id
-LEFT JOIN rank_history rh ON cr.player_id = rh.player_id
-ORDER BY cr.rank;
+    lc.player_id,
+    lc.current_rank as rank,
+    p.display_name as name,
+    lc.combined_score as score,
+    lc.games_played::bigint as games_played,
+    lc.trend::text as trend,
+    lc.trend_positions,
+    p.last_seen,
+    p.avatar_url,
+    p.background_color_hex
+FROM Leaderboard_Cache lc
+JOIN Players p ON lc.player_id = p.player_id
+ORDER BY lc.current_rank;
+
+CREATE UNIQUE INDEX leaderboard_current_player ON leaderboard_current (player_id);
+CREATE INDEX leaderboard_current_rank ON leaderboard_current (rank);
 
 -- ==============================================
 -- VIEW 2: Game Champions (High Score per Machine)
 -- ==============================================
-CREATE OR REPLACE VIEW game_champions AS
-SELECT DISTINCT ON (hsa.machine_id)
+-- Reads the per-event champions maintained in Machine_Champions and keeps
+-- the best across events, as the archive-wide DISTINCT ON used to
+CREATE MATERIALIZED VIEW game_champions AS
+SELECT DISTINCT ON (mc.machine_id)
+    mc.machine_id,
     m.machine_name as name,
     p.display_name as champion,
-    hsa.high_score as score,
+    mc.high_score as score,
     m.artwork_url,
-    hsa.date_set
-FROM High_Scores_Archive hsa
-JOIN Machines m ON hsa.machine_id = m.machine_id
-JOIN Players p ON hsa.player_id = p.player_id
-WHERE hsa.is_approved = TRUE
-  AND m.is_active = TRUE
-ORDER BY hsa.machine_id, hsa.high_score DESC;
+    mc.date_set
+FROM Machine_Champions mc
+JOIN Machines m ON mc.machine_id = m.machine_id
+JOIN Players p ON mc.player_id = p.player_id
+WHERE m.is_active = TRUE
+ORDER BY mc.machine_id, mc.high_score DESC, mc.score_id;
+
+CREATE UNIQUE INDEX game_champions_machine ON game_champions (machine_id);
 
 -- ==============================================
 -- VIEW 3: Recent Activity Feed
 -- ==============================================
-CREATE OR REPLACE VIEW recent_activity AS
-WITH player_machine_bests AS (
-    SELECT 
-        player_id,
-        machine_id,
-        MAX(high_score) as best_score
-    FROM High_Scores_Archive
-    WHERE is_approved = TRUE
-    GROUP BY player_id, machine_id
-)
+-- The 20 newest approved scores, each looked up in Personal_Bests (the best
+-- across events, as before) rather than aggregating the whole archive.
+-- minutes_ago would be frozen at refresh time, so readers compute it from
+-- timestamp.
+CREATE MATERIALIZED VIEW recent_activity AS
 SELECT 
+    hsa.score_id,
+    hsa.event_code,
     p.display_name as player,
     m.machine_name as game,
     hsa.high_score as score,
     hsa.date_set as timestamp,
-    EXTRACT(EPOCH FROM (NOW() - hsa.date_set))/60 as minutes_ago,
     (hsa.high_score = pmb.best_score) as is_personal_best,
     p.background_color_hex,
     m.artwork_url
-FROM High_Scores_Archive hsa
+FROM (
+    SELECT score_id, event_code, player_id, machine_id, high_score, date_set
+    FROM High_Scores_Archive
+    WHERE is_approved = TRUE
+      AND player_id IS NOT NULL
+      AND machine_id IS NOT NULL
+    ORDER BY date_set DESC
+    LIMIT 20
+) hsa
 JOIN Players p ON hsa.player_id = p.player_id
 JOIN Machines m ON hsa.machine_id = m.machine_id
-LEFT JOIN player_machine_bests pmb 
-    ON hsa.player_id = pmb.player_id 
-    AND hsa.machine_id = pmb.machine_id
-WHERE hsa.is_approved = TRUE
-ORDER BY hsa.date_set DESC
-LIMIT 20;
+LEFT JOIN LATERAL (
+    SELECT MAX(pb.best_score) as best_score
+    FROM Personal_Bests pb
+    WHERE pb.player_id = hsa.player_id
+      AND pb.machine_id = hsa.machine_id
+) pmb ON true
+ORDER BY hsa.date_set DESC;
+
+CREATE UNIQUE INDEX recent_activity_score ON recent_activity (score_id, event_code);
 
 -- ==============================================
 -- VIEW 4: League Statistics
 -- ==============================================
-CREATE OR REPLACE VIEW league_statistics AS
+-- One row; the week/month windows are as of the last refresh
+CREATE MATERIALIZED VIEW league_statistics AS
 WITH time_filtered_scores AS (
     SELECT 
         date_set,
@@ -118,6 +123,7 @@ WITH time_filtered_scores AS (
     WHERE is_approved = TRUE
 )
 SELECT 
+    TRUE as singleton,
     COUNT(*) FILTER (WHERE date_set > NOW() - INTERVAL '7 days') as games_this_week,
     COUNT(*) FILTER (WHERE date_set > NOW() - INTERVAL '30 days') as games_this_month,
     (SELECT COUNT(*) FROM Leaderboard_Cache) as active_players,
@@ -143,6 +149,8 @@ SELECT
     ) as busiest_day
 FROM time_filtered_scores;
 
+CREATE UNIQUE INDEX league_statistics_singleton ON league_statistics (singleton);
+
 -- ==============================================
 -- VIEW 5: Top Performers This Week
 -- ==============================================
@@ -177,12 +185,15 @@ CREATE INDEX IF NOT EXISTS idx_high_scores_player_machine
 -- ==============================================
 -- COMMENTS for Documentation
 -- ==============================================
-COMMENT ON VIEW leaderboard_current IS 'Current leaderboard with rank trends (24h comparison)';
-COMMENT ON VIEW game_champions IS 'Highest score per machine (active machines only)';
-COMMENT ON VIEW recent_activity IS 'Last 20 games played with personal best flags';
-COMMENT ON VIEW league_statistics IS 'League-wide statistics for kiosk display';
+COMMENT ON MATERIALIZED VIEW leaderboard_current IS 'Current leaderboard with rank trends (24h comparison)';
+COMMENT ON MATERIALIZED VIEW game_champions IS 'Highest score per machine (active machines only)';
+COMMENT ON MATERIALIZED VIEW recent_activity IS 'Last 20 games played with personal best flags';
+COMMENT ON MATERIALIZED VIEW league_statistics IS 'League-wide statistics for kiosk display';
 COMMENT ON VIEW weekly_top_performers IS 'Top 10 players by total score this week';
 
+-- Record the initial refresh so kiosk_view_status has a row for each view
+SELECT refresh_kiosk_views();
+
 -- ==============================================
 -- TEST QUERIES (Comment out after testing)
 -- ==============================================
@@ -190,3 +201,4 @@ COMMENT ON VIEW weekly_top_performers IS 'Top 10 players by total score this wee
 -- SELECT * FROM game_champions;
 -- SELECT * FROM recent_activity LIMIT 10;
 -- SELECT * FROM league_statistics;
+-- SELECT * FROM kiosk_view_status;
@@ -3,11 +3,16 @@ class PinballKiosk {
     constructor() {
         this.currentScene = 0;
         this.scenes = [
-            { id: 'scene-top10', name: 'Top 10', loader: this.loadTop10.bind(this) },
-            { id: 'scene-champions', name: 'Game Champions', loader: this.loadChampions.bind(this) },
-            { id: 'scene-activity', name: 'Recent Activity', loader: this.loadActivity.bind(this) },
-            { id: 'scene-roster', name: 'Full Roster', loader: this.loadRoster.bind(this) },
-            { id: 'scene-stats', name: 'Statistics', loader: this.loadStats.bind(this) }
+            { id: 'scene-top10', name: 'Top 10', loader: this.loadTop10.bind(this),
+              url: '/api/leaderboard/top10', events: ['leaderboard_updated'] },
+            { id: 'scene-champions', name: 'Game Champions', loader: this.loadChampions.bind(this),
+              url: '/api/game-champions', events: ['new_high_score'] },
+            { id: 'scene-activity', name: 'Recent Activity', loader: this.loadActivity.bind(this),
+              url: '/api/recent-activity', events: ['new_high_score'] },
+            { id: 'scene-roster', name: 'Full Roster', loader: this.loadRoster.bind(this),
+              url: '/api/leaderboard/full', events: ['leaderboard_updated'] },
+            { id: 'scene-stats', name: 'Statistics', loader: this.loadStats.bind(this),
+              url: '/api/statistics', events: ['new_high_score'] }
         ];
         this.isPaused = false;
         this.sceneDuration = 60; // seconds
@@ -16,6 +21,9 @@ class PinballKiosk {
         this.scrollInterval = null;
         this.scrollAnimationFrame = null;
         this.config = null;
+        this.httpCache = {}; // url -> { etag, freshUntil }
+        this.eventSource = null;
+        this.generation = null; // last leaderboard generation pushed by /api/stream
         
         this.init();
     }
@@ -33,6 +41,9 @@ class PinballKiosk {
         // Start countdown timer
         this.startCountdown();
         
+        // Push updates from the server; the timer below is only a fallback
+        this.setupEventStream();
+        
         // Setup periodic data refresh (every 5 minutes)
         this.dataRefreshInterval = setInterval(() => {
             this.refreshCurrentScene();
@@ -213,6 +224,45 @@ class PinballKiosk {
         this.updateLastUpdatedTime();
     }
     
+    // Server-Sent Events: refresh only the scenes an event affects
+    setupEventStream() {
+        if (!window.EventSource) return;
+        
+        this.eventSource = new EventSource('/api/stream');
+        
+        // Sent on every (re)connect: anything missed while disconnected is stale
+        this.eventSource.addEventListener('hello', (e) => {
+            const { generation } = JSON.parse(e.data);
+            if (this.generation !== null && generation !== this.generation) {
+                this.invalidateScenes(this.scenes);
+            }
+            this.generation = generation;
+        });
+        
+        this.eventSource.addEventListener('leaderboard_updated', (e) => {
+            this.generation = JSON.parse(e.data).generation;
+            this.invalidateScenes(this.scenes.filter(s => s.events.includes('leaderboard_updated')));
+        });
+        
+        this.eventSource.addEventListener('new_high_score', () => {
+            this.invalidateScenes(this.scenes.filter(s => s.events.includes('new_high_score')));
+        });
+        
+        // EventSource reconnects by itself (the server sends retry: 5000)
+        this.eventSource.onerror = () => console.warn('Event stream disconnected, retrying...');
+    }
+    
+    // Expire the scenes' cached responses; reload now if one is on screen
+    invalidateScenes(scenes) {
+        scenes.forEach(scene => {
+            const cached = this.httpCache[scene.url];
+            if (cached) cached.freshUntil = 0;
+        });
+        if (scenes.includes(this.scenes[this.currentScene])) {
+            this.refreshCurrentScene();
+        }
+    }
+    
     nextScene() {
         const nextIndex = (this.currentScene + 1) % this.scenes.length;
         this.showScene(nextIndex);
@@ -263,11 +313,40 @@ class PinballKiosk {
         document.getElementById('updateTime').textContent = timeString;
     }
     
+    // Conditional fetch: resolves to the parsed JSON, or null when the server
+    // says nothing changed since the last render (304) or the previous
+    // response is still fresh according to its Cache-Control max-age.
+    async fetchIfChanged(url) {
+        const cached = this.httpCache[url];
+        if (cached && Date.now() < cached.freshUntil) {
+            return null;
+        }
+        
+        const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+        // no-store: we handle revalidation ourselves so a 304 reaches this code
+        const response = await fetch(url, { headers, cache: 'no-store' });
+        
+        const maxAge = /max-age=(\d+)/.exec(response.headers.get('Cache-Control') || '');
+        const freshUntil = maxAge ? Date.now() + parseInt(maxAge[1], 10) * 1000 : 0;
+        
+        if (response.status === 304 && cached) {
+            cached.freshUntil = freshUntil;
+            return null;
+        }
+        if (!response.ok) {
+            throw new Error(`${url} returned HTTP ${response.status}`);
+        }
+        
+        const data = await response.json();
+        this.httpCache[url] = { etag: response.headers.get('ETag'), freshUntil };
+        return data;
+    }
+    
     // Scene Loaders
     async loadTop10() {
         try {
-            const response = await fetch('/api/leaderboard/top10');
-            const players = await response.json();
+            const players = await this.fetchIfChanged('/api/leaderboard/top10');
+            if (players === null) return; // unchanged - keep current render
             
             const container = document.getElementById('top10List');
             container.innerHTML = '';
@@ -307,8 +386,8 @@ class PinballKiosk {
     
     async loadChampions() {
         try {
-            const response = await fetch('/api/game-champions');
-            const champions = await response.json();
+            const champions = await this.fetchIfChanged('/api/game-champions');
+            if (champions === null) return; // unchanged - keep current render
             
             const container = document.getElementById('championsList');
             container.innerHTML = '';
@@ -332,8 +411,8 @@ class PinballKiosk {
     
     async loadActivity() {
         try {
-            const response = await fetch('/api/recent-activity');
-            const activities = await response.json();
+            const activities = await this.fetchIfChanged('/api/recent-activity');
+            if (activities === null) return; // unchanged - keep current render
             
             const container = document.getElementById('activityFeed');
             container.innerHTML = '';
@@ -362,8 +441,8 @@ class PinballKiosk {
     
     async loadRoster() {
         try {
-            const response = await fetch('/api/leaderboard/full');
-            const players = await response.json();
+            const players = await this.fetchIfChanged('/api/leaderboard/full');
+            if (players === null) return; // unchanged - keep current render
             
             const container = document.getElementById('fullRoster');
             container.innerHTML = '';
@@ -385,8 +464,8 @@ class PinballKiosk {
     
     async loadStats() {
         try {
-            const response = await fetch('/api/statistics');
-            const stats = await response.json();
+            const stats = await this.fetchIfChanged('/api/statistics');
+            if (stats === null) return; // unchanged - keep current render
             
             const container = document.getElementById('statsGrid');
             container.innerHTML = '';
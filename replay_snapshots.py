@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Archive Replay
+Regenerate High_Scores_Archive from the Api_Snapshots audit trail, e.g. after
+the smart-filtering or unique_score_per_event rules change.
+
+Snapshots are streamed in fetched_at order; each distinct payload is fetched
+and parsed by a process pool (parse_leaderboard() and best_scores() from
+ingest_scores.py), and the higher-score rule is applied in order in the main
+process: a score is kept when it beats every earlier score of that player on
+that machine in that event, with date_set = the fetch that first returned it.
+A payload already seen for the event cannot add anything and is skipped.
+
+Each event's result is COPYed into a staging table with the archive's
+constraints and indexes. Without --swap the tool only reports how the replay
+differs from the current archive; with --swap the staging table replaces the
+event's partition (one short lock) and Machine_Champions, Personal_Bests and
+the leaderboard are rebuilt for that event.
+
+Usage:
+    python replay_snapshots.py                         # every event, report only
+    python replay_snapshots.py --event hJjW-WXu-oCGQ   # one event
+    python replay_snapshots.py --workers 8 --swap      # replace the archive
+
+Scores that did not come from the API (score_source <> 'API') are carried over
+as they are, and take part in the higher-score rule from their date_set.
+Approval flags of replayed scores are copied from the current archive.
+
+Connection settings come from the usual DB_* environment variables (.env).
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import psycopg2
+
+from ingest_scores import DB_CONFIG, PROFILE_FIELDS, best_scores, parse_leaderboard
+from partition_archive import archive_is_partitioned, fetch_all, fetch_value, log, with_lock_retry
+
+COLUMNS = ('player_id', 'machine_id', 'high_score', 'date_set', 'event_code', 'score_source', 'is_approved')
+
+# Metadata only: payloads are fetched by the workers, once per distinct hash
+SNAPSHOTS_SQL = """
+    SELECT snapshot_id, event_code, fetched_at, payload_hash
+    FROM Api_Snapshots
+    WHERE event_code IS NOT NULL
+      AND (%(events)s::varchar[] IS NULL OR event_code = ANY(%(events)s::varchar[]))
+    ORDER BY fetched_at, snapshot_id
+"""
+
+MANUAL_SCORES_SQL = """
+    SELECT player_id, machine_id, high_score, date_set, event_code, score_source, is_approved
+    FROM High_Scores_Archive
+    WHERE score_source <> 'API'
+      AND event_code = ANY(%s::varchar[])
+    ORDER BY date_set, score_id
+"""
+
+# Keep moderation: replayed scores retracted in the current archive stay retracted
+CARRY_APPROVAL_SQL = """
+    UPDATE {staging} s
+    SET is_approved = false
+    FROM High_Scores_Archive a
+    WHERE a.event_code = %(event_code)s
+      AND NOT a.is_approved
+      AND s.score_source = 'API'
+      AND a.player_id = s.player_id
+      AND a.machine_id = s.machine_id
+      AND a.high_score = s.high_score
+"""
+
+COMPARE_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM High_Scores_Archive WHERE event_code = %(event_code)s) as current_rows,
+        (SELECT COUNT(*) FROM {staging}) as replayed_rows,
+        (SELECT COUNT(*) FROM (
+            SELECT player_id, machine_id, high_score FROM High_Scores_Archive WHERE event_code = %(event_code)s
+            EXCEPT
+            SELECT player_id, machine_id, high_score FROM {staging}
+        ) gone) as only_current,
+        (SELECT COUNT(*) FROM (
+            SELECT player_id, machine_id, high_score FROM {staging}
+            EXCEPT
+            SELECT player_id, machine_id, high_score FROM High_Scores_Archive WHERE event_code = %(event_code)s
+        ) added) as only_replayed
+"""
+
+UPSERT_MISSING_PLAYERS_SQL = """
+    INSERT INTO Players (player_id, display_name, avatar_url, background_color_hex, is_all_access)
+    SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::text[], %s::varchar[], %s::boolean[])
+    ON CONFLICT (player_id) DO NOTHING
+"""
+
+UPSERT_MISSING_MACHINES_SQL = """
+    INSERT INTO Machines (machine_id, machine_name)
+    SELECT * FROM unnest(%s::varchar[], %s::varchar[])
+    ON CONFLICT (machine_id) DO NOTHING
+"""
+
+REBUILD_DERIVED_SQL = """
+    SELECT rebuild_machine_champions(%(event_code)s), rebuild_personal_bests(%(event_code)s);
+    SELECT update_combined_leaderboard(start_date, stop_date, event_code, p_full_rebuild => true)
+    FROM Events
+    WHERE event_code = %(event_code)s AND is_active;
+"""
+
+# ==================== PARSING (worker processes) ====================
+
+_worker_conn = None
+
+
+def _init_worker(search_path=None):
+    global _worker_conn
+    options = {'options': f"-c search_path={search_path}"} if search_path else {}
+    _worker_conn = psycopg2.connect(**DB_CONFIG, **options)
+    _worker_conn.autocommit = True
+
+
+def parse_snapshot(task):
+    """
+    Fetch and parse one snapshot. Returns (task, best, players, machines)
+    with compact tuples so little has to be pickled back.
+    """
+    snapshot_id, event_code, fetched_at = task
+    with _worker_conn.cursor() as cur:
+        cur.execute("SELECT snapshot_payload(%s)::text", (snapshot_id,))
+        text = cur.fetchone()[0]
+    raw = json.loads(text) if text else {}
+    if not isinstance(raw, dict):
+        return task, [], {}, {}
+    _, machines, scores, _ = parse_leaderboard(raw, fetched_at)
+    best = [(s['player_id'], s['machine_id'], s['high_score']) for s in best_scores(scores)]
+    players = {s['player_id']: tuple(s[f] for f in PROFILE_FIELDS) for s in scores}
+    return task, best, players, machines
+
+# ==================== REPLAY ====================
+
+
+class Replay:
+    """Higher-score state per (event, player, machine) plus one CSV per event"""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.best = {}
+        self.files = {}
+        self.writers = {}
+        self.rows = defaultdict(int)
+        self.players = {}
+        self.machines = {}
+        self.manual = defaultdict(list)
+        self.manual_keys = set()    # (event, player, machine, score) of non-API rows
+        self.replayed_manual = set()
+        self.stats = {'snapshots': 0, 'duplicates': 0, 'parsed': 0}
+
+    def writer(self, event_code):
+        if event_code not in self.writers:
+            path = os.path.join(self.workdir, f"{len(self.files)}.csv")
+            self.files[event_code] = open(path, 'w', newline='')
+            self.writers[event_code] = csv.writer(self.files[event_code])
+        return self.writers[event_code]
+
+    def load_manual(self, rows):
+        """Non-API scores: copied as they are, applied to the state at their date_set"""
+        for row in rows:
+            self.manual[row[4]].append(row)
+            self.manual_keys.add((row[4], row[0], row[1], row[2]))
+        for event_code, scores in self.manual.items():
+            scores.reverse()  # pop() from the end = oldest first
+
+    def apply_manual(self, event_code, until=None):
+        scores = self.manual.get(event_code)
+        while scores and (until is None or scores[-1][3] <= until):
+            player_id, machine_id, high_score, date_set, _, source, approved = scores.pop()
+            key = (event_code, player_id, machine_id)
+            if player_id is not None and machine_id is not None:
+                self.best[key] = max(high_score, self.best.get(key, high_score))
+            if (event_code, player_id, machine_id, high_score) in self.replayed_manual:
+                # The API returned the same score first; unique_score_per_event keeps one
+                continue
+            self.writer(event_code).writerow(
+                (player_id, machine_id, high_score, date_set.isoformat(), event_code, source,
+                 't' if approved else 'f'))
+            self.rows[event_code] += 1
+
+    def apply(self, result):
+        (snapshot_id, event_code, fetched_at), best, players, machines = result
+        self.stats['parsed'] += 1
+        self.apply_manual(event_code, until=fetched_at)
+        writer = self.writer(event_code)
+        date_set = fetched_at.isoformat()
+        for player_id, machine_id, high_score in best:
+            key = (event_code, player_id, machine_id)
+            previous = self.best.get(key)
+            if previous is None or high_score > previous:
+                self.best[key] = high_score
+                if self.manual_keys and key + (high_score,) in self.manual_keys:
+                    self.replayed_manual.add(key + (high_score,))
+                writer.writerow((player_id, machine_id, high_score, date_set, event_code, 'API', 't'))
+                self.rows[event_code] += 1
+        self.players.update(players)
+        self.machines.update(machines)
+
+    def finish(self):
+        for event_code in list(self.manual):
+            self.apply_manual(event_code)
+        for f in self.files.values():
+            f.close()
+        return {event_code: f.name for event_code, f in self.files.items()}
+
+
+def snapshot_tasks(cur, replay):
+    """Snapshots in fetched_at order, minus payloads already seen for their event"""
+    seen = set()
+    for snapshot_id, event_code, fetched_at, payload_hash in cur:
+        replay.stats['snapshots'] += 1
+        key = (event_code, payload_hash or snapshot_id)
+        if key in seen:
+            replay.stats['duplicates'] += 1
+            continue
+        seen.add(key)
+        yield snapshot_id, event_code, fetched_at
+
+
+def stream_snapshots(conn, args, replay, search_path=None):
+    """Feed every snapshot through the worker pool into ``replay``, in fetched_at order"""
+    started = time.perf_counter()
+    last_report = started
+
+    def progress(final=False):
+        elapsed = time.perf_counter() - started
+        rate = replay.stats['snapshots'] / elapsed * 60 if elapsed else 0
+        log(f"{'✅' if final else '⏳'} {replay.stats['snapshots']:,} snapshots "
+            f"({replay.stats['parsed']:,} parsed, {replay.stats['duplicates']:,} repeats), "
+            f"{sum(replay.rows.values()):,} scores kept, {rate:,.0f} snapshots/min")
+
+    with conn.cursor(name='replay_snapshots') as cur:
+        cur.itersize = 5000
+        cur.execute(SNAPSHOTS_SQL, {'events': args.event or None})
+        with multiprocessing.Pool(args.workers, initializer=_init_worker,
+                                  initargs=(search_path,)) as pool:
+            for result in pool.imap(parse_snapshot, snapshot_tasks(cur, replay), chunksize=args.chunk):
+                replay.apply(result)
+                if time.perf_counter() - last_report >= args.progress:
+                    last_report = time.perf_counter()
+                    progress()
+    conn.commit()
+    progress(final=True)
+
+# ==================== STAGING AND SWAP ====================
+
+
+def staging_name(cur, event_code, prefix):
+    return fetch_value(cur, "SELECT %s || left(md5(%s), 12)", (prefix, event_code))
+
+
+def build_staging(conn, event_code, path, for_swap):
+    """
+    COPY one event's replay into a table shaped like its partition. For a
+    swap it also gets the archive's constraints and indexes, built now so
+    ATTACH adopts them instead of building them under its lock.
+    """
+    with conn.cursor() as cur:
+        staging = staging_name(cur, event_code, 'hsa_replay_')
+        cur.execute(f"DROP TABLE IF EXISTS {staging}")
+        cur.execute(f"CREATE TABLE {staging} (LIKE High_Scores_Archive INCLUDING DEFAULTS)")
+        cur.execute(f"ALTER TABLE {staging} ADD CONSTRAINT partition_event_code "
+                    f"CHECK (event_code = %s)", (event_code,))
+        with open(path, 'r', newline='') as f:
+            cur.copy_expert(f"COPY {staging} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", f)
+        cur.execute(CARRY_APPROVAL_SQL.format(staging=staging), {'event_code': event_code})
+
+        constraints = [] if not for_swap else fetch_all(cur, """
+            SELECT conname, contype, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = 'high_scores_archive'::regclass AND contype IN ('p', 'u', 'f')
+            ORDER BY contype DESC, conname
+        """)
+        for n, (name, contype, definition) in enumerate(constraints):
+            own_name = name if contype == 'f' else f"{staging}_c{n}"
+            cur.execute(f'ALTER TABLE {staging} ADD CONSTRAINT "{own_name}" {definition}')
+        indexes = [] if not for_swap else fetch_all(cur, """
+            SELECT pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = 'high_scores_archive'::regclass
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint con
+                  WHERE con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+              )
+        """)
+        for n, (definition,) in enumerate(indexes):
+            head, _, tail = definition.partition(' USING ')
+            unique = 'UNIQUE ' if head.startswith('CREATE UNIQUE') else ''
+            cur.execute(f"CREATE {unique}INDEX {staging}_i{n} ON {staging} USING {tail}")
+        cur.execute(f"ANALYZE {staging}")
+        cur.execute(COMPARE_SQL.format(staging=staging), {'event_code': event_code})
+        current, replayed, only_current, only_replayed = cur.fetchone()
+    conn.commit()
+    log(f"📋 {event_code}: {current:,} rows now, {replayed:,} replayed "
+        f"({only_current:,} only in the archive, {only_replayed:,} only in the replay)")
+    return staging, {'current_rows': current, 'replayed_rows': replayed,
+                     'only_current': only_current, 'only_replayed': only_replayed}
+
+
+def swap_partition(conn, event_code, staging):
+    """Replace the event's partition with the staging table under one short lock"""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M')
+
+    def swap(cur):
+        partition = fetch_value(cur, "SELECT create_score_partition(%s)", (event_code,))
+        retired = staging_name(cur, event_code, 'hsa_pre_replay_') + '_' + stamp
+        cur.execute("SELECT detach_score_partition(%s)", (event_code,))
+        cur.execute(f'ALTER TABLE "{partition}" RENAME TO {retired}')
+        cur.execute(f'ALTER TABLE {staging} RENAME TO "{partition}"')
+        cur.execute(f'ALTER TABLE High_Scores_Archive ATTACH PARTITION "{partition}" '
+                    f'FOR VALUES IN (%s)', (event_code,))
+        return retired
+
+    retired = with_lock_retry(conn, swap)
+    with conn.cursor() as cur:
+        cur.execute(REBUILD_DERIVED_SQL, {'event_code': event_code})
+    conn.commit()
+    log(f"🔀 {event_code}: replay swapped in; previous rows kept in {retired}")
+
+
+def ensure_referenced_rows(conn, replay):
+    """Players and machines the replay refers to must exist (FKs); profiles are not touched"""
+    player_ids = sorted(replay.players)
+    profiles = [replay.players[player_id] for player_id in player_ids]
+    with conn.cursor() as cur:
+        cur.execute(UPSERT_MISSING_PLAYERS_SQL, (player_ids,) + tuple(
+            [profile[i] for profile in profiles] for i in range(len(PROFILE_FIELDS))))
+        cur.execute(UPSERT_MISSING_MACHINES_SQL, (list(replay.machines), list(replay.machines.values())))
+    conn.commit()
+
+# ==================== COMMAND LINE ====================
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild High_Scores_Archive from Api_Snapshots')
+    parser.add_argument('--event', action='append', help='event code to replay (repeatable; default all)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='parser processes')
+    parser.add_argument('--chunk', type=int, default=16, help='snapshots handed to a worker at a time')
+    parser.add_argument('--progress', type=float, default=5, help='seconds between progress lines')
+    parser.add_argument('--swap', action='store_true',
+                        help='replace each event partition with its replay (default: report only)')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            if args.swap and not archive_is_partitioned(cur):
+                log("❌ --swap needs the partitioned archive; run: python partition_archive.py migrate")
+                return 1
+            events = args.event or [row[0] for row in fetch_all(
+                cur, "SELECT DISTINCT event_code FROM Api_Snapshots WHERE event_code IS NOT NULL")]
+            manual = fetch_all(cur, MANUAL_SCORES_SQL, (events,))
+        conn.commit()
+
+        with tempfile.TemporaryDirectory(prefix='replay_') as workdir:
+            replay = Replay(workdir)
+            replay.load_manual(manual)
+            stream_snapshots(conn, args, replay)
+            files = replay.finish()
+            if args.swap:
+                ensure_referenced_rows(conn, replay)
+
+            for event_code, path in sorted(files.items()):
+                staging, _ = build_staging(conn, event_code, path, for_swap=args.swap)
+                if args.swap:
+                    swap_partition(conn, event_code, staging)
+                else:
+                    with conn.cursor() as cur:
+                        cur.execute(f"DROP TABLE {staging}")
+                    conn.commit()
+        if not args.swap:
+            log("ℹ️  Report only; re-run with --swap to replace the archive")
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Replay failed: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
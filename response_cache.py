@@ -0,0 +1,240 @@
+"""
+Leaderboard Response Cache
+Pre-serialized API responses kept in memory until the leaderboard generation
+changes (see database/init/07_leaderboard_generation.sql)
+
+Settings (environment variables):
+    RESPONSE_CACHE_ENABLED       set to "false" to bypass the cache (default true)
+    RESPONSE_CACHE_MAX_ENTRIES   entries kept per process; the oldest is
+                                 evicted beyond this (default 256)
+    GENERATION_POLL_INTERVAL     seconds between generation re-reads while the
+                                 LISTEN connection is down (default 15)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+GENERATION_CHANNEL = 'leaderboard_updated'
+
+GENERATION_QUERY = "SELECT generation, updated_at FROM leaderboard_generation WHERE singleton"
+
+
+class GenerationTracker:
+    """
+    Tracks the current leaderboard generation for this process.
+
+    With the LISTEN connection up, the value is pushed by NOTIFY and never
+    read from the database on the request path. Without it, the value is
+    re-read at most every ``poll_interval`` seconds.
+    """
+
+    def __init__(self, pool, listener=None, poll_interval=None):
+        self.pool = pool
+        self.listener = listener
+        self.poll_interval = (float(os.getenv('GENERATION_POLL_INTERVAL', '15'))
+                              if poll_interval is None else poll_interval)
+        self._lock = threading.Lock()
+        self._generation = None
+        self._updated_at = None
+        self._checked_at = None
+        self._subscribers = []
+        if listener is not None:
+            listener.subscribe(GENERATION_CHANNEL, self._on_notify)
+            listener.on_reconnect(self.reload)
+
+    def subscribe(self, callback):
+        """Register ``callback(generation)`` for every observed generation change"""
+        self._subscribers.append(callback)
+
+    def _set(self, generation, updated_at=None):
+        with self._lock:
+            changed = generation != self._generation
+            if self._generation is not None and generation < self._generation:
+                # Never go backwards (a late NOTIFY racing a reload)
+                return
+            self._generation = generation
+            if updated_at is not None:
+                self._updated_at = updated_at
+            elif changed:
+                # Pushed by NOTIFY: it was published just now
+                self._updated_at = datetime.now(timezone.utc)
+            self._checked_at = time.monotonic()
+        if changed:
+            for callback in list(self._subscribers):
+                try:
+                    callback(generation)
+                except Exception as e:
+                    print(f"⚠️ Generation subscriber failed: {e}")
+
+    def _on_notify(self, payload):
+        try:
+            self._set(int(payload))
+        except (TypeError, ValueError):
+            self.reload()
+
+    def reload(self):
+        """Read the generation from the database; returns it (or None)"""
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(GENERATION_QUERY)
+                    row = cur.fetchone()
+        except Exception as e:
+            print(f"⚠️ Could not read leaderboard generation: {type(e).__name__}: {e}")
+            with self._lock:
+                self._checked_at = time.monotonic()
+            return self._generation
+        if row:
+            self._set(row['generation'], row['updated_at'])
+        return self._generation
+
+    def current(self):
+        """Current generation, or None if it is unknown (cache must be bypassed)"""
+        if self.listener is not None:
+            self.listener.ensure_started()
+            if self.listener.connected and self._generation is not None:
+                return self._generation
+        checked_at = self._checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.poll_interval:
+            return self.reload()
+        return self._generation
+
+    @property
+    def updated_at(self):
+        """When the current generation was published (None if never loaded)"""
+        return self._updated_at
+
+
+CachedResponse = namedtuple('CachedResponse', 'body mimetype status generation etag')
+
+
+def content_etag(body):
+    """Strong ETag value for a response body"""
+    return hashlib.sha1(body).hexdigest()[:20]
+
+
+class _Entry:
+    __slots__ = ('body', 'mimetype', 'generation', 'etag', 'created_at')
+
+    def __init__(self, body, mimetype, generation):
+        self.body = body
+        self.mimetype = mimetype
+        self.generation = generation
+        self.etag = content_etag(body)
+        self.created_at = time.monotonic()
+
+    def response(self):
+        return CachedResponse(self.body, self.mimetype, 200, self.generation, self.etag)
+
+
+class ResponseCache:
+    """Map of request key -> pre-serialized body, valid for one generation"""
+
+    def __init__(self, tracker, enabled=None, max_entries=None):
+        self.tracker = tracker
+        self.enabled = (os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() != 'false'
+                        if enabled is None else enabled)
+        self.max_entries = (int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+                            if max_entries is None else max_entries)
+        self._entries = {}
+        # key -> [lock, holders]; dropped once nobody is building or waiting
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        tracker.subscribe(lambda generation: self.clear())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, prefixes):
+        """Drop entries whose key starts with any of ``prefixes``"""
+        prefixes = tuple(prefixes)
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefixes)]:
+                del self._entries[key]
+
+    @contextmanager
+    def _key_lock(self, key):
+        with self._lock:
+            slot = self._key_locks.get(key)
+            if slot is None:
+                slot = self._key_locks[key] = [threading.Lock(), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._key_locks[key]
+
+    def _store(self, key, entry):
+        with self._lock:
+            # Re-inserting moves the key to the end; evict from the front
+            self._entries.pop(key, None)
+            while self._entries and len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+                self.evictions += 1
+            self._entries[key] = entry
+
+    def _valid(self, entry, generation, ttl):
+        if entry is None or entry.generation != generation:
+            return False
+        return ttl is None or time.monotonic() - entry.created_at < ttl
+
+    def get_or_build(self, key, build, ttl=None):
+        """
+        Return a ``CachedResponse`` for ``key``.
+
+        ``build()`` must return ``(body_bytes, mimetype, status, cacheable)``;
+        only cacheable 200 responses are stored. It runs at most once per key
+        per generation (concurrent requests for the same key wait for the
+        first one). ``ttl`` additionally bounds the age of entries whose
+        content depends on the clock (e.g. "minutes ago").
+        """
+        generation = self.tracker.current() if self.enabled else None
+        if generation is None:
+            self.bypassed += 1
+            body, mimetype, status, _ = build()
+            return CachedResponse(body, mimetype, status, None, content_etag(body))
+
+        entry = self._entries.get(key)
+        if self._valid(entry, generation, ttl):
+            self.hits += 1
+            return entry.response()
+
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if self._valid(entry, generation, ttl):
+                self.hits += 1
+                return entry.response()
+            self.misses += 1
+            body, mimetype, status, cacheable = build()
+            entry = _Entry(body, mimetype, generation)
+            # Don't store if the generation moved while we were building
+            if cacheable and status == 200 and self.tracker.current() == generation:
+                self._store(key, entry)
+        return CachedResponse(body, mimetype, status, generation, entry.etag)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "generation": self.tracker.current() if self.enabled else None,
+            "entries": len(self._entries),
+            "bytes": sum(len(e.body) for e in list(self._entries.values())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+        }